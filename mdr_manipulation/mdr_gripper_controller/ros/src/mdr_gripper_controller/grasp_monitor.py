@@ -0,0 +1,237 @@
+import threading
+import numpy
+
+import rospy
+from sensor_msgs.msg import JointState
+
+class JointStateBuffer(object):
+    '''A fixed-size ring buffer of finger joint positions and efforts;
+    once the buffer is full, the oldest measurements are overwritten.
+    Unknown efforts are stored as NaN.
+
+    Keyword arguments:
+    joint_names -- names of the finger joints
+    capacity -- maximum number of stored measurements
+
+    '''
+    def __init__(self, joint_names, capacity=500):
+        self.joint_names = list(joint_names)
+        self.capacity = capacity
+        self.stamps = numpy.zeros(capacity)
+        self.positions = numpy.zeros((capacity, len(self.joint_names)))
+        self.efforts = numpy.zeros((capacity, len(self.joint_names)))
+        self.next_index = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        self.next_index = 0
+        self.size = 0
+
+    def append(self, stamp, positions, efforts=None):
+        self.stamps[self.next_index] = stamp
+        self.positions[self.next_index] = positions
+        self.efforts[self.next_index] = numpy.nan if efforts is None else efforts
+        self.next_index = (self.next_index + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def get(self):
+        '''Returns the stored time stamps, positions, and efforts
+        (as numpy arrays) in chronological order.
+        '''
+        indices = (numpy.arange(self.size) + self.next_index - self.size) % self.capacity
+        return self.stamps[indices], self.positions[indices], self.efforts[indices]
+
+
+class GraspLossDetector(object):
+    '''Detects the loss of a grasped object from a stream of finger joint
+    measurements. The fingers are considered stopped if none of them moves
+    faster than 'max_velocity'. The object is considered held once the
+    fingers have stopped away from their closed position while exerting an
+    effort for 'window' consecutive measurements; a held object is considered
+    lost once the fingers have reached their closed position or stopped
+    exerting an effort for 'window' consecutive measurements. If the fingers
+    have instead stopped at their closed position for 'window' consecutive
+    measurements after having been opened, i.e. if the gripper has been
+    closed without grasping the object, the grasp is considered missed.
+    If the efforts of the finger joints are not known, only their
+    positions are used, i.e. the fingers are always considered to
+    exert an effort; stopped open fingers are then considered to hold
+    an object, so the detection should only start once the gripper closes.
+
+    Keyword arguments:
+    closed_position -- position of the finger joints when the gripper is
+                       closed without an object (a number or a list with
+                       one position per joint)
+    position_tolerance -- maximum distance of a finger joint from its closed
+                          position at which the gripper is considered closed
+    min_effort -- minimum mean absolute effort of the finger joints
+                  at which the fingers are considered to hold an object
+    max_velocity -- maximum absolute velocity (in position units per second)
+                    of the finger joints at which the fingers are considered stopped
+    window -- number of consecutive measurements after which the state changes
+
+    '''
+    WAITING_FOR_GRASP = 0
+    HOLDING = 1
+    LOST = 2
+    MISSED = 3
+
+    def __init__(self, closed_position, position_tolerance=0.005,
+                 min_effort=0.1, max_velocity=0.05, window=5):
+        self.closed_position = numpy.asarray(closed_position, dtype=float)
+        self.position_tolerance = position_tolerance
+        self.min_effort = min_effort
+        self.max_velocity = max_velocity
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.state = GraspLossDetector.WAITING_FOR_GRASP
+        self.next_state = GraspLossDetector.WAITING_FOR_GRASP
+        self.consecutive_measurements = 0
+        self.fingers_opened = False
+        self.fingers_stopped = False
+        self.previous_stamp = None
+        self.previous_positions = None
+
+    def grasp_failed(self):
+        '''Returns True if a held object has been lost or the grasp has been missed.
+        '''
+        return self.state in (GraspLossDetector.LOST, GraspLossDetector.MISSED)
+
+    def update(self, stamp, positions, efforts=None):
+        '''Processes a measurement of the finger joints and returns
+        True if a held object has been lost or the grasp has been missed.
+
+        Keyword arguments:
+        stamp -- time stamp of the measurement in seconds
+        positions -- positions of the finger joints
+        efforts -- efforts of the finger joints (None if they are not known)
+
+        '''
+        positions = numpy.asarray(positions, dtype=float)
+        self.update_velocity(stamp, positions)
+        if self.grasp_failed():
+            return True
+
+        distances = numpy.abs(positions - self.closed_position)
+        fingers_open = bool(numpy.all(distances > self.position_tolerance))
+        fingers_closed = bool(numpy.all(distances <= self.position_tolerance))
+        exerts_effort = efforts is None or numpy.mean(numpy.abs(efforts)) >= self.min_effort
+
+        if self.state == GraspLossDetector.WAITING_FOR_GRASP:
+            self.fingers_opened = self.fingers_opened or fingers_open
+            if self.fingers_stopped and fingers_open and exerts_effort:
+                next_state = GraspLossDetector.HOLDING
+            elif self.fingers_stopped and fingers_closed and self.fingers_opened:
+                next_state = GraspLossDetector.MISSED
+            else:
+                next_state = GraspLossDetector.WAITING_FOR_GRASP
+        elif fingers_open and exerts_effort:
+            next_state = GraspLossDetector.HOLDING
+        else:
+            next_state = GraspLossDetector.LOST
+
+        if next_state == self.state:
+            self.consecutive_measurements = 0
+        elif next_state == self.next_state:
+            self.consecutive_measurements += 1
+        else:
+            self.consecutive_measurements = 1
+        self.next_state = next_state
+
+        if self.consecutive_measurements >= self.window:
+            self.state = next_state
+            self.consecutive_measurements = 0
+        return self.grasp_failed()
+
+    def update_velocity(self, stamp, positions):
+        # the fingers are not considered stopped before their velocity is
+        # known; measurements with the same stamp do not change the velocity
+        if self.previous_stamp is not None and stamp > self.previous_stamp:
+            velocities = (positions - self.previous_positions) / (stamp - self.previous_stamp)
+            self.fingers_stopped = bool(numpy.all(numpy.abs(velocities) <= self.max_velocity))
+        if self.previous_stamp is None or stamp > self.previous_stamp:
+            self.previous_stamp = stamp
+            self.previous_positions = positions
+
+
+class GraspMonitor(object):
+    '''Records the finger joint measurements published on a joint state
+    topic into a JointStateBuffer and passes them to a GraspLossDetector,
+    such that the loss of a grasped object can be detected while the
+    robot is moving. Measurements are only processed between calls
+    to 'start' and 'stop'.
+
+    Keyword arguments:
+    joint_names -- names of the finger joints
+    detector -- a GraspLossDetector
+    buffer_size -- number of measurements kept in the buffer
+    joint_states_topic -- topic on which 'sensor_msgs/JointState' messages are published
+
+    '''
+    def __init__(self, joint_names, detector, buffer_size=500,
+                 joint_states_topic='/joint_states'):
+        self.joint_names = list(joint_names)
+        self.detector = detector
+        self.buffer = JointStateBuffer(self.joint_names, buffer_size)
+        self.active = False
+        self.lost = False
+        self.lock = threading.Lock()
+        self.joint_state_sub = rospy.Subscriber(joint_states_topic, JointState,
+                                                self.record_joint_states)
+
+    def start(self):
+        '''Clears the buffer and starts processing measurements.
+        '''
+        with self.lock:
+            self.buffer.clear()
+            self.detector.reset()
+            self.lost = False
+            self.active = True
+
+    def stop(self):
+        with self.lock:
+            self.active = False
+
+    def grasp_lost(self):
+        '''Returns True if a held object has been lost or the
+        grasp has been missed since the monitor was started.
+        '''
+        with self.lock:
+            return self.lost
+
+    def get_measurements(self):
+        '''Returns copies of the buffered time stamps, positions,
+        and efforts in chronological order.
+        '''
+        with self.lock:
+            return tuple(numpy.copy(data) for data in self.buffer.get())
+
+    def record_joint_states(self, msg):
+        # joint state messages do not necessarily contain the finger joints
+        indices = [msg.name.index(name) for name in self.joint_names if name in msg.name]
+        if len(indices) != len(self.joint_names):
+            return
+
+        positions = [msg.position[i] for i in indices]
+        efforts = None
+        if len(msg.effort) == len(msg.name):
+            efforts = [msg.effort[i] for i in indices]
+        with self.lock:
+            if not self.active:
+                return
+            if efforts is None:
+                rospy.logwarn_throttle(10., '[GRASP_MONITOR] The joint states do not contain efforts; ' +
+                                       'the grasp is only monitored using the finger positions')
+            stamp = msg.header.stamp.to_sec()
+            self.buffer.append(stamp, positions, efforts)
+            if self.detector.update(stamp, positions, efforts) and not self.lost:
+                if self.detector.state == GraspLossDetector.MISSED:
+                    rospy.logwarn('[GRASP_MONITOR] The gripper has been closed without grasping the object')
+                else:
+                    rospy.logwarn('[GRASP_MONITOR] The grasped object has been lost')
+                self.lost = True
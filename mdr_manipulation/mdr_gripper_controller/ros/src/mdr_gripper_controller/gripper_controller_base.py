@@ -1,6 +1,79 @@
+import threading
+from Queue import Queue
+
 import rospy
 
+from mdr_gripper_controller.grasp_monitor import GraspLossDetector, GraspMonitor
+
+class GripperCommandFuture(object):
+    '''A handle to a gripper command that is executed in the background.
+    '''
+    def __init__(self, command_name):
+        self.command_name = command_name
+        self.finished = threading.Event()
+        self.value = None
+        self.exception = None
+
+    def done(self):
+        '''Returns True if the command has finished.
+        '''
+        return self.finished.is_set()
+
+    def wait(self, timeout=None):
+        '''Waits until the command has finished.
+
+        Keyword arguments:
+        timeout -- maximum waiting time in seconds (no limit if None)
+
+        Returns True if the command has finished and False otherwise.
+
+        '''
+        self.finished.wait(timeout)
+        return self.finished.is_set()
+
+    def result(self, timeout=None):
+        '''Waits until the command has finished and returns its result;
+        an exception raised by the command is raised again.
+
+        Keyword arguments:
+        timeout -- maximum waiting time in seconds (no limit if None)
+
+        Returns None if the command has not finished within the timeout.
+
+        '''
+        if not self.wait(timeout):
+            rospy.logwarn('[%s] Command did not finish within %s seconds',
+                          self.command_name, timeout)
+            return None
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+
+    def set_result(self, value):
+        self.value = value
+        self.finished.set()
+
+    def set_exception(self, exception):
+        self.exception = exception
+        self.finished.set()
+
+
 class GripperControllerBase(object):
+    '''The blocking methods need to be overridden by robot-specific
+    implementations; the asynchronous variants run the blocking methods
+    in a background thread, one command after another in the order in
+    which they were requested, and return a GripperCommandFuture.
+
+    The loss of a grasped object while the robot is moving can be detected
+    by a grasp_monitor.GraspMonitor, which is created by 'create_grasp_monitor'.
+    The asynchronous variants start the monitor once the grasp verification
+    has been initialised and stop it once the grasp has been verified or
+    before the gripper is opened; callers of the blocking methods need to
+    call 'start_grasp_monitor' and 'stop_grasp_monitor' themselves.
+    '''
+    _command_queue_lock = threading.Lock()
+    grasp_monitor = None
+
     def open(self):
         rospy.loginfo('[OPEN_GRIPPER] Ignoring request')
         raise NotImplementedError()
@@ -16,3 +89,93 @@ class GripperControllerBase(object):
     def verify_grasp(self):
         rospy.loginfo('[VERIFY_GRASP] Ignoring request')
         raise NotImplementedError()
+
+    def create_grasp_monitor(self, finger_joint_names, closed_position,
+                             joint_states_topic='/joint_states'):
+        '''Creates a grasp monitor that processes the measurements
+        of the given finger joints once it has been started.
+
+        Keyword arguments:
+        finger_joint_names -- names of the finger joints
+        closed_position -- position of the finger joints when the gripper is
+                           closed without an object (a number or a list with
+                           one position per joint)
+        joint_states_topic -- topic on which 'sensor_msgs/JointState' messages are published
+
+        '''
+        detector = GraspLossDetector(closed_position)
+        self.grasp_monitor = GraspMonitor(finger_joint_names, detector,
+                                          joint_states_topic=joint_states_topic)
+
+    def start_grasp_monitor(self):
+        if self.grasp_monitor is not None:
+            self.grasp_monitor.start()
+
+    def stop_grasp_monitor(self):
+        if self.grasp_monitor is not None:
+            self.grasp_monitor.stop()
+
+    def grasp_lost(self):
+        '''Returns True if the grasp monitor has detected that a grasped
+        object has been lost or that the gripper has been closed without
+        grasping the object; always returns False without a grasp monitor.
+        '''
+        if self.grasp_monitor is None:
+            return False
+        return self.grasp_monitor.grasp_lost()
+
+    def open_async(self):
+        def open_gripper():
+            # the monitor would otherwise report the opening as a lost grasp
+            self.stop_grasp_monitor()
+            return self.open()
+        return self.submit_command('OPEN_GRIPPER', open_gripper)
+
+    def close_async(self):
+        return self.submit_command('CLOSE_GRIPPER', self.close)
+
+    def init_grasp_verification_async(self):
+        def init_grasp_verification():
+            result = self.init_grasp_verification()
+            self.start_grasp_monitor()
+            return result
+        return self.submit_command('INIT_GRASP_VERIFICATION', init_grasp_verification)
+
+    def verify_grasp_async(self):
+        def verify_grasp():
+            try:
+                return self.verify_grasp()
+            finally:
+                self.stop_grasp_monitor()
+        return self.submit_command('VERIFY_GRASP', verify_grasp)
+
+    def submit_command(self, command_name, command):
+        '''Queues a command for execution in the background.
+
+        Keyword arguments:
+        command_name -- name of the command used for logging
+        command -- a function without arguments that executes the command
+
+        Returns a GripperCommandFuture of the command.
+
+        '''
+        # robot-specific implementations do not necessarily call the
+        # base constructor, so the command queue is created on first use
+        with GripperControllerBase._command_queue_lock:
+            if getattr(self, '_command_queue', None) is None:
+                self._command_queue = Queue()
+                worker = threading.Thread(target=self.__execute_commands)
+                worker.daemon = True
+                worker.start()
+
+        future = GripperCommandFuture(command_name)
+        self._command_queue.put((future, command))
+        return future
+
+    def __execute_commands(self):
+        while True:
+            future, command = self._command_queue.get()
+            try:
+                future.set_result(command())
+            except Exception as exc:
+                future.set_exception(exc)
@@ -0,0 +1,73 @@
+import time
+import threading
+
+import rospy
+
+from mdr_gripper_controller.gripper_controller_base import GripperControllerBase
+
+class SimulatedGripperController(GripperControllerBase):
+    '''An in-process gripper that does not communicate with any hardware;
+    the commands take a configurable amount of time, such that the gripper
+    can be used for testing (and timing) the code that uses it.
+
+    Keyword arguments:
+    open_duration -- duration (in seconds) of an open command
+    close_duration -- duration (in seconds) of a close command
+    verification_duration -- duration (in seconds) of the grasp verification commands
+    object_graspable -- whether closing the gripper results in an object being grasped
+
+    '''
+    def __init__(self, open_duration=1., close_duration=1.,
+                 verification_duration=0., object_graspable=True):
+        self.open_duration = open_duration
+        self.close_duration = close_duration
+        self.verification_duration = verification_duration
+        self.object_graspable = object_graspable
+
+        self.is_open = False
+        self.holds_object = False
+        self.object_dropped = False
+        self.grasp_verification_initialised = False
+
+        # the (start, end) times of the executed commands
+        self.command_times = dict()
+        self.lock = threading.Lock()
+
+    def open(self):
+        rospy.loginfo('[OPEN_GRIPPER] Opening the simulated gripper')
+        self.execute_command('open', self.open_duration)
+        self.is_open = True
+        self.holds_object = False
+        self.object_dropped = False
+        return True
+
+    def close(self):
+        rospy.loginfo('[CLOSE_GRIPPER] Closing the simulated gripper')
+        self.execute_command('close', self.close_duration)
+        self.holds_object = self.is_open and self.object_graspable
+        self.is_open = False
+        return True
+
+    def init_grasp_verification(self):
+        self.execute_command('init_grasp_verification', self.verification_duration)
+        self.grasp_verification_initialised = True
+
+    def verify_grasp(self):
+        self.execute_command('verify_grasp', self.verification_duration)
+        return self.grasp_verification_initialised and self.holds_object
+
+    def grasp_lost(self):
+        return self.object_dropped
+
+    def drop_object(self):
+        '''Simulates the loss of a grasped object.
+        '''
+        self.object_dropped = self.holds_object
+        self.holds_object = False
+
+    def execute_command(self, command_name, duration):
+        start_time = time.time()
+        time.sleep(duration)
+        with self.lock:
+            self.command_times.setdefault(command_name, list()).append((start_time,
+                                                                        time.time()))
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+import unittest
+import numpy
+import rospy
+import rosunit
+from sensor_msgs.msg import JointState
+
+from mdr_gripper_controller.grasp_monitor import JointStateBuffer, GraspLossDetector, GraspMonitor
+
+PKG = 'mdr_gripper_controller'
+FINGER_JOINT_NAMES = ['gripper_left_finger_joint', 'gripper_right_finger_joint']
+SAMPLING_PERIOD = 0.01
+
+
+def joint_state_sequence(object_width, slip_index=None, number_of_samples=200):
+    '''Returns positions and efforts of two finger joints sampled at a fixed
+    rate while the gripper is opened, closed on an object, and moved; the
+    fingers close completely from 'slip_index' onwards.
+    '''
+    noise = numpy.random.RandomState(0)
+    positions = numpy.zeros((number_of_samples, 2))
+    efforts = numpy.zeros((number_of_samples, 2))
+    closing_positions = numpy.linspace(0.8, object_width, 20)
+    for i in range(number_of_samples):
+        if i < 20:
+            position, effort = 0.8, 0.
+        elif i < 40:
+            position, effort = closing_positions[i-20], 0.05
+        elif slip_index is None or i < slip_index:
+            position, effort = object_width, 1.
+        else:
+            position, effort = max(0., object_width - 0.05 * (i - slip_index)), 1.
+        positions[i] = position + noise.normal(0., 0.001, 2)
+        efforts[i] = effort + noise.normal(0., 0.02, 2)
+    return positions, efforts
+
+
+def simulated_joint_states(object_half_width=None, slip_time=None, duration=6., seed=0):
+    '''Simulates the joint states of a two-finger gripper that is opened after
+    0.5s and closed after 2.5s, either on an object with the given half width
+    (which starts slipping out of the gripper at 'slip_time') or on nothing.
+    The joint states are published at 50Hz with time stamp jitter, encoder
+    quantisation, and effort noise; the fingers are mirrored, so the position
+    and effort of the right finger have the opposite sign. Returns the time
+    stamps (in seconds), positions, and efforts of the fingers.
+    '''
+    noise = numpy.random.RandomState(seed)
+    number_of_samples = int(duration * 50)
+    stamps = numpy.arange(number_of_samples) * 0.02 + noise.uniform(-0.0015, 0.0015, number_of_samples)
+    positions = numpy.zeros((number_of_samples, 2))
+    efforts = numpy.zeros((number_of_samples, 2))
+
+    position, velocity, effort = 0.3, 0., 0.
+    contact = False
+    for i, stamp in enumerate(stamps):
+        dt = 0.02 if i == 0 else stamp - stamps[i-1]
+        target = 0.3 if stamp < 0.5 else (0.6 if stamp < 2.5 else -0.05)
+        slipping = slip_time is not None and stamp >= slip_time
+        stop_position = object_half_width if object_half_width and not slipping else 0.
+
+        # the fingers accelerate towards the commanded velocity
+        desired_velocity = numpy.clip((target - position) / 0.08, -0.8, 1.)
+        velocity += (desired_velocity - velocity) * min(1., dt / 0.03)
+        next_position = position + velocity * dt
+        if target < position and next_position <= stop_position:
+            next_position, velocity = stop_position, 0.
+            contact = True
+        elif slipping and position > 0.:
+            # the object slides out while the fingers keep squeezing
+            next_position = max(0., position - 0.9 * dt)
+            velocity = (next_position - position) / dt
+        position = next_position
+
+        if target > position + 0.01:
+            desired_effort = 0.2 if abs(velocity) > 0.01 else 0.03
+            contact = False
+        elif contact:
+            desired_effort = 0.8 if slipping and position > 0. else (1.4 if position > 0. else 1.6)
+        else:
+            desired_effort = 0.25 if abs(velocity) > 0.01 else 0.03
+        effort += (desired_effort - effort) * min(1., dt / 0.05)
+
+        encoder_noise = noise.choice([-0.0005, 0., 0.0005], 2, p=[0.1, 0.8, 0.1])
+        positions[i] = numpy.round((numpy.array([position, -position]) + encoder_noise) / 0.0005) * 0.0005
+        efforts[i] = numpy.round(numpy.array([-effort, effort]) + noise.normal(0., 0.04, 2), 2)
+    return stamps, positions, efforts
+
+
+class TestGraspMonitor(unittest.TestCase):
+
+    def setUp(self):
+        self.detector = GraspLossDetector(closed_position=0., position_tolerance=0.01,
+                                          min_effort=0.5, max_velocity=0.5, window=5)
+
+    def first_detection(self, positions, efforts, stamps=None):
+        if stamps is None:
+            stamps = numpy.arange(len(positions)) * SAMPLING_PERIOD
+        for i, (stamp, position) in enumerate(zip(stamps, positions)):
+            effort = efforts[i] if efforts is not None else None
+            if self.detector.update(stamp, position, effort):
+                return i
+        return None
+
+    def test_held_object_is_not_lost(self):
+        positions, efforts = joint_state_sequence(0.3)
+        self.assertIsNone(self.first_detection(positions, efforts))
+        self.assertEqual(self.detector.state, GraspLossDetector.HOLDING)
+
+    def test_slipping_object_is_detected(self):
+        positions, efforts = joint_state_sequence(0.3, slip_index=100)
+        detection_index = self.first_detection(positions, efforts)
+        self.assertIsNotNone(detection_index)
+        self.assertGreater(detection_index, 100)
+        self.assertLess(detection_index, 120)
+
+    def test_missed_object_is_detected(self):
+        positions, efforts = joint_state_sequence(0.)
+        detection_index = self.first_detection(positions, efforts)
+        self.assertIsNotNone(detection_index)
+        self.assertGreaterEqual(detection_index, 40)
+        self.assertLess(detection_index, 50)
+        self.assertEqual(self.detector.state, GraspLossDetector.MISSED)
+
+    def test_closed_gripper_is_not_reported_as_missed(self):
+        # the gripper is closed before the grasp verification is initialised
+        positions, efforts = joint_state_sequence(0.)
+        self.assertIsNone(self.first_detection(positions[40:], efforts[40:]))
+        self.assertEqual(self.detector.state, GraspLossDetector.WAITING_FOR_GRASP)
+
+    def test_moving_fingers_do_not_hold_object(self):
+        # the fingers keep closing against a soft object
+        positions, efforts = joint_state_sequence(0.3)
+        positions[40:70] = numpy.linspace(0.3, 0.02, 30)[:, numpy.newaxis]
+        self.assertIsNone(self.first_detection(positions[:70], efforts[:70]))
+        self.assertEqual(self.detector.state, GraspLossDetector.WAITING_FOR_GRASP)
+
+    def test_short_effort_drop_is_ignored(self):
+        positions, efforts = joint_state_sequence(0.3)
+        efforts[100:103] = 0.
+        self.assertIsNone(self.first_detection(positions, efforts))
+
+    def test_slip_is_detected_without_efforts(self):
+        # without efforts, stopped open fingers cannot be told apart from
+        # fingers holding an object, so the detection starts while closing
+        positions, _ = joint_state_sequence(0.3, slip_index=100)
+        self.assertIsNone(self.first_detection(positions[25:100], None))
+        self.assertEqual(self.detector.state, GraspLossDetector.HOLDING)
+        detection_index = self.first_detection(positions[100:], None)
+        self.assertIsNotNone(detection_index)
+        self.assertLess(detection_index, 20)
+
+    def test_missed_object_is_detected_without_efforts(self):
+        positions, _ = joint_state_sequence(0.)
+        self.assertIsNotNone(self.first_detection(positions[25:], None))
+        self.assertEqual(self.detector.state, GraspLossDetector.MISSED)
+
+    def test_monitor_uses_positions_without_efforts(self):
+        monitor = GraspMonitor(FINGER_JOINT_NAMES, self.detector)
+        monitor.start()
+        positions, _ = joint_state_sequence(0.3, slip_index=100)
+        positions = positions[25:]
+        for i, position in enumerate(positions):
+            msg = JointState()
+            msg.header.stamp = rospy.Time.from_sec(i * SAMPLING_PERIOD)
+            msg.name = ['arm_joint'] + FINGER_JOINT_NAMES
+            msg.position = [0.5] + list(position)
+            monitor.record_joint_states(msg)
+        monitor.stop()
+
+        self.assertTrue(monitor.grasp_lost())
+        self.assertEqual(self.detector.state, GraspLossDetector.LOST)
+        _, recorded_positions, recorded_efforts = monitor.get_measurements()
+        numpy.testing.assert_allclose(recorded_positions, positions)
+        self.assertTrue(numpy.all(numpy.isnan(recorded_efforts)))
+
+    def test_buffer_keeps_latest_measurements(self):
+        buff = JointStateBuffer(['finger_1', 'finger_2'], capacity=10)
+        for i in range(25):
+            buff.append(i * 0.01, [i, i], [-i, -i])
+
+        stamps, positions, efforts = buff.get()
+        self.assertEqual(len(buff), 10)
+        numpy.testing.assert_allclose(stamps, numpy.arange(15, 25) * 0.01)
+        numpy.testing.assert_allclose(positions[:, 0], numpy.arange(15, 25))
+        numpy.testing.assert_allclose(efforts[:, 1], -numpy.arange(15, 25))
+
+        buff.clear()
+        self.assertEqual(len(buff.get()[0]), 0)
+
+
+class TestGraspMonitorSimulation(unittest.TestCase):
+    '''Runs the detector on the joint states of a simulated two-finger gripper
+    (with encoder quantisation, effort noise, and time stamp jitter).
+    '''
+    def setUp(self):
+        self.detector = GraspLossDetector(closed_position=[0., 0.], position_tolerance=0.02,
+                                          min_effort=0.5, max_velocity=0.05, window=5)
+
+    def run_detector(self, stamps, positions, efforts):
+        states = list()
+        for stamp, position, effort in zip(stamps, positions, efforts):
+            self.detector.update(stamp, position, effort)
+            states.append(self.detector.state)
+        return stamps, numpy.array(states)
+
+    def first_time_in_state(self, times, states, state):
+        indices = numpy.flatnonzero(states == state)
+        self.assertGreater(len(indices), 0)
+        return times[indices[0]]
+
+    def test_simulated_slip_is_detected(self):
+        # the object starts slipping out of the gripper after 4.6s
+        times, states = self.run_detector(*simulated_joint_states(object_half_width=0.22,
+                                                                  slip_time=4.6))
+        self.assertLess(self.first_time_in_state(times, states, GraspLossDetector.HOLDING), 3.5)
+        loss_time = self.first_time_in_state(times, states, GraspLossDetector.LOST)
+        self.assertGreater(loss_time, 4.6)
+        self.assertLess(loss_time, 5.1)
+
+    def test_simulated_missed_grasp_is_detected(self):
+        # the gripper starts closing after 2.5s and has
+        # closed without grasping an object about 0.8s later
+        times, states = self.run_detector(*simulated_joint_states())
+        self.assertNotIn(GraspLossDetector.HOLDING, states)
+        missed_time = self.first_time_in_state(times, states, GraspLossDetector.MISSED)
+        self.assertGreater(missed_time, 3.)
+        self.assertLess(missed_time, 3.6)
+
+
+if __name__ == '__main__':
+    rosunit.unitrun(PKG, 'test_grasp_monitor', TestGraspMonitor)
+    rosunit.unitrun(PKG, 'test_grasp_monitor_simulation', TestGraspMonitorSimulation)
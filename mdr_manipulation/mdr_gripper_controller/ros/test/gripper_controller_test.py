@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+import time
+import unittest
+import rosunit
+
+from mdr_gripper_controller.gripper_controller_base import GripperControllerBase
+from mdr_gripper_controller.simulated_gripper_controller import SimulatedGripperController
+
+PKG = 'mdr_gripper_controller'
+
+
+class FakeGraspMonitor(object):
+    def __init__(self):
+        self.active = False
+        self.lost = False
+
+    def start(self):
+        self.active = True
+        self.lost = False
+
+    def stop(self):
+        self.active = False
+
+    def grasp_lost(self):
+        return self.lost
+
+
+class TestGripperController(unittest.TestCase):
+
+    def test_gripper_motion_overlaps(self):
+        gripper = SimulatedGripperController(open_duration=0.3)
+        start_time = time.time()
+        future = gripper.open_async()
+
+        # a blocking arm motion of the same duration
+        time.sleep(0.3)
+        self.assertTrue(future.result(timeout=1.))
+        self.assertLess(time.time() - start_time, 0.5)
+        self.assertTrue(gripper.is_open)
+
+    def test_commands_are_executed_in_order(self):
+        gripper = SimulatedGripperController(open_duration=0.1, close_duration=0.1,
+                                             verification_duration=0.05)
+        gripper.open_async()
+        gripper.init_grasp_verification_async()
+        gripper.close_async()
+        self.assertTrue(gripper.verify_grasp_async().result(timeout=1.))
+
+        open_end = gripper.command_times['open'][0][1]
+        verification_start, verification_end = gripper.command_times['init_grasp_verification'][0]
+        close_start = gripper.command_times['close'][0][0]
+        self.assertLessEqual(open_end, verification_start)
+        self.assertLessEqual(verification_end, close_start)
+
+    def test_result_timeout(self):
+        gripper = SimulatedGripperController(close_duration=0.3)
+        future = gripper.close_async()
+        self.assertIsNone(future.result(timeout=0.05))
+        self.assertFalse(future.done())
+        self.assertTrue(future.wait(timeout=1.))
+
+    def test_simulated_grasp_loss(self):
+        gripper = SimulatedGripperController(open_duration=0., close_duration=0.)
+        gripper.open()
+        gripper.close()
+        self.assertFalse(gripper.grasp_lost())
+
+        gripper.drop_object()
+        self.assertTrue(gripper.grasp_lost())
+        self.assertFalse(gripper.verify_grasp())
+
+    def test_grasp_monitor_is_active_until_grasp_is_verified(self):
+        gripper = SimulatedGripperController(open_duration=0., close_duration=0.)
+        gripper.grasp_monitor = FakeGraspMonitor()
+        gripper.open_async()
+        gripper.init_grasp_verification_async().result(timeout=1.)
+        self.assertTrue(gripper.grasp_monitor.active)
+
+        gripper.close_async()
+        self.assertTrue(gripper.verify_grasp_async().result(timeout=1.))
+        self.assertFalse(gripper.grasp_monitor.active)
+
+        # opening the gripper would otherwise be reported as a lost grasp
+        gripper.start_grasp_monitor()
+        gripper.open_async().result(timeout=1.)
+        self.assertFalse(gripper.grasp_monitor.active)
+
+    def test_grasp_lost_is_reported_by_monitor(self):
+        gripper = GripperControllerBase()
+        self.assertFalse(gripper.grasp_lost())
+
+        gripper.grasp_monitor = FakeGraspMonitor()
+        gripper.start_grasp_monitor()
+        self.assertFalse(gripper.grasp_lost())
+        gripper.grasp_monitor.lost = True
+        self.assertTrue(gripper.grasp_lost())
+
+    def test_exceptions_are_raised_by_result(self):
+        future = GripperControllerBase().open_async()
+        self.assertRaises(NotImplementedError, future.result, 1.)
+
+
+if __name__ == '__main__':
+    rosunit.unitrun(PKG, 'test_gripper_controller', TestGripperController)
@@ -33,16 +33,274 @@ class GraspPlanner:
         
         # The name of the gripper's reference coordinate system
         self.gripper_link = "arm_7_link"
+        
+        # All grasps are specified w.r.t. the object's reference frame, so
+        # they are only regenerated if the planner's parameters change
+        self.grasps = None
+        self.grasp_matrices = None
+        self.grasp_headers = None
+        self.grasp_parameters = None
+        
+        # An optional map of reachable wrist poses, which is used for scoring
+        # the grasps if no other score function is given
+        self.reachability_map = None
+        
+        # An optional function that returns the scores (numpy.ndarray (N)) of
+        # wrist poses given w.r.t. the object's frame (numpy.ndarray (N x 4 x 4));
+        # if grasps are scored, grasps whose score is not above the threshold
+        # are discarded and the remaining grasps are sorted by their scores
+        self.score_function = None
+        self.score_threshold = 0.0
+        
+        # The orbit sampling mode: "uniform" evaluates 2 * samples_per_orbit
+        # angles per orbit, while "adaptive" (which requires grasps to be
+        # scored) starts with 2 * coarse_samples_per_orbit angles and then
+        # repeatedly halves the angle step around the refined_angles best
+        # angles until the resolution of the uniform sampling is reached
+        self.orbit_sampling = "uniform"
+        self.coarse_samples_per_orbit = 4
+        self.refined_angles = 4
+        
+        # The number of candidates that were evaluated in the last call of plan
+        self.evaluated_candidates = 0
 
 
-    def plan(self):
-        grasps = []
-        grasps.extend(self.generate_grasps_from_top(self.grasp_distance,
-                                                    self.pregrasp_distance))
-        grasps.extend(self.generate_grasps_from_side(self.grasp_distance,
-                                                     self.pregrasp_distance))
+    def plan(self, object_pose=None):
+        '''
+        Returns the grasps for the current parameters. With uniform orbit
+        sampling, the grasps are cached and only regenerated if one of the
+        parameters has changed; otherwise, only the time stamps of the grasps
+        are updated. The returned grasps are the cached grasps, whose hand
+        postures and gripper translations are shared with each other, so they
+        must be treated as read-only (and copied before they are modified);
+        only the returned list belongs to the caller. If the grasps are
+        scored, they are filtered and sorted by their scores.
+        
+        :param object_pose: The 4x4 transformation matrix of the object's
+        reference frame w.r.t. the reachability map's frame. If given and a
+        reachability map is used (and no score function is given), the
+        grasps are scored by their reachability.
+        :type object_pose: numpy.ndarray
+        
+        :return: A list of grasps
+        :rtype: moveit_msgs.msg.Grasp[]
+        '''
+        score_function = self.get_score_function(object_pose)
+        if self.orbit_sampling == "adaptive" and score_function is not None:
+            return self.plan_adaptively(score_function)
+        
+        parameters = self.get_grasp_parameters()
+        if self.grasps is None or parameters != self.grasp_parameters:
+            grasps = []
+            grasps.extend(self.generate_grasps_from_top(self.grasp_distance,
+                                                        self.pregrasp_distance))
+            grasps.extend(self.generate_grasps_from_side(self.grasp_distance,
+                                                         self.pregrasp_distance))
+            self.grasps = grasps
+            self.grasp_matrices = numpy.concatenate((
+                    self.generate_top_orbit_matrices(self.grasp_distance),
+                    self.generate_side_orbit_matrices(self.grasp_distance)))
+            self.grasp_headers = self.get_grasp_headers(grasps)
+            self.grasp_parameters = parameters
+        else:
+            self.restamp_grasps()
+        
+        self.evaluated_candidates = len(self.grasps)
+        if score_function is None:
+            return list(self.grasps)
+        return self.rank_grasps(score_function)
+
+
+    def get_score_function(self, object_pose=None):
+        '''
+        :param object_pose: The 4x4 transformation matrix of the object's
+        reference frame w.r.t. the reachability map's frame.
+        :type object_pose: numpy.ndarray
+        
+        :return: The score function of the planner if one is given; otherwise,
+        a function that scores wrist poses by their reachability if a
+        reachability map and an object pose are given, and None otherwise.
+        :rtype: function
+        '''
+        if self.score_function is not None:
+            return self.score_function
+        if self.reachability_map is None or object_pose is None:
+            return None
+        
+        object_pose = numpy.asarray(object_pose, dtype=float)
+        def reachability_score(wrist_poses):
+            return self.reachability_map.score(
+                    numpy.einsum('ij,njk->nik', object_pose, wrist_poses))
+        return reachability_score
+
+
+    def rank_grasps(self, score_function):
+        '''
+        Discards the cached grasps whose score is not above the score
+        threshold and sorts the remaining ones by their scores.
         
-        return grasps
+        :param score_function: A function returning the scores of wrist poses.
+        :type score_function: function
+        
+        :return: The remaining grasps, best first.
+        :rtype: moveit_msgs.msg.Grasp[]
+        '''
+        scores = score_function(self.grasp_matrices)
+        
+        # a stable sort keeps the original order of equally scored grasps
+        order = numpy.argsort(-scores, kind='mergesort')
+        return [self.grasps[i] for i in order
+                if scores[i] > self.score_threshold]
+
+
+    def plan_adaptively(self, score_function):
+        '''
+        Generates grasps by sampling the orbits coarse-to-fine around the
+        best-scoring angles (see sample_orbit_adaptively).
+        
+        :param score_function: A function returning the scores of wrist poses.
+        :type score_function: function
+        
+        :return: The evaluated grasps whose score is above the score threshold,
+        best first.
+        :rtype: moveit_msgs.msg.Grasp[]
+        '''
+        grasp_distance = self.grasp_distance
+        top_poses, top_scores = self.sample_orbit_adaptively(
+                lambda angles: self.generate_top_grasp_matrices(
+                        angles, grasp_distance),
+                score_function)
+        
+        side_poses = []
+        side_scores = []
+        for wrist_roll in [0, math.pi]:
+            poses, scores = self.sample_orbit_adaptively(
+                    lambda angles: self.generate_side_grasp_matrices(
+                            angles, grasp_distance,
+                            numpy.ones(len(angles)) * wrist_roll),
+                    score_function)
+            side_poses.append(poses)
+            side_scores.append(scores)
+        side_poses = numpy.concatenate(side_poses)
+        side_scores = numpy.concatenate(side_scores)
+        self.evaluated_candidates = len(top_scores) + len(side_scores)
+        
+        # messages are only created for the grasps that are returned
+        top_order = self.get_ranking(top_scores)
+        side_order = self.get_ranking(side_scores)
+        grasps = self.generate_grasps("spherical", top_poses[top_order],
+                self.spherical_open, self.spherical_closed,
+                self.pregrasp_distance)
+        grasps.extend(self.generate_grasps("cylindrical",
+                side_poses[side_order],
+                self.cylindrical_open, self.cylindrical_closed,
+                self.pregrasp_distance))
+        
+        scores = numpy.concatenate((top_scores[top_order],
+                                    side_scores[side_order]))
+        order = numpy.argsort(-scores, kind='mergesort')
+        return [grasps[i] for i in order]
+
+
+    def get_ranking(self, scores):
+        '''
+        :param scores: The scores of a set of candidates.
+        :type scores: numpy.ndarray (N)
+        
+        :return: The indices of the candidates whose score is above the score
+        threshold, sorted by descending score.
+        :rtype: numpy.ndarray
+        '''
+        order = numpy.argsort(-scores, kind='mergesort')
+        return order[scores[order] > self.score_threshold]
+
+
+    def sample_orbit_adaptively(self, generate_matrices, score_function):
+        '''
+        Samples an orbit coarse-to-fine: the orbit is first sampled with
+        2 * coarse_samples_per_orbit angles; afterwards, the angle step is
+        halved and the neighbours of the refined_angles best-scoring angles
+        are evaluated until the angle step of the uniform sampling with
+        samples_per_orbit is reached.
+        
+        :param generate_matrices: A function returning the wrist poses
+        (numpy.ndarray (N x 4 x 4)) for given orbit angles.
+        :type generate_matrices: function
+        
+        :param score_function: A function returning the scores of wrist poses.
+        :type score_function: function
+        
+        :return: The evaluated wrist poses and their scores.
+        :rtype: (numpy.ndarray (N x 4 x 4), numpy.ndarray (N))
+        '''
+        coarse_samples = max(1, min(int(self.coarse_samples_per_orbit),
+                                    int(self.samples_per_orbit)))
+        refinement_steps = int(math.ceil(math.log(
+                float(self.samples_per_orbit) / coarse_samples, 2)))
+        
+        # angles are represented by their indices on the finest angle grid
+        finest_samples = 2 * coarse_samples * 2 ** refinement_steps
+        angle_step = math.pi * 2.0 / finest_samples
+        index_step = 2 ** refinement_steps
+        
+        indices = numpy.arange(0, finest_samples, index_step)
+        poses = generate_matrices(indices * angle_step)
+        scores = score_function(poses)
+        for _ in range(refinement_steps):
+            index_step //= 2
+            best_indices = indices[numpy.argsort(-scores, kind='mergesort')[
+                    :self.refined_angles]]
+            new_indices = numpy.concatenate((best_indices - index_step,
+                                             best_indices + index_step))
+            new_indices = numpy.setdiff1d(new_indices % finest_samples, indices)
+            if len(new_indices) == 0:
+                continue
+            
+            new_poses = generate_matrices(new_indices * angle_step)
+            indices = numpy.concatenate((indices, new_indices))
+            poses = numpy.concatenate((poses, new_poses))
+            scores = numpy.concatenate((scores, score_function(new_poses)))
+        return poses, scores
+
+
+    def get_grasp_parameters(self):
+        '''
+        :return: The parameters that determine the generated grasps.
+        :rtype: tuple
+        '''
+        return (self.grasp_distance, self.pregrasp_distance,
+                self.samples_per_orbit, self.gripper_link,
+                tuple(self.joint_names),
+                tuple(self.cylindrical_open), tuple(self.cylindrical_closed),
+                tuple(self.spherical_open), tuple(self.spherical_closed))
+
+
+    def get_grasp_headers(self, grasps):
+        '''
+        :param grasps: A list of grasps.
+        :type grasps: moveit_msgs.msg.Grasp[]
+        
+        :return: The distinct headers of the grasps' poses and gripper
+        translations.
+        :rtype: std_msgs.msg.Header[]
+        '''
+        headers = dict()
+        for grasp in grasps:
+            for header in [grasp.grasp_pose.header,
+                           grasp.pre_grasp_approach.direction.header,
+                           grasp.post_grasp_retreat.direction.header,
+                           grasp.post_place_retreat.direction.header]:
+                headers[id(header)] = header
+        return list(headers.values())
+
+
+    def restamp_grasps(self):
+        '''
+        Sets the time stamps of the cached grasps to the current time.
+        '''
+        stamp = rospy.Time.now()
+        for header in self.grasp_headers:
+            header.stamp = stamp
 
 
     def generate_grasps_from_side(self, grasp_distance, pregrasp_distance):
@@ -58,41 +316,10 @@ class GraspPlanner:
         :return: A list of generated grasps
         :rtype: moveit_msgs.msg.Grasp[]
         '''
-        grasps = []
-        for wrist_roll in [0, math.pi]:
-            for angle_iter in range(0, 2 * int(self.samples_per_orbit)):
-                # angle is measured about z-axis in base link
-                # angle of 0 is pointing along the positive x-axis
-                angle = angle_iter * math.pi / self.samples_per_orbit
-                
-                grasp = moveit_msgs.msg.Grasp()
-                grasp.id = "cylindrical"
-                
-                # open and closed joint angles
-                grasp.pre_grasp_posture = self.generate_hand_posture(
-                        self.joint_names, self.cylindrical_open)
-                grasp.grasp_posture = self.generate_hand_posture(
-                        self.joint_names, self.cylindrical_closed)
-                
-                # pre-grasp approach description
-                grasp.pre_grasp_approach = self.generate_gripper_translation(
-                        self.gripper_link, [0.0, 0.0, 1.0], pregrasp_distance)
-                
-                # lift the object after grasping
-                grasp.post_grasp_retreat = self.generate_gripper_translation(
-                        "base_link", [0.0, 0.0, 1.0], pregrasp_distance)
-                
-                # after releasing the object, go to the post-grasp pose
-                grasp.post_place_retreat = self.generate_gripper_translation(
-                        self.gripper_link, [0.0, 0.0, -1.0], pregrasp_distance)
-                
-                wrist_pose = self.generate_side_grasp_matrix(
-                        angle, grasp_distance, wrist_roll)
-                grasp.grasp_pose = self.matrix_to_pose("object_link",
-                        wrist_pose)
-                
-                grasps.append(grasp)
-        return grasps
+        wrist_poses = self.generate_side_orbit_matrices(grasp_distance)
+        return self.generate_grasps("cylindrical", wrist_poses,
+                self.cylindrical_open, self.cylindrical_closed,
+                pregrasp_distance)
 
 
     def generate_grasps_from_top(self, grasp_distance, pregrasp_distance):
@@ -108,41 +335,119 @@ class GraspPlanner:
         :return: A list of generated grasps
         :rtype: moveit_msgs.msg.Grasp[]
         '''
+        wrist_poses = self.generate_top_orbit_matrices(grasp_distance)
+        return self.generate_grasps("spherical", wrist_poses,
+                self.spherical_open, self.spherical_closed,
+                pregrasp_distance)
+
+
+    def generate_grasps(self, grasp_id, wrist_poses, open_configuration,
+                        closed_configuration, pregrasp_distance):
+        '''
+        :param grasp_id: The identifier of the grasps.
+        :type grasp_id: String
+        
+        :param wrist_poses: The wrist poses w.r.t. the object's reference
+        frame.
+        :type wrist_poses: numpy.ndarray (N x 4 x 4)
+        
+        :param open_configuration: The joint configuration of the open hand.
+        :type open_configuration: Float[]
+        
+        :param closed_configuration: The joint configuration of the closed
+        hand.
+        :type closed_configuration: Float[]
+        
+        :param pregrasp_distance: The distance from the object to the wrist's
+        coordinate system for the pre-grasp.
+        :type distance: float
+        
+        :return: A list of generated grasps, one for each wrist pose
+        :rtype: moveit_msgs.msg.Grasp[]
+        '''
+        grasp_poses = self.matrices_to_poses("object_link", wrist_poses)
+        
+        # the hand postures and gripper translations are the same for all
+        # grasps, so they are only created once and shared between the grasps
+        # open and closed joint angles
+        pre_grasp_posture = self.generate_hand_posture(
+                self.joint_names, open_configuration)
+        grasp_posture = self.generate_hand_posture(
+                self.joint_names, closed_configuration)
+        
+        # pre-grasp approach description
+        pre_grasp_approach = self.generate_gripper_translation(
+                self.gripper_link, [0.0, 0.0, 1.0], pregrasp_distance)
+        
+        # lift the object after grasping
+        post_grasp_retreat = self.generate_gripper_translation(
+                "base_link", [0.0, 0.0, 1.0], pregrasp_distance)
+        
+        # after releasing the object, go to the post-grasp pose
+        post_place_retreat = self.generate_gripper_translation(
+                self.gripper_link, [0.0, 0.0, -1.0], pregrasp_distance)
+        
         grasps = []
-        for angle_iter in range(0, 2 * int(self.samples_per_orbit)):
-            # angle is measured about z-axis in base link
-            # angle of 0 is pointing along the positive x-axis
-            angle = angle_iter * math.pi / self.samples_per_orbit
-            
+        for grasp_pose in grasp_poses:
             grasp = moveit_msgs.msg.Grasp()
-            grasp.id = "spherical"
-            
-            # open and closed joint angles
-            grasp.pre_grasp_posture = self.generate_hand_posture(
-                    self.joint_names, self.spherical_open)
-            grasp.grasp_posture = self.generate_hand_posture(
-                    self.joint_names, self.spherical_closed)
-            
-            # pre-grasp approach description
-            grasp.pre_grasp_approach = self.generate_gripper_translation(
-                    self.gripper_link, [0.0, 0.0, 1.0], pregrasp_distance)
-            
-            # lift the object after grasping
-            grasp.post_grasp_retreat = self.generate_gripper_translation(
-                    "base_link", [0.0, 0.0, 1.0], pregrasp_distance)
-            
-            # after releasing the object, go to the post-grasp pose
-            grasp.post_place_retreat = self.generate_gripper_translation(
-                    self.gripper_link, [0.0, 0.0, -1.0], pregrasp_distance)
-            
-            wrist_pose = self.generate_top_grasp_matrix(angle, grasp_distance)
-            grasp.grasp_pose = self.matrix_to_pose("object_link",
-                    wrist_pose)
+            grasp.id = grasp_id
+            grasp.pre_grasp_posture = pre_grasp_posture
+            grasp.grasp_posture = grasp_posture
+            grasp.pre_grasp_approach = pre_grasp_approach
+            grasp.post_grasp_retreat = post_grasp_retreat
+            grasp.post_place_retreat = post_place_retreat
+            grasp.grasp_pose = grasp_pose
             
             grasps.append(grasp)
         return grasps
 
 
+    def generate_side_orbit_matrices(self, grasp_distance):
+        '''
+        :param grasp_distance: The distance from the object to the wrist's
+        coordinate system in the final grasp.
+        :type distance: float
+        
+        :return: The wrist poses of the side grasps in the order in which the
+        grasps are generated.
+        :rtype: numpy.ndarray (N x 4 x 4)
+        '''
+        # angles are measured about z-axis in base link
+        # angle of 0 is pointing along the positive x-axis
+        angles = self.generate_orbit_angles()
+        wrist_rolls = numpy.repeat([0, math.pi], len(angles))
+        angles = numpy.tile(angles, 2)
+        
+        return self.generate_side_grasp_matrices(angles, grasp_distance,
+                                                 wrist_rolls)
+
+
+    def generate_top_orbit_matrices(self, grasp_distance):
+        '''
+        :param grasp_distance: The distance from the object to the wrist's
+        coordinate system in the final grasp.
+        :type distance: float
+        
+        :return: The wrist poses of the top grasps in the order in which the
+        grasps are generated.
+        :rtype: numpy.ndarray (N x 4 x 4)
+        '''
+        # angles are measured about z-axis in base link
+        # angle of 0 is pointing along the positive x-axis
+        angles = self.generate_orbit_angles()
+        
+        return self.generate_top_grasp_matrices(angles, grasp_distance)
+
+
+    def generate_orbit_angles(self):
+        '''
+        :return: The angles (in radians) of the samples on one orbit.
+        :rtype: numpy.ndarray
+        '''
+        number_of_samples = 2 * int(self.samples_per_orbit)
+        return numpy.arange(number_of_samples) * math.pi / self.samples_per_orbit
+
+
     def generate_side_grasp_matrix(self, angle, distance, wrist_roll):
         '''
         The object's reference frame is assumed to be aligned with the robot's
@@ -165,23 +470,8 @@ class GraspPlanner:
         :return: The 4x4 translation matrix representing the wrist's pose.
         :rtype: numpy.matrix
         '''
-        wrist_orientation = numpy.matrix([
-                            [0.0,  math.sin(angle), math.cos(angle), 0.0],
-                            [0.0, -math.cos(angle), math.sin(angle), 0.0],
-                            [1.0,  0.0,  0.0, 0.0],
-                            [0.0,  0.0,  0.0, 1.0]])
-        wrist_translation = numpy.matrix([
-                            [1.0, 0.0, 0.0, 0.0],
-                            [0.0, 1.0, 0.0, 0.0],
-                            [0.0, 0.0, 1.0, -distance],
-                            [0.0, 0.0, 0.0, 1.0]])
-        rot_z = numpy.matrix([
-                [math.cos(wrist_roll), -math.sin(wrist_roll), 0.0, 0.0],
-                [math.sin(wrist_roll), math.cos(wrist_roll), 0.0, 0.0],
-                [0.0,  0.0, 1.0, 0.0],
-                [0.0,  0.0, 0.0, 1.0]])
-        
-        return wrist_orientation * wrist_translation * rot_z
+        return numpy.matrix(self.generate_side_grasp_matrices(
+                [angle], distance, [wrist_roll])[0])
 
 
     def generate_top_grasp_matrix(self, angle, distance):
@@ -202,18 +492,84 @@ class GraspPlanner:
         :return: The 4x4 translation matrix representing the wrist's pose.
         :rtype: numpy.matrix
         '''
-        wrist_orientation = numpy.matrix([
-                            [-math.sin(angle), math.cos(angle), 0.0, 0.0],
-                            [ math.cos(angle), math.sin(angle), 0.0, 0.0],
-                            [ 0.0,  0.0, -1.0, 0.0],
-                            [ 0.0,  0.0, 0.0, 1.0]])
-        wrist_translation = numpy.matrix([
-                            [1.0, 0.0, 0.0, 0.0],
-                            [0.0, 1.0, 0.0, 0.0],
-                            [0.0, 0.0, 1.0, -distance],
-                            [0.0, 0.0, 0.0, 1.0]])
+        return numpy.matrix(self.generate_top_grasp_matrices(
+                [angle], distance)[0])
+
+
+    def generate_side_grasp_matrices(self, angles, distance, wrist_rolls):
+        '''
+        Generates the wrist poses of several side grasps at once (see
+        generate_side_grasp_matrix).
+        
+        :param angles: The angles (in radians) about the z-axis of the object's
+        reference coordinate frame.
+        :type angles: Float[N]
+        
+        :param distance: The radius (in meters) of the the orbit, i.e. the
+        distance of the hand's reference frame to the object's reference frame.
+        :type distance: float
+        
+        :param wrist_rolls: The rolls (in radians) of the wrist w.r.t. the
+        hand's local coordinate frame.
+        :type wrist_rolls: Float[N]
+        
+        :return: The 4x4 translation matrices representing the wrist's poses.
+        :rtype: numpy.ndarray (N x 4 x 4)
+        '''
+        angles = numpy.asarray(angles, dtype=float)
+        wrist_rolls = numpy.asarray(wrist_rolls, dtype=float)
+        sin_angles = numpy.sin(angles)
+        cos_angles = numpy.cos(angles)
+        sin_rolls = numpy.sin(wrist_rolls)
+        cos_rolls = numpy.cos(wrist_rolls)
+        
+        # the product wrist_orientation * wrist_translation * rot_z written out
+        # for all poses; the columns of wrist_orientation are the axes of the
+        # hand, which are rotated about the hand's z-axis by the wrist roll
+        matrices = numpy.zeros((angles.shape[0], 4, 4))
+        matrices[:, 0, 0] = sin_angles * sin_rolls
+        matrices[:, 0, 1] = sin_angles * cos_rolls
+        matrices[:, 0, 2] = cos_angles
+        matrices[:, 0, 3] = -distance * cos_angles
+        matrices[:, 1, 0] = -cos_angles * sin_rolls
+        matrices[:, 1, 1] = -cos_angles * cos_rolls
+        matrices[:, 1, 2] = sin_angles
+        matrices[:, 1, 3] = -distance * sin_angles
+        matrices[:, 2, 0] = cos_rolls
+        matrices[:, 2, 1] = -sin_rolls
+        matrices[:, 3, 3] = 1.0
+        return matrices
+
+
+    def generate_top_grasp_matrices(self, angles, distance):
+        '''
+        Generates the wrist poses of several top grasps at once (see
+        generate_top_grasp_matrix).
+        
+        :param angles: The angles (in radians) about the z-axis of the object's
+        reference coordinate frame.
+        :type angles: Float[N]
+        
+        :param distance: The distance (in meters) from the hand's coordinate
+        system to the object's coordinate system.
+        :type distance: float
         
-        return wrist_orientation * wrist_translation
+        :return: The 4x4 translation matrices representing the wrist's poses.
+        :rtype: numpy.ndarray (N x 4 x 4)
+        '''
+        angles = numpy.asarray(angles, dtype=float)
+        sin_angles = numpy.sin(angles)
+        cos_angles = numpy.cos(angles)
+        
+        matrices = numpy.zeros((angles.shape[0], 4, 4))
+        matrices[:, 0, 0] = -sin_angles
+        matrices[:, 0, 1] = cos_angles
+        matrices[:, 1, 0] = cos_angles
+        matrices[:, 1, 1] = sin_angles
+        matrices[:, 2, 2] = -1.0
+        matrices[:, 2, 3] = distance
+        matrices[:, 3, 3] = 1.0
+        return matrices
 
 
     def generate_gripper_translation(self, frame, vector, distance):
@@ -276,6 +632,45 @@ class GraspPlanner:
         return pose
 
 
+    def matrices_to_poses(self, frame, matrices):
+        '''
+        Converts several transformation matrices to poses; the orientations of
+        all poses are computed at once.
+        
+        :param frame: Name of the reference frame in which the poses are
+        specified.
+        :type frame: String
+        
+        :param matrices: The 4x4 transformation matrices.
+        :type matrices: numpy.ndarray (N x 4 x 4)
+        
+        :return: The poses interpretable by ROS.
+        :rtype: geometry_msgs.msg.PoseStamped[]
+        '''
+        positions = matrices[:, 0:3, 3].tolist()
+        quaternions = quaternions_from_matrices(matrices).tolist()
+        stamp = rospy.Time.now()
+        
+        poses = []
+        for position, quat in zip(positions, quaternions):
+            pose = geometry_msgs.msg.PoseStamped()
+            
+            pose.header.frame_id = frame
+            pose.header.stamp = stamp
+            
+            pose.pose.position.x = position[0]
+            pose.pose.position.y = position[1]
+            pose.pose.position.z = position[2]
+            
+            pose.pose.orientation.x = quat[0]
+            pose.pose.orientation.y = quat[1]
+            pose.pose.orientation.z = quat[2]
+            pose.pose.orientation.w = quat[3]
+            
+            poses.append(pose)
+        return poses
+
+
     def generate_hand_posture(self, joint_names, configuration):
         '''
         :param joint_names: The name of the joints that make up the hand's
@@ -298,4 +693,51 @@ class GraspPlanner:
         posture.joint_names = joint_names
         posture.points.append(point)
         
-        return posture
\ No newline at end of file
+        return posture
+
+
+def quaternions_from_matrices(matrices):
+    '''
+    Vectorised version of tf.transformations.quaternion_from_matrix, which
+    returns the same quaternions for the rotational parts of several homogeneous
+    transformation matrices.
+    
+    :param matrices: The 4x4 transformation matrices.
+    :type matrices: numpy.ndarray (N x 4 x 4)
+    
+    :return: The quaternions in (x, y, z, w) order.
+    :rtype: numpy.ndarray (N x 4)
+    '''
+    M = numpy.asarray(matrices, dtype=numpy.float64)
+    number_of_matrices = M.shape[0]
+    diagonal = M[:, [0, 1, 2], [0, 1, 2]]
+    q = numpy.empty((number_of_matrices, 4))
+    t = numpy.empty(number_of_matrices)
+    
+    # the index of the largest diagonal element is chosen as in
+    # quaternion_from_matrix when the trace is not positive
+    i = numpy.zeros(number_of_matrices, dtype=int)
+    i[diagonal[:, 1] > diagonal[:, 0]] = 1
+    i[diagonal[:, 2] > diagonal[numpy.arange(number_of_matrices), i]] = 2
+    j = (i + 1) % 3
+    k = (i + 2) % 3
+    
+    positive_trace = numpy.trace(M, axis1=1, axis2=2) > M[:, 3, 3]
+    
+    p = positive_trace
+    t[p] = numpy.trace(M[p], axis1=1, axis2=2)
+    q[p, 3] = t[p]
+    q[p, 2] = M[p, 1, 0] - M[p, 0, 1]
+    q[p, 1] = M[p, 0, 2] - M[p, 2, 0]
+    q[p, 0] = M[p, 2, 1] - M[p, 1, 2]
+    
+    n = numpy.flatnonzero(~positive_trace)
+    i, j, k = i[n], j[n], k[n]
+    t[n] = M[n, i, i] - (M[n, j, j] + M[n, k, k]) + M[n, 3, 3]
+    q[n, i] = t[n]
+    q[n, j] = M[n, i, j] + M[n, j, i]
+    q[n, k] = M[n, k, i] + M[n, i, k]
+    q[n, 3] = M[n, k, j] - M[n, j, k]
+    
+    q *= (0.5 / numpy.sqrt(t * M[:, 3, 3]))[:, numpy.newaxis]
+    return q
@@ -0,0 +1,129 @@
+import os
+import math
+import yaml
+import numpy
+
+class ReachabilityMap:
+    '''
+    A voxelised table of reachable wrist poses w.r.t. the robot's base frame.
+    Each voxel stores, for a fixed set of approach directions (i.e. directions
+    of the wrist's z-axis), the fraction of sampled wrist rolls for which the
+    wrist pose is reachable; the fractions are stored as integers between 0
+    and 255.
+
+    :param scores: The reachability scores of the voxels.
+    :type scores: numpy.ndarray (nx x ny x nz x number of directions), uint8
+
+    :param origin: The position (in meters) of the map's corner with the
+    smallest coordinates.
+    :type origin: Float[3]
+
+    :param resolution: The side length (in meters) of a voxel.
+    :type resolution: float
+
+    :param directions: The approach directions as unit vectors.
+    :type directions: numpy.ndarray (number of directions x 3)
+    '''
+
+    def __init__(self, scores, origin, resolution, directions):
+        self.scores = scores
+        self.origin = numpy.asarray(origin, dtype=float)
+        self.resolution = float(resolution)
+        self.directions = numpy.asarray(directions, dtype=float)
+        self.shape = numpy.array(self.scores.shape[0:3])
+
+
+    @staticmethod
+    def load(file_name):
+        '''
+        Loads a map whose description is stored in the given YAML file; the
+        scores are memory-mapped instead of being read into memory.
+
+        :param file_name: Path to the map's YAML file.
+        :type file_name: String
+
+        :rtype: ReachabilityMap
+        '''
+        with open(file_name) as map_file:
+            description = yaml.safe_load(map_file)
+        data_file_name = os.path.join(os.path.dirname(file_name),
+                                      description['data_file'])
+        scores = numpy.load(data_file_name, mmap_mode='r')
+        return ReachabilityMap(scores, description['origin'],
+                               description['resolution'],
+                               description['directions'])
+
+
+    def save(self, file_name):
+        '''
+        Saves the map to a YAML file describing the map and an NPY file
+        with the scores, which is stored next to the YAML file.
+
+        :param file_name: Path to the map's YAML file.
+        :type file_name: String
+        '''
+        data_file_name = os.path.splitext(file_name)[0] + '.npy'
+        numpy.save(data_file_name, numpy.asarray(self.scores, dtype=numpy.uint8))
+        description = {'data_file': os.path.basename(data_file_name),
+                       'origin': self.origin.tolist(),
+                       'resolution': self.resolution,
+                       'directions': self.directions.tolist()}
+        with open(file_name, 'w') as map_file:
+            yaml.safe_dump(description, map_file)
+
+
+    def voxel_centres(self):
+        '''
+        :return: The centres of all voxels in the map's memory order.
+        :rtype: numpy.ndarray (number of voxels x 3)
+        '''
+        indices = numpy.indices(self.shape).reshape(3, -1).T
+        return self.origin + (indices + 0.5) * self.resolution
+
+
+    def score(self, matrices):
+        '''
+        Looks up the reachability scores of several wrist poses; poses
+        outside the map are considered unreachable.
+
+        :param matrices: The 4x4 transformation matrices of the wrist poses
+        w.r.t. the map's reference frame.
+        :type matrices: numpy.ndarray (N x 4 x 4)
+
+        :return: The scores of the poses between 0 (unreachable) and 1.
+        :rtype: numpy.ndarray (N)
+        '''
+        matrices = numpy.asarray(matrices, dtype=float)
+        indices = numpy.floor((matrices[:, 0:3, 3] - self.origin) /
+                              self.resolution).astype(int)
+        inside = numpy.all((indices >= 0) & (indices < self.shape), axis=1)
+
+        # the approach direction of a pose is the wrist's z-axis
+        approach_directions = matrices[inside, 0:3, 2]
+        direction_indices = numpy.argmax(
+                approach_directions.dot(self.directions.T), axis=1)
+
+        scores = numpy.zeros(matrices.shape[0])
+        indices = indices[inside]
+        scores[inside] = self.scores[indices[:, 0], indices[:, 1],
+                                     indices[:, 2], direction_indices] / 255.0
+        return scores
+
+
+def sphere_directions(number_of_directions):
+    '''
+    Generates approximately uniformly distributed directions on the unit
+    sphere (using a Fibonacci lattice).
+
+    :param number_of_directions: The number of generated directions.
+    :type number_of_directions: int
+
+    :return: The directions as unit vectors.
+    :rtype: numpy.ndarray (number_of_directions x 3)
+    '''
+    indices = numpy.arange(number_of_directions) + 0.5
+    z = 1.0 - 2.0 * indices / number_of_directions
+    radius = numpy.sqrt(1.0 - z * z)
+    azimuth = math.pi * (3.0 - math.sqrt(5.0)) * indices
+    return numpy.vstack((radius * numpy.cos(azimuth),
+                         radius * numpy.sin(azimuth), z)).T
@@ -1,47 +1,95 @@
+import threading
 import rospy
+import tf
 import moveit_msgs.msg
 import std_msgs.msg
 import geometry_msgs.msg
+import mdr_manipulation_msgs.srv
 import grasp_planner
+import reachability_map
 
 class GraspPlannerRosInterface:
 
     _STATE_CREATED = 0
     _STATE_IDLE = 1
-    _STATE_RESET = 2
-    _STATE_TRIGGERED = 3
 
     def __init__(self):
         self.planner = grasp_planner.GraspPlanner()
+        
+        # grasps are ranked by their reachability if a reachability map is given
+        self.base_frame = rospy.get_param('~base_frame', 'base_link')
+        self.tf_listener = None
+        map_file = rospy.get_param('~reachability_map', '')
+        if map_file:
+            rospy.loginfo('Loading reachability map %s', map_file)
+            self.planner.reachability_map = reachability_map.ReachabilityMap.load(map_file)
+            self.planner.score_threshold = rospy.get_param(
+                    '~reachability_threshold', 0.0)
+            self.tf_listener = tf.TransformListener()
+        
+        # the orbits can only be sampled adaptively if the grasps are scored
+        self.planner.orbit_sampling = rospy.get_param('~orbit_sampling',
+                self.planner.orbit_sampling)
+        self.planner.coarse_samples_per_orbit = rospy.get_param(
+                '~coarse_samples_per_orbit',
+                self.planner.coarse_samples_per_orbit)
+        self.planner.refined_angles = rospy.get_param('~refined_angles',
+                self.planner.refined_angles)
+        
         self.grasp_publisher = rospy.Publisher('~grasp', moveit_msgs.msg.Grasp)
-        self.event_subscriber = rospy.Subscriber('~event_in',
-                std_msgs.msg.String, self.event_in, queue_size = 1)
         self.event_publisher = rospy.Publisher('~event_out', std_msgs.msg.String)
         self.state = self._STATE_CREATED
         self.next_grasp = 0
         self.grasps = None
         
+        # events and service requests are handled in different threads
+        self.lock = threading.Lock()
+        
+        self.event_subscriber = rospy.Subscriber('~event_in',
+                std_msgs.msg.String, self.event_in, queue_size = 1)
+        self.grasp_service = rospy.Service('~get_grasps',
+                mdr_manipulation_msgs.srv.GetGrasps, self.get_grasps)
+        
         rospy.loginfo('Grasp planner running')
 
 
     def event_in(self, msg):
         '''
-        Handle an incoming event.
+        Handle an incoming event. Events are handled as soon as they are
+        received.
         
         :param msg: The event type. Valid events are:
         e_reset: Reset the planner and re-plan.
         e_trigger: Trigger the planner to send out the next grasp.
         :type msg: std_msgs.msg.String
         '''
-        if (msg.data == 'e_reset'):
-            self.state = self._STATE_RESET
-        elif (msg.data == 'e_trigger'):
-            if (self.state != self._STATE_CREATED):
-                self.state = self._STATE_TRIGGERED
+        with self.lock:
+            if (msg.data == 'e_reset'):
+                self.reset()
+                self.state = self._STATE_IDLE
+            elif (msg.data == 'e_trigger'):
+                if (self.state != self._STATE_CREATED):
+                    self.handle_request()
+                else:
+                    rospy.logerr('Grasp planner is not initialized yet')
             else:
-                rospy.logerr('Grasp planner is not initialized yet')
-        else:
-            rospy.logerr('Grasp planner received an invalid event')
+                rospy.logerr('Grasp planner received an invalid event')
+
+
+    def get_grasps(self, request):
+        '''
+        Handle a request for all grasps.
+        
+        :param request: The service request.
+        :type request: mdr_manipulation_msgs.srv.GetGraspsRequest
+        
+        :return: All planned grasps in the order in which they should be tried.
+        :rtype: mdr_manipulation_msgs.srv.GetGraspsResponse
+        '''
+        object_pose = self.get_object_pose()
+        with self.lock:
+            grasps = self.planner.plan(object_pose)
+        return mdr_manipulation_msgs.srv.GetGraspsResponse(grasps)
 
 
     def reset(self):
@@ -49,15 +97,47 @@ class GraspPlannerRosInterface:
         Reset the grasp planner and re-plan.
         '''
         rospy.logdebug('Planning new grasps.')
-        self.grasps = self.planner.plan()
+        self.grasps = self.planner.plan(self.get_object_pose())
+        rospy.logdebug('Evaluated %d grasp candidates.',
+                self.planner.evaluated_candidates)
         self.next_grasp = 0
         self.event_publisher.publish('e_done')
 
 
+    def get_object_pose(self):
+        '''
+        Look up the pose of the object's reference frame w.r.t. the base frame
+        if a reachability map is used.
+        
+        :return: The 4x4 transformation matrix of the object's pose or None
+        if no reachability map is used or the pose is not available.
+        :rtype: numpy.ndarray
+        '''
+        if self.tf_listener is None:
+            return None
+        
+        try:
+            self.tf_listener.waitForTransform(self.base_frame, 'object_link',
+                    rospy.Time(0), rospy.Duration(1.0))
+            (trans, rot) = self.tf_listener.lookupTransform(self.base_frame,
+                    'object_link', rospy.Time(0))
+        except tf.Exception as exc:
+            rospy.logwarn('Object pose not available; grasps are not ranked: %s',
+                    str(exc))
+            return None
+        return self.tf_listener.fromTranslationRotation(trans, rot)
+
+
     def handle_request(self):
         '''
         Handle a request by sending out a grasp.
         '''
+        # all grasps may have been discarded as unreachable
+        if (len(self.grasps) == 0):
+            rospy.logwarn('Grasp planner has no reachable grasps')
+            self.event_publisher.publish('e_done')
+            return
+        
         self.grasp_publisher.publish(self.grasps[self.next_grasp])
         self.next_grasp += 1
         
@@ -67,27 +147,7 @@ class GraspPlannerRosInterface:
             self.event_publisher.publish('e_done')
 
 
-    def step(self):
-        '''
-        Run one step of the state machine and execute the functionality
-        associated with each state.
-        '''
-        if (self.state == self._STATE_CREATED):
-            self.state = self._STATE_CREATED
-        elif (self.state == self._STATE_IDLE):
-            self.state = self._STATE_IDLE
-        elif (self.state == self._STATE_RESET):
-            self.reset()
-            self.state = self._STATE_IDLE
-        elif (self.state == self._STATE_TRIGGERED):
-            self.handle_request()
-            self.state = self._STATE_IDLE
-
-
 def main():
     rospy.init_node('grasp_planner')
     planner = GraspPlannerRosInterface()
-    
-    while (not rospy.is_shutdown()):
-        planner.step()
-        rospy.sleep(0.2)
\ No newline at end of file
+    rospy.spin()
@@ -2,12 +2,64 @@
 
 import rospy
 import mdr_simple_grasp_planner.grasp_planner
+import mdr_simple_grasp_planner.reachability_map
+import mdr_manipulation_msgs.srv
 import unittest
 import rostest
+import math
+import os
+import shutil
+import tempfile
+import numpy
+import tf
 
 PKG = 'mdr_simple_grasp_planner'
 
 
+def create_reachability_map():
+    '''
+    :return: A map of 8 x 8 x 8 voxels with a side length of 5 cm whose
+    approach directions are the positive and negative axes; only the voxels
+    (0, 3, 3) and (6, 3, 3) are reachable from the positive x-axis and the
+    voxel (3, 3, 6) is partly reachable from the negative z-axis.
+    :rtype: ReachabilityMap
+    '''
+    directions = numpy.array([[1, 0, 0], [-1, 0, 0], [0, 1, 0],
+                              [0, -1, 0], [0, 0, 1], [0, 0, -1]])
+    scores = numpy.zeros((8, 8, 8, 6), dtype=numpy.uint8)
+    scores[0, 3, 3, 0] = 255
+    scores[6, 3, 3, 0] = 255
+    scores[3, 3, 6, 5] = 128
+    return mdr_simple_grasp_planner.reachability_map.ReachabilityMap(
+            scores, [0.31, 0.31, 0.31], 0.05, directions)
+
+
+class ScoreRecorder:
+    '''
+    A smooth score function of wrist poses that prefers side grasps whose
+    approach direction points along a preferred horizontal direction and
+    top grasps whose x-axis points along that direction; the scores of all
+    evaluated poses are recorded.
+    '''
+    
+    def __init__(self, preferred_angle):
+        self.preferred_direction = numpy.array([math.cos(preferred_angle),
+                                                math.sin(preferred_angle), 0.0])
+        self.scores = []
+    
+    def __call__(self, wrist_poses):
+        scores = (3.0 + 2.0 * wrist_poses[:, 0:3, 2].dot(self.preferred_direction) +
+                  wrist_poses[:, 0:3, 0].dot(self.preferred_direction)) / 6.0
+        self.scores.extend(scores)
+        return scores
+
+
+def translation_matrix(x, y, z):
+    matrix = numpy.identity(4)
+    matrix[0:3, 3] = [x, y, z]
+    return matrix
+
+
 class TestGraspPlanner(unittest.TestCase):
 
     def test_plan(self):
@@ -16,6 +68,145 @@ class TestGraspPlanner(unittest.TestCase):
         
         self.assertGreater(len(grasps), 0)
 
+    def test_cached_grasps_are_reused(self):
+        planner = mdr_simple_grasp_planner.grasp_planner.GraspPlanner()
+        grasps = planner.plan()
+        
+        # the hand postures are shared between the grasps
+        self.assertIs(grasps[0].pre_grasp_posture, grasps[1].pre_grasp_posture)
+        
+        # without a parameter change, the cached grasps are returned again,
+        # but the returned list belongs to the caller
+        number_of_grasps = len(grasps)
+        del grasps[1:]
+        replanned_grasps = planner.plan()
+        self.assertEqual(len(replanned_grasps), number_of_grasps)
+        self.assertIs(replanned_grasps[0], grasps[0])
+        
+        planner.grasp_distance += 0.05
+        self.assertIsNot(planner.plan()[0], grasps[0])
+
+    def test_reachability_map_score(self):
+        reachability_map = create_reachability_map()
+        
+        # the approach direction is the z-axis of a pose
+        approach_from_x = translation_matrix(0.33, 0.48, 0.48)
+        approach_from_x[0:3, 0:3] = [[0, 0, 1], [0, 1, 0], [-1, 0, 0]]
+        approach_from_top = translation_matrix(0.48, 0.48, 0.63)
+        approach_from_top[0:3, 0:3] = numpy.diag([1, -1, -1])
+        approach_from_below = translation_matrix(0.48, 0.48, 0.63)
+        outside = approach_from_x.copy()
+        outside[0, 3] = 0.3
+        
+        scores = reachability_map.score(numpy.array([
+                approach_from_x, approach_from_top, approach_from_below,
+                outside]))
+        self.assertTrue(numpy.allclose(scores, [1.0, 128 / 255.0, 0.0, 0.0]))
+
+    def test_unreachable_grasps_are_discarded(self):
+        planner = mdr_simple_grasp_planner.grasp_planner.GraspPlanner()
+        planner.reachability_map = create_reachability_map()
+        all_grasps = planner.plan()
+        
+        # the side grasps at an angle of 0 are in the reachable voxel (0, 3, 3),
+        # while the side grasps at an angle of pi are in the voxel (6, 3, 3),
+        # but approach it from the negative x-axis
+        grasps = planner.plan(translation_matrix(0.5, 0.5, 0.5))
+        number_of_top_grasps = 2 * planner.samples_per_orbit
+        side_grasps_at_zero = [all_grasps[number_of_top_grasps],
+                               all_grasps[2 * number_of_top_grasps]]
+        self.assertEqual(len(grasps), number_of_top_grasps + 2)
+        self.assertEqual(grasps[0:2], side_grasps_at_zero)
+        self.assertEqual(grasps[2:], all_grasps[0:number_of_top_grasps])
+        
+        # nothing is reachable if the object is outside of the map
+        self.assertEqual(planner.plan(translation_matrix(2.0, 0.5, 0.5)), [])
+
+    def test_reachability_map_is_memory_mapped_after_loading(self):
+        reachability_map = create_reachability_map()
+        directory = tempfile.mkdtemp()
+        try:
+            file_name = os.path.join(directory, 'reachability_map.yaml')
+            reachability_map.save(file_name)
+            loaded_map = mdr_simple_grasp_planner.reachability_map.ReachabilityMap.load(
+                    file_name)
+            
+            self.assertIsInstance(loaded_map.scores, numpy.memmap)
+            self.assertTrue(numpy.array_equal(loaded_map.scores,
+                                              reachability_map.scores))
+            self.assertTrue(numpy.allclose(loaded_map.origin,
+                                           reachability_map.origin))
+            self.assertEqual(loaded_map.resolution, reachability_map.resolution)
+            self.assertTrue(numpy.allclose(loaded_map.directions,
+                                           reachability_map.directions))
+            
+            matrices = numpy.array([translation_matrix(0.33, 0.48, 0.48),
+                                    translation_matrix(0.48, 0.48, 0.63)])
+            matrices[:, 0:3, 0:3] = numpy.diag([1, -1, -1])
+            self.assertTrue(numpy.allclose(loaded_map.score(matrices),
+                                           reachability_map.score(matrices)))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_adaptive_sampling_finds_best_uniform_grasp(self):
+        planner = mdr_simple_grasp_planner.grasp_planner.GraspPlanner()
+        planner.samples_per_orbit = 32
+        planner.coarse_samples_per_orbit = 4
+        planner.refined_angles = 4
+        
+        uniform_scores = ScoreRecorder(2.0)
+        planner.score_function = uniform_scores
+        uniform_grasps = planner.plan()
+        uniform_candidates = planner.evaluated_candidates
+        self.assertEqual(uniform_candidates, len(uniform_scores.scores))
+        
+        adaptive_scores = ScoreRecorder(2.0)
+        planner.score_function = adaptive_scores
+        planner.orbit_sampling = "adaptive"
+        adaptive_grasps = planner.plan()
+        self.assertEqual(planner.evaluated_candidates,
+                         len(adaptive_scores.scores))
+        
+        self.assertLess(planner.evaluated_candidates, uniform_candidates / 2)
+        self.assertAlmostEqual(max(adaptive_scores.scores),
+                               max(uniform_scores.scores))
+        
+        # the best grasp is a side grasp at the same angle as with the uniform
+        # sampling (the wrist roll does not change the score of side grasps)
+        best_position = adaptive_grasps[0].grasp_pose.pose.position
+        expected_best_position = uniform_grasps[0].grasp_pose.pose.position
+        self.assertEqual(adaptive_grasps[0].id, "cylindrical")
+        self.assertAlmostEqual(best_position.x, expected_best_position.x)
+        self.assertAlmostEqual(best_position.y, expected_best_position.y)
+
+    def test_get_grasps_service(self):
+        service_name = '/mdr_manipulation/grasp_planner/get_grasps'
+        rospy.wait_for_service(service_name, timeout=10.0)
+        get_grasps = rospy.ServiceProxy(service_name,
+                                        mdr_manipulation_msgs.srv.GetGrasps)
+        response = get_grasps()
+        
+        planner = mdr_simple_grasp_planner.grasp_planner.GraspPlanner()
+        expected_grasps = planner.plan()
+        self.assertEqual(len(response.grasps), len(expected_grasps))
+        self.assertEqual([grasp.id for grasp in response.grasps],
+                         [grasp.id for grasp in expected_grasps])
+
+    def test_batched_grasp_matrices(self):
+        planner = mdr_simple_grasp_planner.grasp_planner.GraspPlanner()
+        angles = numpy.linspace(0.0, 2.0 * math.pi, 50)
+        wrist_rolls = numpy.tile([0.0, math.pi], 25)
+        
+        matrices = numpy.concatenate((
+                planner.generate_side_grasp_matrices(angles, 0.15, wrist_rolls),
+                planner.generate_top_grasp_matrices(angles, 0.15)))
+        quaternions = mdr_simple_grasp_planner.grasp_planner.quaternions_from_matrices(
+                matrices)
+        
+        for matrix, quaternion in zip(matrices, quaternions):
+            expected = tf.transformations.quaternion_from_matrix(matrix)
+            self.assertTrue(numpy.allclose(quaternion, expected))
+
 
 if __name__ == '__main__':
     rospy.init_node('test_grasp_planner')
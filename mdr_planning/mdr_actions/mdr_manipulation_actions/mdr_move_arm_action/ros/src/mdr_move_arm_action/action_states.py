@@ -3,10 +3,17 @@ import numpy as np
 
 import rospy
 import smach
+import tf
+import actionlib
 import moveit_commander
+from move_base_msgs.msg import MoveBaseAction
+from diagnostic_msgs.msg import DiagnosticStatus, KeyValue
 
 from mdr_move_arm_action.msg import MoveArmGoal, MoveArmFeedback, MoveArmResult
 from mdr_move_arm_action.dmp import DMPExecutor
+from mdr_move_arm_action.rollout_cache import RolloutCache
+from mdr_move_arm_action.trajectory_library import TrajectoryLibrary
+from mdr_move_arm_action.pose_plan_cache import PosePlanCache
 
 class SetupMoveArm(smach.State):
     def __init__(self):
@@ -26,19 +33,75 @@ class SetupMoveArm(smach.State):
         return 'succeeded'
 
 class MoveArm(smach.State):
-    def __init__(self, timeout=120.0, arm_name='arm'):
+    def __init__(self, timeout=120.0, arm_name='arm',
+                 dmp_rollout_cache_size=100,
+                 dmp_rollout_cache_tolerance=0.002,
+                 trajectory_library_dir=None,
+                 trajectory_library_tolerance=0.01,
+                 pose_plan_cache_dir=None,
+                 pose_plan_cache_size=200,
+                 pose_plan_cache_position_tolerance=0.005,
+                 pose_plan_cache_orientation_tolerance=0.02,
+                 pose_plan_cache_joint_tolerance=0.01,
+                 pose_plan_cache_frames=('base_link',)):
         smach.State.__init__(self, input_keys=['move_arm_goal'],
                              outcomes=['succeeded', 'failed'])
         self.timeout = timeout
         self.arm = moveit_commander.MoveGroupCommander(arm_name)
 
+        self.dmp_rollout_cache = RolloutCache(dmp_rollout_cache_size,
+                                              dmp_rollout_cache_tolerance)
+        self.dmp_rollout_cache_stats_pub = rospy.Publisher('~dmp_rollout_cache_stats',
+                                                           DiagnosticStatus,
+                                                           queue_size=1,
+                                                           latch=True)
+
+        # DMP executors are created once per DMP and reused across goals;
+        # they share a TF listener whose buffer is filled from the start
+        # and a move base client that connects to its server in the background
+        self.tf_listener = tf.TransformListener()
+        self.move_base_client = actionlib.SimpleActionClient(
+            rospy.get_param('~move_base_server', 'move_base/move'), MoveBaseAction)
+        self.dmp_executors = dict()
+
+        # trajectories to named targets are planned once per start
+        # configuration and replayed afterwards if a library is used
+        self.trajectory_library = None
+        if trajectory_library_dir:
+            self.trajectory_library = TrajectoryLibrary(trajectory_library_dir,
+                                                        trajectory_library_tolerance)
+        self.trajectory_library_stats_pub = rospy.Publisher('~trajectory_library_stats',
+                                                            DiagnosticStatus,
+                                                            queue_size=1,
+                                                            latch=True)
+
+        # trajectories to end-effector poses are cached if a cache is used;
+        # only poses in frames that are fixed w.r.t. the robot are cached
+        # since the same pose in a world frame depends on the robot's position
+        self.pose_plan_cache = None
+        self.pose_plan_cache_frames = list(pose_plan_cache_frames)
+        if pose_plan_cache_dir:
+            self.pose_plan_cache = PosePlanCache(pose_plan_cache_dir,
+                                                 pose_plan_cache_size,
+                                                 pose_plan_cache_position_tolerance,
+                                                 pose_plan_cache_orientation_tolerance,
+                                                 pose_plan_cache_joint_tolerance)
+        self.pose_plan_cache_stats_pub = rospy.Publisher('~pose_plan_cache_stats',
+                                                         DiagnosticStatus,
+                                                         queue_size=1,
+                                                         latch=True)
+
     def execute(self, userdata):
         self.arm.clear_pose_targets()
         success = False
         if userdata.move_arm_goal.goal_type == MoveArmGoal.NAMED_TARGET:
-            self.arm.set_named_target(userdata.move_arm_goal.named_target)
-            rospy.loginfo('[move_arm] Planning motion and trying to move arm...')
-            success = self.arm.go(wait=True)
+            named_target = userdata.move_arm_goal.named_target
+            self.arm.set_named_target(named_target)
+            if self.trajectory_library is not None:
+                success = self.move_to_named_target(named_target)
+            else:
+                rospy.loginfo('[move_arm] Planning motion and trying to move arm...')
+                success = self.arm.go(wait=True)
         elif userdata.move_arm_goal.goal_type == MoveArmGoal.END_EFFECTOR_POSE:
             pose = userdata.move_arm_goal.end_effector_pose
 
@@ -49,13 +112,18 @@ class MoveArm(smach.State):
             # we use a dynamic motion primitive for moving the arm if one is specified;
             # otherwise, we just use moveit for planning a trajectory and moving the arm
             if dmp_name:
-                dmp_traj_executor = DMPExecutor(dmp_name, tau)
+                dmp_traj_executor = self.get_dmp_executor(dmp_name, tau)
                 goal = np.array([pose.pose.position.x, pose.pose.position.y, pose.pose.position.z])
                 dmp_traj_executor.execute(goal)
+                self.publish_dmp_rollout_cache_stats()
             else:
                 self.arm.set_pose_reference_frame(pose.header.frame_id)
                 self.arm.set_pose_target(pose.pose)
-                success = self.arm.go(wait=True)
+                if self.pose_plan_cache is not None and \
+                   pose.header.frame_id in self.pose_plan_cache_frames:
+                    success = self.move_to_pose(pose)
+                else:
+                    success = self.arm.go(wait=True)
         elif userdata.move_arm_goal.goal_type == MoveArmGoal.JOINT_VALUES:
             joint_values = userdata.move_arm_goal.joint_values
             self.arm.set_joint_value_target(joint_values)
@@ -71,6 +139,118 @@ class MoveArm(smach.State):
         rospy.loginfo('[move_arm] Arm motion successful')
         return 'succeeded'
 
+    def move_to_named_target(self, named_target):
+        '''Moves the arm to the given named target, replaying a stored trajectory
+        if one exists for the current arm configuration; otherwise, a trajectory
+        is planned and stored in the library after it has been executed.
+
+        Keyword arguments:
+        named_target -- name of the target configuration
+
+        '''
+        success = self.move_using_stored_trajectory(self.trajectory_library,
+                                                    named_target, named_target)
+        self.publish_trajectory_library_stats()
+        return success
+
+    def move_to_pose(self, pose):
+        '''Moves the arm to the given end-effector pose, replaying a cached
+        trajectory if one exists for the pose and the current arm configuration;
+        otherwise, a trajectory is planned and cached after it has been executed.
+        The pose target needs to be set before calling this method.
+
+        Keyword arguments:
+        pose -- a 'geometry_msgs/PoseStamped' message with the goal pose
+
+        '''
+        success = self.move_using_stored_trajectory(self.pose_plan_cache, pose,
+                                                    'the goal pose')
+        self.publish_pose_plan_cache_stats()
+        return success
+
+    def move_using_stored_trajectory(self, trajectory_store, target, target_description):
+        '''Replays a trajectory from the given store if one exists for the
+        target and the current arm configuration; otherwise (or if the stored
+        trajectory cannot be executed), a trajectory to the currently set target
+        is planned and stored after it has been executed successfully.
+
+        Keyword arguments:
+        trajectory_store -- a TrajectoryLibrary or a PosePlanCache
+        target -- the target under which trajectories are stored
+        target_description -- description of the target used for logging
+
+        '''
+        group_name = self.arm.get_name()
+        joint_names = self.arm.get_active_joints()
+        joint_values = self.arm.get_current_joint_values()
+
+        trajectory = trajectory_store.get(group_name, target, joint_names, joint_values)
+        if trajectory is not None:
+            rospy.loginfo('[move_arm] Replaying stored trajectory to %s', target_description)
+            if self.arm.execute(trajectory, wait=True):
+                return True
+
+            rospy.logwarn('[move_arm] Stored trajectory to %s could not be executed; replanning',
+                          target_description)
+            trajectory_store.remove(group_name, target, joint_values)
+            joint_values = self.arm.get_current_joint_values()
+
+        rospy.loginfo('[move_arm] Planning motion and trying to move arm...')
+        trajectory = self.arm.plan()
+        if not trajectory.joint_trajectory.points:
+            return False
+
+        success = self.arm.execute(trajectory, wait=True)
+        if success:
+            trajectory_store.put(group_name, target, joint_names, joint_values, trajectory)
+        return success
+
+    def get_dmp_executor(self, dmp_name, tau):
+        '''Returns the executor for the given DMP, creating it
+        if the DMP has not been used before.
+
+        Keyword arguments:
+        dmp_name -- path to the DMP weight file
+        tau -- temporal scaling factor of the DMP
+
+        '''
+        if dmp_name not in self.dmp_executors:
+            rospy.loginfo('[move_arm] Creating an executor for DMP %s', dmp_name)
+            self.dmp_executors[dmp_name] = DMPExecutor(dmp_name, tau,
+                                                       self.dmp_rollout_cache,
+                                                       self.tf_listener,
+                                                       self.move_base_client)
+        dmp_executor = self.dmp_executors[dmp_name]
+        dmp_executor.tau = tau
+        return dmp_executor
+
+    def publish_dmp_rollout_cache_stats(self):
+        stats = DiagnosticStatus()
+        stats.level = DiagnosticStatus.OK
+        stats.name = 'dmp_rollout_cache'
+        stats.values = [KeyValue('hits', str(self.dmp_rollout_cache.hits)),
+                        KeyValue('misses', str(self.dmp_rollout_cache.misses)),
+                        KeyValue('size', str(len(self.dmp_rollout_cache)))]
+        self.dmp_rollout_cache_stats_pub.publish(stats)
+
+    def publish_trajectory_library_stats(self):
+        stats = DiagnosticStatus()
+        stats.level = DiagnosticStatus.OK
+        stats.name = 'trajectory_library'
+        stats.values = [KeyValue('hits', str(self.trajectory_library.hits)),
+                        KeyValue('misses', str(self.trajectory_library.misses))]
+        self.trajectory_library_stats_pub.publish(stats)
+
+    def publish_pose_plan_cache_stats(self):
+        stats = DiagnosticStatus()
+        stats.level = DiagnosticStatus.OK
+        stats.name = 'pose_plan_cache'
+        stats.values = [KeyValue('hits', str(self.pose_plan_cache.hits)),
+                        KeyValue('misses', str(self.pose_plan_cache.misses)),
+                        KeyValue('hit_rate', str(self.pose_plan_cache.get_hit_rate())),
+                        KeyValue('size', str(len(self.pose_plan_cache)))]
+        self.pose_plan_cache_stats_pub.publish(stats)
+
 class SetActionLibResult(smach.State):
     def __init__(self, result):
         smach.State.__init__(self, outcomes=['succeeded'],
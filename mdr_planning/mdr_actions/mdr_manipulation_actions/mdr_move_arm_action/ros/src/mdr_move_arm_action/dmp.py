@@ -1,3 +1,6 @@
+import os
+import math
+import time
 import numpy as np
 import rospy
 from std_msgs.msg import Float32MultiArray
@@ -6,12 +9,18 @@ from nav_msgs.msg import Path
 import tf
 import actionlib
 from move_base_msgs.msg import MoveBaseAction, MoveBaseGoal
+from diagnostic_msgs.msg import DiagnosticStatus, KeyValue
 
 from mdr_move_arm_action.roll_dmp import RollDMP
+from mdr_move_arm_action.trajectory_utils import PathIndex, LoopStatistics, transform_points, \
+                                                 resample_path, get_reference_step
 
 class DMPExecutor(object):
-    def __init__(self, dmp_name, tau):
-        self.tf_listener = tf.TransformListener()
+    def __init__(self, dmp_name, tau, rollout_cache=None, tf_listener=None,
+                 move_base_client=None):
+        if tf_listener is None:
+            tf_listener = tf.TransformListener()
+        self.tf_listener = tf_listener
         self.base_link_frame_name = rospy.get_param('~base_link_frame_name', '/base_link')
         self.odom_frame_name = rospy.get_param('~odom_frame_name', '/odom')
         self.map_frame_name = rospy.get_param('~map_frame_name', '/map')
@@ -24,6 +33,19 @@ class DMPExecutor(object):
         self.dmp_executor_path_topic = rospy.get_param('~path_topic', '/dmp_executor/path')
         self.move_base_server = rospy.get_param('~move_base_server', 'move_base/move')
 
+        # number of path points considered when looking for the
+        # path point that is closest to the current palm position
+        self.nearest_point_search_window = rospy.get_param('~nearest_point_search_window', 100)
+
+        # frequency (in Hz) of the velocity controller
+        self.control_frequency = float(rospy.get_param('~control_frequency', 100.))
+
+        # maximum distance (in meters) of the dense rollout from the resampled
+        # path and maximum arc length (in meters) between resampled path points;
+        # the path is not resampled if the maximum deviation is not positive
+        self.max_path_deviation = float(rospy.get_param('~max_path_deviation', 0.002))
+        self.max_path_segment_length = float(rospy.get_param('~max_path_segment_length', 0.01))
+
         self.number_of_sampling_points = 30
         self.goal_tolerance = 0.02
         self.vel_publisher_arm = rospy.Publisher(self.cartesian_velocity_topic,
@@ -38,16 +60,29 @@ class DMPExecutor(object):
         rospy.Subscriber(self.arm_controller_sigma_values_topic,
                          Float32MultiArray, self.sigma_values_cb)
         self.path_pub = rospy.Publisher(self.dmp_executor_path_topic, Path, queue_size=1)
+        self.controller_stats_pub = rospy.Publisher('~dmp_controller_stats',
+                                                    DiagnosticStatus, queue_size=1)
+
+        # the velocity messages are allocated once and reused in each control step
+        self.arm_velocity_msg = TwistStamped()
+        self.arm_velocity_msg.header.frame_id = self.odom_frame_name
+        self.base_velocity_msg = Twist()
+        self.base_velocity_odom_msg = Vector3Stamped()
+        self.base_velocity_odom_msg.header.frame_id = self.odom_frame_name
         self.goal = None
         self.dmp_name = dmp_name
         self.tau = tau
+        self.rollout_cache = rollout_cache
 
         self.min_sigma_value = None
         self.deploy_wbc = True
 
-        # Move base server
-        self.move_base_client = actionlib.SimpleActionClient(self.move_base_server, MoveBaseAction)
-        self.move_base_client.wait_for_server()
+        # Move base server; a client passed by the caller is typically
+        # created before the first goal, so it is already connected
+        if move_base_client is None:
+            move_base_client = actionlib.SimpleActionClient(self.move_base_server,
+                                                            MoveBaseAction)
+        self.move_base_client = move_base_client
 
     def sigma_values_cb(self, msg):
         self.min_sigma_value = min(msg.data)
@@ -55,29 +90,72 @@ class DMPExecutor(object):
     def move_base(self):
         move_base_goal = MoveBaseGoal()
         move_base_goal.target_pose.header.frame_id = self.map_frame_name
+        self.move_base_client.wait_for_server()
         print self.move_base_client.send_goal(move_base_goal)
 
     def generate_trajectory(self, goal, initial_pos):
         goal = np.array([goal[0], goal[1], goal[2], 0.0, 0.0, 0.0])
         initial_pos = np.array([initial_pos[0], initial_pos[1], initial_pos[2], 0.0, 0.0, 0.0])
-        self.roll = RollDMP(self.dmp_name, n_bfs=150)
-        self.pos, self.vel, self.acc = self.roll.roll(goal, initial_pos, self.tau)
-
-    def tranform_pose(self, pose):
-        #transform goals to odom frame
-        pose_msg = PoseStamped()
-        pose_msg.header.frame_id = self.base_link_frame_name
-        pose_msg.pose.position.x = pose[0]
-        pose_msg.pose.position.y = pose[1]
-        pose_msg.pose.position.z = pose[2]
 
+        # the weight file's modification time is part of the cache key
+        # so that rollouts of a modified DMP are not reused
+        rollout = None
+        if self.rollout_cache is not None:
+            dmp_key = (self.dmp_name, os.path.getmtime(self.dmp_name))
+            rollout = self.rollout_cache.get(dmp_key, goal, initial_pos, self.tau)
+
+        if rollout is None:
+            self.roll = RollDMP(self.dmp_name, n_bfs=150)
+            rollout = self.roll.roll(goal, initial_pos, self.tau)
+            if self.rollout_cache is not None:
+                self.rollout_cache.put(dmp_key, goal, initial_pos, self.tau, rollout)
+        else:
+            rospy.loginfo('[move_arm] Reusing a cached DMP rollout')
+        self.pos, self.vel, self.acc = rollout
+
+    def transform_path(self, path):
+        '''Transforms a path from the base link frame to the odom frame
+        using a single transform lookup for all path points.
+
+        Keyword arguments:
+        path -- an (N, 3) numpy array of positions in the base link frame
+
+        '''
         while not rospy.is_shutdown():
             try:
-                pose_ = self.tf_listener.transformPose(self.odom_frame_name, pose_msg)
+                self.tf_listener.waitForTransform(self.odom_frame_name,
+                                                  self.base_link_frame_name,
+                                                  rospy.Time(0),
+                                                  rospy.Duration(1.))
+                (trans, rot) = self.tf_listener.lookupTransform(self.odom_frame_name,
+                                                                self.base_link_frame_name,
+                                                                rospy.Time(0))
                 break
-            except:
-                continue
-        return np.array([pose_.pose.position.x, pose_.pose.position.y, pose_.pose.position.z])
+            except tf.Exception:
+                rospy.logwarn('[move_arm] Waiting for the %s -> %s transform',
+                              self.base_link_frame_name, self.odom_frame_name)
+        transform = self.tf_listener.fromTranslationRotation(trans, rot)
+        return transform_points(transform, path)
+
+    def resample_trajectory(self, path):
+        '''Returns an adaptively resampled version of the given path, which
+        keeps more points in curved parts of the path than in straight ones,
+        together with the number of rollout steps between consecutive points
+        of the resampled path, which the controller uses to preserve the
+        timing of the rollout.
+
+        Keyword arguments:
+        path -- an (N, 3) numpy array of path points
+
+        '''
+        if self.max_path_deviation <= 0.:
+            return path, np.ones(path.shape[0] - 1)
+
+        indices = resample_path(path, self.max_path_deviation,
+                                self.max_path_segment_length)
+        rospy.logdebug('[move_arm] Resampled DMP path from %d to %d points',
+                       path.shape[0], indices.shape[0])
+        return path[indices], np.diff(indices)
 
     def publish_path(self):
         path = Path()
@@ -91,61 +169,56 @@ class DMPExecutor(object):
         self.path_pub.publish(path)
 
     def trajectory_controller(self):
-        previous_pos = None
         count = 0
-        previous_index = 0
-        path = self.pos[:, 0:3].T
-        path_x = path[0, :]
-        path_y = path[1, :]
-        path_z = path[2, :]
+        path_points = self.pos[:, 0:3]
+        path = path_points.T
+        path_index = PathIndex(path_points, self.nearest_point_search_window)
+        goal_pos = self.pos[-1, 0:3]
+
+        rate = rospy.Rate(self.control_frequency)
+        loop_stats = LoopStatistics(1. / self.control_frequency)
+        stats_publishing_interval = max(int(self.control_frequency), 1)
+
         while not rospy.is_shutdown():
             try:
                 (trans, rot) = self.tf_listener.lookupTransform(self.odom_frame_name, self.palm_link_name, rospy.Time(0))
                 break
             except (tf.LookupException, tf.ConnectivityException, tf.ExtrapolationException):
-                continue
+                rate.sleep()
         current_pos = np.array([trans[0], trans[1], trans[2]])
-        previous_pos = current_pos[:]
-        distance = np.linalg.norm((np.array(path[:, path.shape[1] - 1]) - current_pos))
+        distance = np.linalg.norm(goal_pos - current_pos)
         followed_trajectory = []
 
         old_pos_index = 0
         while distance > self.goal_tolerance and not rospy.is_shutdown():
+            tick_start_time = time.time()
             try:
                 (trans, rot) = self.tf_listener.lookupTransform(self.odom_frame_name, self.palm_link_name, rospy.Time(0))
             except (tf.LookupException, tf.ConnectivityException, tf.ExtrapolationException):
+                rate.sleep()
                 continue
             current_pos = np.array([trans[0], trans[1], trans[2]])
-            distance = np.linalg.norm((np.array(path[:, path.shape[1] - 1]) - current_pos))
-            dist = []
-            for i in range(path.shape[1]):
-                dist.append(np.linalg.norm((path[:, i] - current_pos)))
-            index =  np.argmin(dist)
+            distance = np.linalg.norm(goal_pos - current_pos)
+            index = path_index.nearest(current_pos)
 
             if old_pos_index != index:
                 followed_trajectory.append(current_pos)
                 old_pos_index = index
 
-            if index < previous_index:
-                index = previous_index
-            else:
-                previous_index = index
-
             # Delete this block later
             if index > path.shape[1] - 1:
                 break
 
-            if index == path.shape[1] - 1:
-                ind = index
-            else:
-                ind = index + 1
-
-            vel_x = self.feedforward_gain * (path_x[ind] - path_x[index]) + self.feedback_gain * (path_x[ind] - current_pos[0])
-            vel_y = self.feedforward_gain * (path_y[ind] - path_y[index]) + self.feedback_gain * (path_y[ind] - current_pos[1])
-            vel_z = self.feedforward_gain * (path_z[ind] - path_z[index]) + self.feedback_gain * (path_z[ind] - current_pos[2])
+            # the path points are not evenly spaced after resampling, so the
+            # feedforward term uses the displacement per rollout step
+            reference, step = get_reference_step(path_points, self.path_steps,
+                                                 index, current_pos)
+            vel_x = self.feedforward_gain * step[0] + self.feedback_gain * (reference[0] - current_pos[0])
+            vel_y = self.feedforward_gain * step[1] + self.feedback_gain * (reference[1] - current_pos[1])
+            vel_z = self.feedforward_gain * step[2] + self.feedback_gain * (reference[2] - current_pos[2])
 
             # limiting speed
-            norm_ = np.linalg.norm(np.array([vel_x, vel_y, vel_z]))
+            norm_ = math.sqrt(vel_x * vel_x + vel_y * vel_y + vel_z * vel_z)
             if norm_ > 0.05:
                 vel_x = vel_x * 0.05 / norm_
                 vel_y = vel_y * 0.05 / norm_
@@ -169,48 +242,68 @@ class DMPExecutor(object):
                 vel_y_base = vel_y * (1 - ratio)
 
                 # Publish base velocity inside the if consition
-                vector_ = Vector3Stamped()
-                vector_.header.seq = count
-                vector_.header.frame_id = self.odom_frame_name
-                vector_.vector.x = vel_x_base
-                vector_.vector.y = vel_y_base
-                vector_.vector.z = vel_z_base
-
-                vector_ = self.tf_listener.transformVector3(self.base_link_frame_name, vector_)
-
-                message_base = Twist()
-                message_base.linear.x = vector_.vector.x
-                message_base.linear.y = vector_.vector.y
-                message_base.linear.z = vector_.vector.z
-                self.vel_publisher_base.publish(message_base)
-
-            message_arm = TwistStamped()
-            message_arm.header.seq = count
-            message_arm.header.frame_id = self.odom_frame_name
-            message_arm.twist.linear.x = vel_x_arm
-            message_arm.twist.linear.y = vel_y_arm
-            message_arm.twist.linear.z = vel_z_arm
-            self.vel_publisher_arm.publish(message_arm)
+                self.base_velocity_odom_msg.header.seq = count
+                self.base_velocity_odom_msg.vector.x = vel_x_base
+                self.base_velocity_odom_msg.vector.y = vel_y_base
+                self.base_velocity_odom_msg.vector.z = vel_z_base
+
+                vector_ = self.tf_listener.transformVector3(self.base_link_frame_name,
+                                                            self.base_velocity_odom_msg)
+
+                self.base_velocity_msg.linear.x = vector_.vector.x
+                self.base_velocity_msg.linear.y = vector_.vector.y
+                self.base_velocity_msg.linear.z = vector_.vector.z
+                self.vel_publisher_base.publish(self.base_velocity_msg)
+
+            self.arm_velocity_msg.header.seq = count
+            self.arm_velocity_msg.twist.linear.x = vel_x_arm
+            self.arm_velocity_msg.twist.linear.y = vel_y_arm
+            self.arm_velocity_msg.twist.linear.z = vel_z_arm
+            self.vel_publisher_arm.publish(self.arm_velocity_msg)
+            if count == 0:
+                rospy.loginfo('[move_arm] Time from goal receipt to first velocity command: %.3f s',
+                              time.time() - self.goal_receipt_time)
             count += 1
 
+            loop_stats.update(tick_start_time, time.time())
+            if count % stats_publishing_interval == 0:
+                self.publish_controller_stats(loop_stats)
+            rate.sleep()
+
         # stop arm and base motion after converging
-        message_base = Twist()
-        message_base.linear.x = 0.0
-        message_base.linear.y = 0.0
-        message_base.linear.z = 0.0
-
-        message_arm = TwistStamped()
-        message_arm.header.seq = count
-        message_arm.header.frame_id = self.odom_frame_name
-        message_arm.twist.linear.x = 0
-        message_arm.twist.linear.y = 0
-        message_arm.twist.linear.z = 0
-
-        self.vel_publisher_arm.publish(message_arm)
+        self.base_velocity_msg.linear.x = 0.0
+        self.base_velocity_msg.linear.y = 0.0
+        self.base_velocity_msg.linear.z = 0.0
+
+        self.arm_velocity_msg.header.seq = count
+        self.arm_velocity_msg.twist.linear.x = 0
+        self.arm_velocity_msg.twist.linear.y = 0
+        self.arm_velocity_msg.twist.linear.z = 0
+
+        self.vel_publisher_arm.publish(self.arm_velocity_msg)
         if self.deploy_wbc:
-            self.vel_publisher_base.publish(message_base)
+            self.vel_publisher_base.publish(self.base_velocity_msg)
+        self.publish_controller_stats(loop_stats)
+
+    def publish_controller_stats(self, loop_stats):
+        stats = DiagnosticStatus()
+        stats.name = 'dmp_controller'
+        stats.level = DiagnosticStatus.OK
+        if loop_stats.overruns > 0:
+            stats.level = DiagnosticStatus.WARN
+            stats.message = 'Control period exceeded in {0} of {1} steps'.format(loop_stats.overruns,
+                                                                                 loop_stats.iterations)
+        stats.values = [KeyValue('desired_rate', str(self.control_frequency)),
+                        KeyValue('iterations', str(loop_stats.iterations)),
+                        KeyValue('mean_jitter', str(loop_stats.mean_jitter())),
+                        KeyValue('max_jitter', str(loop_stats.max_jitter)),
+                        KeyValue('mean_compute_time', str(loop_stats.mean_compute_time())),
+                        KeyValue('max_compute_time', str(loop_stats.max_compute_time)),
+                        KeyValue('overruns', str(loop_stats.overruns))]
+        self.controller_stats_pub.publish(stats)
 
     def execute(self, goal):
+        self.goal_receipt_time = time.time()
         initial_pos = None
         try:
             self.tf_listener.waitForTransform(self.base_link_frame_name,
@@ -225,11 +318,8 @@ class DMPExecutor(object):
             initial_pos = np.zeros(3)
 
         self.generate_trajectory(goal, initial_pos)
-        pos = []
-        for i in range(self.pos.shape[0]):
-            pos.append(self.tranform_pose(self.pos[i, 0:3]))
-        pos = np.array(pos)
-        self.pos = pos
+        path, self.path_steps = self.resample_trajectory(self.pos[:, 0:3])
+        self.pos = self.transform_path(path)
         self.publish_path()
 
         # transform pose to base link
@@ -0,0 +1,123 @@
+import threading
+
+import numpy as np
+
+class DMPIntegrator(object):
+    '''Rolls out discrete dynamic motion primitives. The dynamics are the same
+    as those of pydmps' DMPs_discrete, but the canonical system trajectory
+    and the basis function activations are only computed once per
+    (n_bfs, dt, tau, ax) combination and the forcing terms of all
+    dimensions are obtained with a single matrix product.
+
+    Keyword arguments:
+    weights -- an (n_dmps, n_bfs) numpy array of basis function weights
+    dt -- integration time step
+    ay -- gains of the attractor terms (one per dimension); 25 by default
+    by -- gains of the attractor terms (one per dimension); ay / 4 by default
+    ax -- gain of the canonical system
+
+    '''
+    # canonical system trajectories and normalised basis function activations;
+    # the keys are (n_bfs, dt, tau, ax) tuples and the values are
+    # (x_track, phi) tuples, where phi = x * psi / sum(psi)
+    basis_cache = dict()
+    basis_cache_lock = threading.Lock()
+
+    def __init__(self, weights, dt=0.001, ay=None, by=None, ax=1.0):
+        self.w = np.asarray(weights, dtype=float)
+        self.n_dmps, self.n_bfs = self.w.shape
+        self.dt = dt
+        self.ax = ax
+        self.ay = np.ones(self.n_dmps) * 25. if ay is None else np.asarray(ay, dtype=float)
+        self.by = self.ay / 4. if by is None else np.asarray(by, dtype=float)
+
+        # the canonical system runs for one second
+        self.timesteps = int(1.0 / self.dt)
+
+        # basis function centres and widths, chosen as in pydmps
+        self.c = np.exp(-self.ax * np.linspace(0, 1.0, self.n_bfs))
+        self.h = np.ones(self.n_bfs) * self.n_bfs**1.5 / self.c / self.ax
+
+        # forcing term profiles (without the goal-dependent scaling) for each tau
+        self.forcing_terms = dict()
+
+    def get_basis(self, tau):
+        '''Returns the canonical system trajectory and the normalised
+        basis function activations (scaled by the canonical system value)
+        for the given temporal scaling factor.
+
+        Keyword arguments:
+        tau -- temporal scaling factor
+
+        '''
+        key = (self.n_bfs, self.dt, tau, self.ax)
+        with DMPIntegrator.basis_cache_lock:
+            basis = DMPIntegrator.basis_cache.get(key)
+        if basis is not None:
+            return basis
+
+        timesteps = int(self.timesteps / tau)
+        x_track = np.cumprod(np.ones(timesteps) * (1. - self.ax * tau * self.dt))
+        psi = np.exp(-self.h * (x_track[:, np.newaxis] - self.c)**2)
+        phi = x_track[:, np.newaxis] * psi / np.sum(psi, axis=1)[:, np.newaxis]
+
+        basis = (x_track, phi)
+        with DMPIntegrator.basis_cache_lock:
+            DMPIntegrator.basis_cache[key] = basis
+        return basis
+
+    def get_forcing_term(self, tau):
+        '''Returns a (timesteps, n_dmps) numpy array with the forcing terms
+        of all dimensions before they are scaled by (goal - y0).
+
+        Keyword arguments:
+        tau -- temporal scaling factor
+
+        '''
+        forcing_term = self.forcing_terms.get(tau)
+        if forcing_term is None:
+            _, phi = self.get_basis(tau)
+            forcing_term = phi.dot(self.w.T)
+            self.forcing_terms[tau] = forcing_term
+        return forcing_term
+
+    def rollout(self, goal, y0, tau=1.):
+        '''Rolls out the DMP for one or more goals. Returns the positions,
+        velocities, and accelerations as (timesteps, n_dmps) numpy arrays
+        if a single goal is given and as (n_goals, timesteps, n_dmps)
+        numpy arrays if a batch of goals is given.
+
+        Keyword arguments:
+        goal -- an (n_dmps,) or (n_goals, n_dmps) numpy array
+        y0 -- an (n_dmps,) or (n_goals, n_dmps) numpy array of initial positions
+        tau -- temporal scaling factor
+
+        '''
+        goal = np.asarray(goal, dtype=float)
+        single_goal = goal.ndim == 1
+        goal = np.atleast_2d(goal)
+        y0 = np.asarray(y0, dtype=float) * np.ones_like(goal)
+
+        forcing_term = self.get_forcing_term(tau)
+        timesteps = forcing_term.shape[0]
+        goal_scaling = goal - y0
+
+        y_track = np.zeros((goal.shape[0], timesteps, self.n_dmps))
+        dy_track = np.zeros_like(y_track)
+        ddy_track = np.zeros_like(y_track)
+
+        y = y0.copy()
+        dy = np.zeros_like(y)
+        for t in range(timesteps):
+            ddy = (self.ay * (self.by * (goal - y) - dy / tau) +
+                   forcing_term[t] * goal_scaling) * tau
+            dy += ddy * tau * self.dt
+            y += dy * self.dt
+
+            y_track[:, t] = y
+            dy_track[:, t] = dy
+            ddy_track[:, t] = ddy
+
+        if single_goal:
+            return y_track[0], dy_track[0], ddy_track[0]
+        return y_track, dy_track, ddy_track
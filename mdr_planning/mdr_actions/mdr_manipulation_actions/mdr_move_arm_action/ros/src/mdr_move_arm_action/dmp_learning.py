@@ -0,0 +1,126 @@
+import os
+import multiprocessing
+
+import numpy as np
+import rospy
+
+from mdr_move_arm_action.dmp_integrator import DMPIntegrator
+from mdr_move_arm_action.roll_dmp import WEIGHT_NAMES
+
+# minimum distance between the start and the goal of a demonstrated dimension;
+# as in pydmps' DMPs.check_offset, the goal is moved by this distance if
+# the start and the goal coincide, since the forcing term is scaled by (goal - y0)
+GOAL_OFFSET = 1e-4
+
+def load_demonstration(file_name):
+    '''Loads a recorded end-effector demonstration and returns it as a
+    (timesteps, 6) numpy array whose columns are x, y, z, roll, pitch, and yaw.
+
+    Keyword arguments:
+    file_name -- path to an NPY file or a text file with one pose per line
+                 (comma-separated in case of a CSV file, whitespace-separated otherwise)
+
+    '''
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == '.npy':
+        demonstration = np.load(file_name)
+    elif extension == '.csv':
+        demonstration = np.loadtxt(file_name, delimiter=',', ndmin=2)
+    else:
+        demonstration = np.loadtxt(file_name, ndmin=2)
+
+    if demonstration.ndim != 2 or demonstration.shape[1] != 6:
+        raise ValueError('Expected a demonstration with 6 columns in {0}, got shape {1}'.format(
+            file_name, demonstration.shape))
+    return np.asarray(demonstration, dtype=float)
+
+def fit_dimension(args):
+    '''Fits the basis function weights of a single DMP dimension to a
+    demonstrated trajectory using locally weighted regression (as in pydmps'
+    DMPs_discrete.imitate_path) and returns them as an (n_bfs,) numpy array.
+    The arguments are passed as a single tuple so that the function
+    can be used with multiprocessing.Pool.map. If the demonstration ends
+    where it starts (e.g. a lift-and-return motion), the goal is moved by
+    GOAL_OFFSET, so the weights reproduce the demonstration if the DMP is
+    rolled out with a goal that is GOAL_OFFSET away from the start.
+
+    Keyword arguments:
+    args -- a (trajectory, n_bfs, dt, ay, by, ax) tuple, where 'trajectory'
+            is a 1D numpy array with the demonstrated values of the dimension
+
+    '''
+    trajectory, n_bfs, dt, ay, by, ax = args
+    integrator = DMPIntegrator(np.zeros((1, n_bfs)), dt=dt, ax=ax)
+    x_track, _ = integrator.get_basis(1.)
+    psi = np.exp(-integrator.h * (x_track[:, np.newaxis] - integrator.c)**2)
+
+    # the demonstration is stretched over the duration of the canonical system
+    timesteps = x_track.shape[0]
+    y = np.interp(np.linspace(0., 1., timesteps),
+                  np.linspace(0., 1., trajectory.shape[0]), trajectory)
+    dy = np.concatenate(([0.], np.diff(y) / dt))
+    ddy = np.concatenate(([0.], np.diff(dy) / dt))
+
+    y0 = y[0]
+    goal = y[-1]
+    if abs(goal - y0) < GOAL_OFFSET:
+        goal = y0 + GOAL_OFFSET
+    goal_scaling = goal - y0
+
+    f_target = ddy - ay * (by * (goal - y) - dy)
+    numerator = (x_track * f_target).dot(psi)
+    denominator = (x_track * x_track).dot(psi)
+    return numerator / (denominator * goal_scaling)
+
+def fit_weights(demonstrations, n_bfs=150, dt=0.001, ay=10., by=None, ax=1.,
+                processes=None):
+    '''Fits RollDMP-compatible weights to a list of demonstrations. Each
+    dimension of each demonstration is fitted in a separate task of a
+    process pool. Returns a list with one (6, n_bfs) numpy array per demonstration.
+
+    Keyword arguments:
+    demonstrations -- a list of (timesteps, 6) numpy arrays
+    n_bfs -- number of basis functions per dimension
+    dt -- integration time step
+    ay -- gain of the attractor terms
+    by -- gain of the attractor terms; ay / 4 by default
+    ax -- gain of the canonical system
+    processes -- number of worker processes; the number of CPUs by default,
+                 and the fitting is done in the calling process if set to 1
+
+    '''
+    if by is None:
+        by = ay / 4.
+
+    # dimensions that move but end where they start can only be reproduced
+    # if the goal is set at least GOAL_OFFSET away from the start
+    for i, demonstration in enumerate(demonstrations):
+        for dim in range(demonstration.shape[1]):
+            trajectory = demonstration[:, dim]
+            if abs(trajectory[-1] - trajectory[0]) < GOAL_OFFSET and \
+               np.ptp(trajectory) >= GOAL_OFFSET:
+                rospy.logwarn(('Demonstration %d ends where it starts in dimension %s; ' +
+                               'the weights are fitted for a goal that is %g away from the start') %
+                              (i, WEIGHT_NAMES[dim], GOAL_OFFSET))
+
+    tasks = [(demonstration[:, dim], n_bfs, dt, ay, by, ax)
+             for demonstration in demonstrations
+             for dim in range(demonstration.shape[1])]
+
+    if processes == 1:
+        dimension_weights = [fit_dimension(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            dimension_weights = pool.map(fit_dimension, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    weights = []
+    task_index = 0
+    for demonstration in demonstrations:
+        n_dmps = demonstration.shape[1]
+        weights.append(np.array(dimension_weights[task_index:task_index+n_dmps]))
+        task_index += n_dmps
+    return weights
@@ -0,0 +1,149 @@
+import os
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from mdr_move_arm_action.trajectory_library import TrajectoryLibrary
+
+class PosePlanCache(TrajectoryLibrary):
+    '''A size-bounded on-disk cache of joint trajectories to end-effector
+    poses. Trajectories are indexed by the planning group, the goal pose
+    (its frame as well as its position and orientation quantised with the
+    given tolerances), and the start configuration of the group quantised
+    with the joint tolerance; as in the trajectory library, a stored
+    trajectory is only returned if its start configuration is within
+    the joint tolerance of the current configuration.
+
+    Once the cache is full, the least recently used trajectory is evicted;
+    trajectories stored by previous runs are ordered by their modification time.
+
+    Keyword arguments:
+    directory -- directory in which the trajectories are stored
+    max_size -- maximum number of stored trajectories
+    position_tolerance -- quantisation step (in meters) of the goal positions
+    orientation_tolerance -- quantisation step of the goal orientation quaternions
+    joint_tolerance -- quantisation step (in radians) of the start configurations
+
+    '''
+    def __init__(self, directory, max_size=200, position_tolerance=0.005,
+                 orientation_tolerance=0.02, joint_tolerance=0.01):
+        TrajectoryLibrary.__init__(self, directory, joint_tolerance)
+        self.max_size = max_size
+        self.position_tolerance = position_tolerance
+        self.orientation_tolerance = orientation_tolerance
+
+        # maps the file names of the stored trajectories to the trajectories,
+        # which are only loaded on their first use, in least recently used order
+        file_names = [os.path.join(self.directory, f) for f in os.listdir(self.directory)
+                      if f.startswith('pose__') and f.endswith('.traj')]
+        file_names.sort(key=os.path.getmtime)
+        self.trajectories = OrderedDict((file_name, None) for file_name in file_names)
+        self.evict()
+
+    def get_target_name(self, pose):
+        '''Returns a name of the quantised goal pose.
+
+        Keyword arguments:
+        pose -- a 'geometry_msgs/PoseStamped' message
+
+        '''
+        position = pose.pose.position
+        orientation = pose.pose.orientation
+        position_cell = np.round(np.array([position.x, position.y, position.z]) /
+                                 self.position_tolerance).astype(int)
+
+        # q and -q represent the same orientation
+        quaternion = np.array([orientation.x, orientation.y, orientation.z, orientation.w])
+        if quaternion[3] < 0:
+            quaternion = -quaternion
+        orientation_cell = np.round(quaternion / self.orientation_tolerance).astype(int)
+        return '{0}:{1}:{2}'.format(pose.header.frame_id, tuple(position_cell),
+                                    tuple(orientation_cell))
+
+    def get_file_name(self, key):
+        key_hash = hashlib.md5(str(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, 'pose__{0}.traj'.format(key_hash))
+
+    def get(self, group_name, pose, joint_names, joint_values):
+        '''Returns a moveit_msgs/RobotTrajectory that moves the group from
+        the given configuration to the goal pose or None if no such
+        trajectory is stored.
+
+        Keyword arguments:
+        group_name -- name of the planning group
+        pose -- a 'geometry_msgs/PoseStamped' message with the goal pose
+        joint_names -- names of the group's joints
+        joint_values -- current values of the group's joints
+
+        '''
+        key = self.get_key(group_name, self.get_target_name(pose), joint_values)
+        file_name = self.get_file_name(key)
+        with self.lock:
+            if file_name not in self.trajectories:
+                self.misses += 1
+                return None
+
+            trajectory = self.trajectories.pop(file_name)
+            if trajectory is None:
+                trajectory = self.load(file_name)
+            if trajectory is None:
+                self.misses += 1
+                return None
+
+            # the trajectory becomes the most recently used one
+            self.trajectories[file_name] = trajectory
+            if not self.starts_at(trajectory, joint_names, joint_values):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return trajectory
+
+    def put(self, group_name, pose, joint_names, joint_values, trajectory):
+        '''Stores a trajectory that moves the group from the given configuration
+        to the goal pose, evicting the least recently used trajectory if the
+        cache is full.
+
+        Keyword arguments:
+        group_name -- name of the planning group
+        pose -- a 'geometry_msgs/PoseStamped' message with the goal pose
+        joint_names -- names of the group's joints
+        joint_values -- values of the group's joints at the start of the trajectory
+        trajectory -- a moveit_msgs/RobotTrajectory message
+
+        '''
+        if self.max_size <= 0 or not trajectory.joint_trajectory.points:
+            return
+
+        key = self.get_key(group_name, self.get_target_name(pose), joint_values)
+        file_name = self.get_file_name(key)
+        self.write(file_name, trajectory)
+        with self.lock:
+            self.trajectories.pop(file_name, None)
+            self.trajectories[file_name] = trajectory
+            self.evict()
+
+    def remove(self, group_name, pose, joint_values):
+        '''Removes the trajectory stored for the given start configuration and goal pose.
+        '''
+        key = self.get_key(group_name, self.get_target_name(pose), joint_values)
+        file_name = self.get_file_name(key)
+        with self.lock:
+            self.trajectories.pop(file_name, None)
+            if os.path.isfile(file_name):
+                os.remove(file_name)
+
+    def evict(self):
+        while len(self.trajectories) > max(self.max_size, 0):
+            file_name, _ = self.trajectories.popitem(last=False)
+            if os.path.isfile(file_name):
+                os.remove(file_name)
+
+    def get_hit_rate(self):
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.
+        return float(self.hits) / lookups
+
+    def __len__(self):
+        return len(self.trajectories)
@@ -1,39 +1,103 @@
+import os
+import threading
+
 import numpy as np
 import yaml
-from pydmps.dmp_discrete import DMPs_discrete
+
+from mdr_move_arm_action.dmp_integrator import DMPIntegrator
+
+# names of the weight vectors in a weight file (one vector per DMP dimension)
+WEIGHT_NAMES = ['x', 'y', 'z', 'roll', 'pitch', 'yaw']
 
 class RollDMP():
+    # process-wide cache of loaded DMPs; the keys are
+    # (absolute file name, n_dmps, n_bfs) tuples and the values are
+    # (file modification time, DMPIntegrator object) tuples
+    dmp_cache = dict()
+    dmp_cache_lock = threading.Lock()
+
     def __init__(self, file_name, n_dmps=6, n_bfs=50):
-        weight = self.load_weights(file_name)
-        self.dmp = DMPs_discrete(n_dmps=n_dmps, n_bfs=n_bfs,
-                                 dt=0.001, ay=np.ones(n_dmps)*10.0, w=weight)
+        self.dmp = RollDMP.get_dmp(file_name, n_dmps, n_bfs)
 
     def roll(self, goal, initial_pos, tau):
-        pos, vel, acc = self.dmp.rollout(goal=goal, y0=initial_pos, tau=tau)
+        '''Rolls out the DMP. If 'goal' is an (n_goals, n_dmps) array,
+        the rollouts for all goals are computed together and the returned
+        arrays have the shape (n_goals, timesteps, n_dmps).
+
+        Keyword arguments:
+        goal -- an (n_dmps,) or (n_goals, n_dmps) numpy array
+        initial_pos -- an (n_dmps,) numpy array
+        tau -- temporal scaling factor
+
+        '''
+        pos, vel, acc = self.dmp.rollout(goal, initial_pos, tau)
         return pos, vel, acc
 
-    def load_weights(self, file_name):
-        with open(file_name) as f:
-            loadeddict = yaml.load(f)
-        x = loadeddict.get('x')
-        y = loadeddict.get('y')
-        z = loadeddict.get('z')
-        roll = loadeddict.get('roll')
-        pitch = loadeddict.get('pitch')
-        yaw = loadeddict.get('yaw')
-
-        x = np.array(x)
-        y = np.array(y)
-        z = np.array(z)
-        roll = np.array(roll)
-        pitch = np.array(pitch)
-        yaw = np.array(yaw)
-
-        weights = x
-        weights = np.vstack((weights, y))
-        weights = np.vstack((weights, z))
-        weights = np.vstack((weights, roll))
-        weights = np.vstack((weights, pitch))
-        weights = np.vstack((weights, yaw))
-
-        return weights
+    @staticmethod
+    def get_dmp(file_name, n_dmps, n_bfs):
+        '''Returns a DMP with weights loaded from the given file. Loaded DMPs
+        are cached and only reloaded if the weight file has been modified.
+
+        Keyword arguments:
+        file_name -- path to a YAML, NPY, or NPZ weight file
+        n_dmps -- number of DMP dimensions
+        n_bfs -- number of basis functions per dimension
+
+        '''
+        key = (os.path.abspath(file_name), n_dmps, n_bfs)
+        modification_time = os.path.getmtime(file_name)
+        with RollDMP.dmp_cache_lock:
+            cached_dmp = RollDMP.dmp_cache.get(key)
+        if cached_dmp is not None and cached_dmp[0] == modification_time:
+            return cached_dmp[1]
+
+        weights = load_weights(file_name)
+        if weights.shape != (n_dmps, n_bfs):
+            raise ValueError('Expected {0}x{1} weights in {2}, got {3}x{4}'.format(
+                n_dmps, n_bfs, file_name, weights.shape[0], weights.shape[1]))
+        dmp = DMPIntegrator(weights, dt=0.001, ay=np.ones(n_dmps)*10.0)
+        with RollDMP.dmp_cache_lock:
+            RollDMP.dmp_cache[key] = (modification_time, dmp)
+        return dmp
+
+def load_weights(file_name):
+    '''Loads DMP weights from a file and returns them as an
+    (n_dmps, n_bfs) numpy array. Weights stored in an NPY file
+    are memory-mapped instead of being read into memory.
+
+    Keyword arguments:
+    file_name -- path to a YAML, NPY, or NPZ weight file
+
+    '''
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == '.npy':
+        return np.load(file_name, mmap_mode='r')
+
+    if extension == '.npz':
+        # the archive keeps its file open until it is closed
+        with np.load(file_name) as weight_dict:
+            return np.array([weight_dict[name] for name in WEIGHT_NAMES], dtype=float)
+
+    with open(file_name) as f:
+        weight_dict = yaml.safe_load(f)
+    return np.array([weight_dict[name] for name in WEIGHT_NAMES], dtype=float)
+
+def save_weights(file_name, weights):
+    '''Saves DMP weights to a YAML, NPY, or NPZ file (depending on the
+    extension of the file name) using the x/y/z/roll/pitch/yaw layout.
+
+    Keyword arguments:
+    file_name -- path of the weight file
+    weights -- an (n_dmps, n_bfs) numpy array of weights
+
+    '''
+    weights = np.asarray(weights, dtype=float)
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == '.npy':
+        np.save(file_name, weights)
+    elif extension == '.npz':
+        np.savez(file_name, **dict(zip(WEIGHT_NAMES, weights)))
+    else:
+        weight_dict = dict((name, w.tolist()) for name, w in zip(WEIGHT_NAMES, weights))
+        with open(file_name, 'w') as f:
+            yaml.safe_dump(weight_dict, f)
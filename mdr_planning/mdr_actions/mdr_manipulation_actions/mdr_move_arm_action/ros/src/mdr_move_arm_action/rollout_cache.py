@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+class RolloutCache(object):
+    '''A least-recently-used cache of DMP rollouts. Rollouts are indexed by
+    the DMP name, the goal and start positions quantised with a given
+    tolerance, and tau, such that goals that are repeated within the
+    tolerance reuse a previously computed rollout.
+
+    Keyword arguments:
+    max_size -- maximum number of stored rollouts
+    tolerance -- quantisation step (in meters) of the goal and start positions
+
+    '''
+    def __init__(self, max_size=100, tolerance=0.002):
+        self.max_size = max_size
+        self.tolerance = tolerance
+        self.rollouts = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_key(self, dmp_name, goal, initial_pos, tau):
+        goal_cell = tuple(np.round(np.asarray(goal, dtype=float) / self.tolerance).astype(int))
+        start_cell = tuple(np.round(np.asarray(initial_pos, dtype=float) / self.tolerance).astype(int))
+        return (dmp_name, goal_cell, start_cell, float(tau))
+
+    def get(self, dmp_name, goal, initial_pos, tau):
+        '''Returns a cached rollout for the given DMP parameters
+        or None if no such rollout exists.
+        '''
+        key = self.get_key(dmp_name, goal, initial_pos, tau)
+        with self.lock:
+            rollout = self.rollouts.pop(key, None)
+            if rollout is None:
+                self.misses += 1
+                return None
+            self.rollouts[key] = rollout
+            self.hits += 1
+        return rollout
+
+    def put(self, dmp_name, goal, initial_pos, tau, rollout):
+        '''Stores a rollout for the given DMP parameters, evicting the least
+        recently used rollout if the cache is full. The arrays of the stored
+        rollout are made read-only since they are shared between lookups.
+        '''
+        if self.max_size <= 0:
+            return
+
+        for values in rollout:
+            values.flags.writeable = False
+
+        key = self.get_key(dmp_name, goal, initial_pos, tau)
+        with self.lock:
+            self.rollouts.pop(key, None)
+            self.rollouts[key] = rollout
+            while len(self.rollouts) > self.max_size:
+                self.rollouts.popitem(last=False)
+
+    def __len__(self):
+        return len(self.rollouts)
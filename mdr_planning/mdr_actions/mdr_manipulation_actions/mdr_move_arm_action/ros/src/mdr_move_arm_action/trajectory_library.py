@@ -0,0 +1,128 @@
+import os
+import hashlib
+import threading
+from io import BytesIO
+
+import numpy as np
+from moveit_msgs.msg import RobotTrajectory
+
+class TrajectoryLibrary(object):
+    '''An on-disk library of planned joint trajectories. Trajectories are
+    indexed by the planning group, the named target, and the start
+    configuration of the group quantised with a given tolerance; a stored
+    trajectory is only returned if its start configuration is within the
+    tolerance of the current configuration.
+
+    Keyword arguments:
+    directory -- directory in which the trajectories are stored
+    tolerance -- quantisation step (in radians) of the start configurations
+
+    '''
+    def __init__(self, directory, tolerance=0.01):
+        self.directory = directory
+        self.tolerance = tolerance
+        self.trajectories = dict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def get_key(self, group_name, named_target, joint_values):
+        start_cell = tuple(np.round(np.asarray(joint_values, dtype=float) / self.tolerance).astype(int))
+        return (group_name, named_target, start_cell)
+
+    def get_file_name(self, key):
+        group_name, named_target, start_cell = key
+        cell_hash = hashlib.md5(str(start_cell).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, '{0}__{1}__{2}.traj'.format(group_name,
+                                                                      named_target,
+                                                                      cell_hash))
+
+    def get(self, group_name, named_target, joint_names, joint_values):
+        '''Returns a moveit_msgs/RobotTrajectory that moves the group from
+        the given configuration to the named target or None if no
+        such trajectory is stored.
+
+        Keyword arguments:
+        group_name -- name of the planning group
+        named_target -- name of the target configuration
+        joint_names -- names of the group's joints
+        joint_values -- current values of the group's joints
+
+        '''
+        key = self.get_key(group_name, named_target, joint_values)
+        with self.lock:
+            if key not in self.trajectories:
+                self.trajectories[key] = self.load(self.get_file_name(key))
+            trajectory = self.trajectories[key]
+
+            if trajectory is None or not self.starts_at(trajectory, joint_names, joint_values):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return trajectory
+
+    def put(self, group_name, named_target, joint_names, joint_values, trajectory):
+        '''Stores a trajectory that moves the group from the
+        given configuration to the named target.
+
+        Keyword arguments:
+        group_name -- name of the planning group
+        named_target -- name of the target configuration
+        joint_names -- names of the group's joints
+        joint_values -- values of the group's joints at the start of the trajectory
+        trajectory -- a moveit_msgs/RobotTrajectory message
+
+        '''
+        if not trajectory.joint_trajectory.points:
+            return
+
+        key = self.get_key(group_name, named_target, joint_values)
+        self.write(self.get_file_name(key), trajectory)
+        with self.lock:
+            self.trajectories[key] = trajectory
+
+    def remove(self, group_name, named_target, joint_values):
+        '''Removes the trajectory stored for the given start configuration and target.
+        '''
+        key = self.get_key(group_name, named_target, joint_values)
+        file_name = self.get_file_name(key)
+        with self.lock:
+            self.trajectories.pop(key, None)
+            if os.path.isfile(file_name):
+                os.remove(file_name)
+
+    def write(self, file_name, trajectory):
+        buff = BytesIO()
+        trajectory.serialize(buff)
+
+        # the trajectory is first written to a temporary file so that
+        # a partially written file is never read by another process
+        temp_file_name = '{0}.{1}.tmp'.format(file_name, os.getpid())
+        with open(temp_file_name, 'wb') as f:
+            f.write(buff.getvalue())
+        os.rename(temp_file_name, file_name)
+
+    def load(self, file_name):
+        if not os.path.isfile(file_name):
+            return None
+        with open(file_name, 'rb') as f:
+            trajectory = RobotTrajectory()
+            trajectory.deserialize(f.read())
+        return trajectory
+
+    def starts_at(self, trajectory, joint_names, joint_values):
+        '''Checks whether the first point of the trajectory is within
+        the tolerance of the given joint configuration.
+        '''
+        current_values = dict(zip(joint_names, joint_values))
+        start_point = trajectory.joint_trajectory.points[0]
+        for joint_name, position in zip(trajectory.joint_trajectory.joint_names,
+                                        start_point.positions):
+            if joint_name not in current_values:
+                return False
+            if abs(current_values[joint_name] - position) > self.tolerance:
+                return False
+        return True
@@ -0,0 +1,190 @@
+import numpy as np
+
+class PathIndex(object):
+    '''Nearest-waypoint lookup for a path that is followed from start to end.
+
+    Since the controller never moves backwards along the path, the nearest
+    waypoint is only searched for in a fixed-size window that starts at the
+    previously returned index, such that the cost of a lookup does not
+    depend on the length of the path.
+
+    Keyword arguments:
+    path -- an (N, 3) numpy array of waypoints
+    window_size -- number of waypoints considered in a single lookup
+
+    '''
+    def __init__(self, path, window_size=100):
+        self.path = np.asarray(path, dtype=float)
+        self.window_size = max(int(window_size), 1)
+        self.last_index = 0
+
+    def nearest(self, point):
+        '''Returns the index of the waypoint closest to the given point;
+        the returned index is never smaller than the previously returned one.
+
+        Keyword arguments:
+        point -- a 3D position given as a list or numpy array
+
+        '''
+        start = self.last_index
+        end = min(start + self.window_size, self.path.shape[0])
+        diff = self.path[start:end] - np.asarray(point, dtype=float)
+        squared_distances = np.einsum('ij,ij->i', diff, diff)
+        self.last_index = start + int(np.argmin(squared_distances))
+        return self.last_index
+
+def transform_points(transform, points):
+    '''Applies a homogeneous transformation to a set of points
+    and returns the transformed points as an (N, 3) numpy array.
+
+    Keyword arguments:
+    transform -- a 4x4 homogeneous transformation matrix
+    points -- an (N, 3) numpy array of points
+
+    '''
+    transform = np.asarray(transform, dtype=float)
+    points = np.asarray(points, dtype=float)
+    return points.dot(transform[0:3, 0:3].T) + transform[0:3, 3]
+
+class LoopStatistics(object):
+    '''Timing statistics of a loop that is supposed to run at a fixed rate.
+
+    Keyword arguments:
+    period -- the desired loop period in seconds
+
+    '''
+    def __init__(self, period):
+        self.period = period
+        self.iterations = 0
+        self.last_start_time = None
+        self.jitter_sum = 0.
+        self.max_jitter = 0.
+        self.compute_time_sum = 0.
+        self.max_compute_time = 0.
+        self.overruns = 0
+
+    def update(self, start_time, end_time):
+        '''Registers one loop iteration.
+
+        Keyword arguments:
+        start_time -- time (in seconds) at which the iteration started
+        end_time -- time (in seconds) at which the iteration's work was done
+
+        '''
+        if self.last_start_time is not None:
+            jitter = abs((start_time - self.last_start_time) - self.period)
+            self.jitter_sum += jitter
+            self.max_jitter = max(self.max_jitter, jitter)
+        self.last_start_time = start_time
+
+        compute_time = end_time - start_time
+        self.compute_time_sum += compute_time
+        self.max_compute_time = max(self.max_compute_time, compute_time)
+        if compute_time > self.period:
+            self.overruns += 1
+        self.iterations += 1
+
+    def mean_jitter(self):
+        if self.iterations < 2:
+            return 0.
+        return self.jitter_sum / (self.iterations - 1)
+
+    def mean_compute_time(self):
+        if self.iterations == 0:
+            return 0.
+        return self.compute_time_sum / self.iterations
+
+def point_segment_distances(points, segment_start, segment_end):
+    '''Returns the distances of a set of points from a line segment.
+
+    Keyword arguments:
+    points -- an (N, 3) numpy array of points
+    segment_start -- start point of the segment
+    segment_end -- end point of the segment
+
+    '''
+    segment = segment_end - segment_start
+    squared_length = segment.dot(segment)
+    offsets = points - segment_start
+    if squared_length > 0.:
+        t = np.clip(offsets.dot(segment) / squared_length, 0., 1.)
+        offsets = offsets - t[:, np.newaxis] * segment
+    return np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+
+def resample_path(path, max_deviation, max_segment_length=None):
+    '''Selects a subset of the points of a densely sampled path such that
+    the polyline through the selected points deviates from each of the
+    original points by at most 'max_deviation'; points are thus kept
+    densely where the path is curved and sparsely where it is straight.
+    If 'max_segment_length' is given, the path is first split into pieces
+    of (approximately) that arc length, whose end points are always kept.
+
+    Returns a sorted numpy array with the indices of the selected points;
+    the first and last point are always selected.
+
+    Keyword arguments:
+    path -- an (N, 3) numpy array of points
+    max_deviation -- maximum allowed distance (in meters) of an original point
+                     from the corresponding segment of the resampled path
+    max_segment_length -- maximum arc length (in meters) between selected points
+
+    '''
+    path = np.asarray(path, dtype=float)
+    number_of_points = path.shape[0]
+    if number_of_points < 3:
+        return np.arange(number_of_points)
+
+    keep = np.zeros(number_of_points, dtype=bool)
+    keep[0] = keep[-1] = True
+    if max_segment_length:
+        step_lengths = np.linalg.norm(np.diff(path, axis=0), axis=1)
+        arc_length = np.concatenate(([0.], np.cumsum(step_lengths)))
+        split_lengths = np.arange(max_segment_length, arc_length[-1], max_segment_length)
+        split_indices = np.searchsorted(arc_length, split_lengths, side='right') - 1
+        keep[split_indices] = True
+
+    # Ramer-Douglas-Peucker simplification between consecutive kept points
+    kept_indices = np.flatnonzero(keep)
+    segments = list(zip(kept_indices[:-1], kept_indices[1:]))
+    while segments:
+        start, end = segments.pop()
+        if end - start < 2:
+            continue
+        distances = point_segment_distances(path[start+1:end], path[start], path[end])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > max_deviation:
+            farthest += start + 1
+            keep[farthest] = True
+            segments.append((start, farthest))
+            segments.append((farthest, end))
+    return np.flatnonzero(keep)
+
+def get_reference_step(path, path_steps, index, point):
+    '''Returns the reference position and the feedforward displacement
+    of a path follower for a path whose points are not evenly spaced in time
+    (e.g. a resampled rollout). The reference position is one rollout step
+    ahead of the projection of the given point onto the path segment that
+    starts at 'index'; the feedforward displacement is the mean displacement
+    per rollout step along that segment, such that the commanded velocity
+    follows the timing of the rollout regardless of the spacing of the points.
+
+    Keyword arguments:
+    path -- an (N, 3) numpy array of path points
+    path_steps -- an (N-1,) array with the number of rollout steps between
+                  consecutive path points (all ones for the full rollout)
+    index -- index of the path point closest to the given point
+    point -- the current position as a numpy array
+
+    '''
+    if index >= path.shape[0] - 1:
+        return path[-1], np.zeros(3)
+
+    segment_start = path[index]
+    segment = path[index+1] - segment_start
+    steps = max(float(path_steps[index]), 1.)
+    squared_length = segment.dot(segment)
+    t = 0.
+    if squared_length > 0.:
+        t = min(max((point - segment_start).dot(segment) / squared_length, 0.), 1.)
+    reference = segment_start + min(t + 1. / steps, 1.) * segment
+    return reference, segment / steps
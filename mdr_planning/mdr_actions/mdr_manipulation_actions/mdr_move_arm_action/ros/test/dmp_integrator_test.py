@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+import unittest
+import numpy as np
+import rosunit
+from pydmps.dmp_discrete import DMPs_discrete
+
+from mdr_move_arm_action.dmp_integrator import DMPIntegrator
+
+PKG = 'mdr_move_arm_action'
+
+
+class TestDMPIntegrator(unittest.TestCase):
+
+    def setUp(self):
+        self.n_dmps = 6
+        self.n_bfs = 50
+        self.ay = np.ones(self.n_dmps) * 10.0
+        self.weights = np.random.RandomState(0).normal(0., 100., (self.n_dmps, self.n_bfs))
+        self.y0 = np.array([0.2, -0.1, 0.9, 0., 0., 0.])
+        self.goal = np.array([0.6, 0.1, 0.8, 0.1, 0., -0.2])
+
+    def reference_rollout(self, goal, tau):
+        dmp = DMPs_discrete(n_dmps=self.n_dmps, n_bfs=self.n_bfs,
+                            dt=0.001, ay=self.ay, w=self.weights)
+        dmp.goal = goal.copy()
+        dmp.y0 = self.y0.copy()
+        return dmp.rollout(tau=tau)
+
+    def test_rollout_matches_pydmps(self):
+        integrator = DMPIntegrator(self.weights, dt=0.001, ay=self.ay)
+        for tau in [0.5, 1., 30.]:
+            reference = self.reference_rollout(self.goal, tau)
+            rollout = integrator.rollout(self.goal, self.y0, tau)
+            for reference_values, values in zip(reference, rollout):
+                self.assertEqual(reference_values.shape, values.shape)
+                np.testing.assert_allclose(values, reference_values, rtol=1e-9, atol=1e-9)
+
+    def test_batch_rollout(self):
+        integrator = DMPIntegrator(self.weights, dt=0.001, ay=self.ay)
+        goals = np.array([self.goal, self.goal + 0.1, self.goal - 0.2])
+        pos, vel, acc = integrator.rollout(goals, self.y0, 1.)
+        self.assertEqual(pos.shape, (3, 1000, self.n_dmps))
+        for i, goal in enumerate(goals):
+            reference_pos, _, _ = self.reference_rollout(goal, 1.)
+            np.testing.assert_allclose(pos[i], reference_pos, rtol=1e-9, atol=1e-9)
+
+
+if __name__ == '__main__':
+    rosunit.unitrun(PKG, 'test_dmp_integrator', TestDMPIntegrator)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+import unittest
+import numpy as np
+import rosunit
+
+from mdr_move_arm_action.dmp_integrator import DMPIntegrator
+from mdr_move_arm_action.dmp_learning import fit_weights, GOAL_OFFSET
+
+PKG = 'mdr_move_arm_action'
+
+
+class TestDMPLearning(unittest.TestCase):
+
+    def setUp(self):
+        self.n_bfs = 150
+        self.ay = 10.
+        t = np.linspace(0., 1., 200)
+
+        # the end effector moves forward and sideways while it is lifted
+        # and lowered again, i.e. the z dimension ends where it starts
+        self.demonstration = np.zeros((t.shape[0], 6))
+        self.demonstration[:, 0] = 0.2 + 0.3 * t
+        self.demonstration[:, 1] = -0.1 + 0.2 * (3 * t**2 - 2 * t**3)
+        self.demonstration[:, 2] = 0.8 + 0.1 * np.sin(np.pi * t)
+        self.demonstration[:, 5] = 0.3
+
+    def rollout(self, weights, goal):
+        integrator = DMPIntegrator(weights, dt=0.001, ay=np.ones(6) * self.ay)
+        pos, _, _ = integrator.rollout(goal, self.demonstration[0], 1.)
+        return pos
+
+    def resampled_demonstration(self, timesteps):
+        t = np.linspace(0., 1., self.demonstration.shape[0])
+        return np.array([np.interp(np.linspace(0., 1., timesteps), t, self.demonstration[:, dim])
+                         for dim in range(6)]).T
+
+    def test_fit_rollout_round_trip(self):
+        weights = fit_weights([self.demonstration], n_bfs=self.n_bfs,
+                              ay=self.ay, processes=1)[0]
+        self.assertEqual(weights.shape, (6, self.n_bfs))
+
+        # the goals of the dimensions that end where they start
+        # are moved as during the fitting
+        goal = self.demonstration[-1].copy()
+        no_offset = np.abs(goal - self.demonstration[0]) < GOAL_OFFSET
+        goal[no_offset] += GOAL_OFFSET
+
+        pos = self.rollout(weights, goal)
+        expected_pos = self.resampled_demonstration(pos.shape[0])
+        np.testing.assert_allclose(pos, expected_pos, atol=0.01)
+
+        # the lift is reproduced rather than flattened
+        self.assertGreater(np.max(pos[:, 2]), 0.89)
+        self.assertAlmostEqual(pos[-1, 2], 0.8, delta=0.005)
+
+    def test_parallel_fitting(self):
+        demonstrations = [self.demonstration, self.demonstration[::-1]]
+        weights = fit_weights(demonstrations, n_bfs=self.n_bfs, ay=self.ay, processes=1)
+        parallel_weights = fit_weights(demonstrations, n_bfs=self.n_bfs, ay=self.ay, processes=2)
+        for w, parallel_w in zip(weights, parallel_weights):
+            np.testing.assert_allclose(parallel_w, w)
+
+
+if __name__ == '__main__':
+    rosunit.unitrun(PKG, 'test_dmp_learning', TestDMPLearning)
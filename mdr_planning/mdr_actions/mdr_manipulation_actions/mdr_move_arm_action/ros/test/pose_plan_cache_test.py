@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+import rosunit
+from geometry_msgs.msg import PoseStamped
+from moveit_msgs.msg import RobotTrajectory
+from trajectory_msgs.msg import JointTrajectoryPoint
+
+from mdr_move_arm_action.pose_plan_cache import PosePlanCache
+
+PKG = 'mdr_move_arm_action'
+
+
+def create_pose(x, y, z, frame_id='base_link'):
+    pose = PoseStamped()
+    pose.header.frame_id = frame_id
+    pose.pose.position.x = x
+    pose.pose.position.y = y
+    pose.pose.position.z = z
+    pose.pose.orientation.w = 1.
+    return pose
+
+
+class TestPosePlanCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.joint_names = ['arm_joint_1', 'arm_joint_2']
+        self.joint_values = [0.1, -0.2]
+        self.poses = [create_pose(0.4, 0.1 * i, 0.8) for i in range(3)]
+
+        self.trajectory = RobotTrajectory()
+        self.trajectory.joint_trajectory.joint_names = self.joint_names
+        self.trajectory.joint_trajectory.points = [JointTrajectoryPoint(positions=self.joint_values),
+                                                   JointTrajectoryPoint(positions=[0.5, 0.5])]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get(self, cache, pose):
+        return cache.get('arm', pose, self.joint_names, self.joint_values)
+
+    def put(self, cache, pose):
+        cache.put('arm', pose, self.joint_names, self.joint_values, self.trajectory)
+
+    def stored_files(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_least_recently_used_trajectory_is_evicted(self):
+        cache = PosePlanCache(self.directory, max_size=2)
+        self.put(cache, self.poses[0])
+        files_of_first_pose = self.stored_files()
+        self.put(cache, self.poses[1])
+        self.assertEqual(len(self.stored_files()), 2)
+
+        # the trajectory to the first pose becomes the most recently used one,
+        # so the trajectory to the second pose and its file are removed
+        self.assertIsNotNone(self.get(cache, self.poses[0]))
+        self.put(cache, self.poses[2])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(len(self.stored_files()), 2)
+        self.assertTrue(set(files_of_first_pose).issubset(self.stored_files()))
+        self.assertIsNone(self.get(cache, self.poses[1]))
+        self.assertIsNotNone(self.get(cache, self.poses[2]))
+
+    def test_stored_trajectories_are_evicted_on_startup(self):
+        cache = PosePlanCache(self.directory, max_size=3)
+        for i, pose in enumerate(self.poses):
+            self.put(cache, pose)
+            file_name = cache.get_file_name(cache.get_key('arm', cache.get_target_name(pose),
+                                                          self.joint_values))
+            os.utime(file_name, (1000. + i, 1000. + i))
+
+        # the oldest trajectory is removed if the cache is smaller than before
+        cache = PosePlanCache(self.directory, max_size=2)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(len(self.stored_files()), 2)
+        self.assertIsNone(self.get(cache, self.poses[0]))
+        self.assertIsNotNone(self.get(cache, self.poses[1]))
+        self.assertIsNotNone(self.get(cache, self.poses[2]))
+
+    def test_disabled_cache(self):
+        cache = PosePlanCache(self.directory, max_size=0)
+        self.put(cache, self.poses[0])
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_hit_rate(self):
+        cache = PosePlanCache(self.directory, max_size=10, position_tolerance=0.005)
+        self.assertEqual(cache.get_hit_rate(), 0.)
+
+        self.assertIsNone(self.get(cache, self.poses[0]))
+        self.put(cache, self.poses[0])
+        self.assertIsNotNone(self.get(cache, self.poses[0]))
+
+        # a goal within the position tolerance reuses the trajectory
+        self.assertIsNotNone(self.get(cache, create_pose(0.401, 0.001, 0.799)))
+        self.assertIsNone(self.get(cache, create_pose(0.4, 0., 0.8, frame_id='map')))
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 2)
+        self.assertAlmostEqual(cache.get_hit_rate(), 0.5)
+
+
+if __name__ == '__main__':
+    rosunit.unitrun(PKG, 'test_pose_plan_cache', TestPosePlanCache)
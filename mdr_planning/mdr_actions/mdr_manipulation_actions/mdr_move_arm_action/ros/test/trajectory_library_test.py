@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+import rosunit
+from moveit_msgs.msg import RobotTrajectory
+from trajectory_msgs.msg import JointTrajectoryPoint
+
+from mdr_move_arm_action.trajectory_library import TrajectoryLibrary
+
+PKG = 'mdr_move_arm_action'
+
+
+def create_trajectory(joint_names, start_values, end_values):
+    trajectory = RobotTrajectory()
+    trajectory.joint_trajectory.joint_names = list(joint_names)
+    trajectory.joint_trajectory.points = [JointTrajectoryPoint(positions=list(start_values)),
+                                          JointTrajectoryPoint(positions=list(end_values))]
+    return trajectory
+
+
+class TestTrajectoryLibrary(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.library = TrajectoryLibrary(self.directory, tolerance=0.01)
+        self.joint_names = ['arm_joint_1', 'arm_joint_2']
+        self.start_values = [0.1, -0.2]
+        self.trajectory = create_trajectory(self.joint_names, self.start_values, [0.5, 0.5])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get(self, library, joint_values, named_target='folded'):
+        return library.get('arm', named_target, self.joint_names, joint_values)
+
+    def test_start_configurations_within_tolerance_are_found(self):
+        self.library.put('arm', 'folded', self.joint_names, self.start_values, self.trajectory)
+        self.assertIs(self.get(self.library, [0.102, -0.197]), self.trajectory)
+        self.assertIsNone(self.get(self.library, [0.13, -0.2]))
+        self.assertIsNone(self.get(self.library, self.start_values, 'extended'))
+        self.assertEqual(self.library.hits, 1)
+        self.assertEqual(self.library.misses, 2)
+
+    def test_trajectory_has_to_start_at_current_configuration(self):
+        # the start configuration of the stored trajectory is in the same
+        # quantisation cell, but further away than the tolerance
+        trajectory = create_trajectory(self.joint_names, [0.11, -0.2], [0.5, 0.5])
+        self.library.put('arm', 'folded', self.joint_names, [0.104, -0.2], trajectory)
+        self.assertIsNone(self.get(self.library, [0.096, -0.2]))
+        self.assertIs(self.get(self.library, [0.104, -0.2]), trajectory)
+
+        self.assertTrue(self.library.starts_at(trajectory, self.joint_names, [0.11, -0.195]))
+        self.assertFalse(self.library.starts_at(trajectory, self.joint_names, [0.11, -0.22]))
+        self.assertFalse(self.library.starts_at(trajectory, ['arm_joint_1'], [0.11]))
+
+    def test_trajectories_are_persistent(self):
+        self.library.put('arm', 'folded', self.joint_names, self.start_values, self.trajectory)
+        self.assertEqual([f for f in os.listdir(self.directory) if not f.endswith('.traj')], [])
+
+        library = TrajectoryLibrary(self.directory, tolerance=0.01)
+        trajectory = self.get(library, self.start_values)
+        self.assertIsNotNone(trajectory)
+        self.assertEqual(trajectory.joint_trajectory.joint_names, self.joint_names)
+        self.assertEqual(list(trajectory.joint_trajectory.points[-1].positions), [0.5, 0.5])
+
+        library.remove('arm', 'folded', self.start_values)
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertIsNone(self.get(TrajectoryLibrary(self.directory), self.start_values))
+
+    def test_interrupted_write_keeps_stored_trajectory(self):
+        self.library.put('arm', 'folded', self.joint_names, self.start_values, self.trajectory)
+
+        # the process stops after writing the temporary file
+        # but before it replaces the stored trajectory
+        def interrupted_rename(source, destination):
+            raise OSError('interrupted')
+
+        rename = os.rename
+        os.rename = interrupted_rename
+        try:
+            new_trajectory = create_trajectory(self.joint_names, self.start_values, [0.9, 0.9])
+            self.assertRaises(OSError, self.library.put, 'arm', 'folded',
+                              self.joint_names, self.start_values, new_trajectory)
+        finally:
+            os.rename = rename
+
+        trajectory = self.get(TrajectoryLibrary(self.directory), self.start_values)
+        self.assertEqual(list(trajectory.joint_trajectory.points[-1].positions), [0.5, 0.5])
+
+
+if __name__ == '__main__':
+    rosunit.unitrun(PKG, 'test_trajectory_library', TestTrajectoryLibrary)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+import unittest
+import numpy as np
+import rosunit
+
+from mdr_move_arm_action.dmp_integrator import DMPIntegrator
+from mdr_move_arm_action.trajectory_utils import resample_path, point_segment_distances, \
+                                                 get_reference_step, PathIndex
+
+PKG = 'mdr_move_arm_action'
+
+
+class TestTrajectoryResampling(unittest.TestCase):
+
+    def setUp(self):
+        weights = np.random.RandomState(0).normal(0., 200., (3, 50))
+        integrator = DMPIntegrator(weights, dt=0.001, ay=np.ones(3)*10.0)
+        y0 = np.array([0.2, -0.1, 0.9])
+        goal = np.array([0.6, 0.1, 0.8])
+        self.path, _, _ = integrator.rollout(goal, y0, 1.)
+
+    def max_deviation(self, indices):
+        max_deviation = 0.
+        for start, end in zip(indices[:-1], indices[1:]):
+            distances = point_segment_distances(self.path[start:end+1],
+                                                self.path[start], self.path[end])
+            max_deviation = max(max_deviation, np.max(distances))
+        return max_deviation
+
+    def test_deviation_is_bounded(self):
+        for max_deviation in [0.0005, 0.002, 0.01]:
+            indices = resample_path(self.path, max_deviation)
+            self.assertEqual(indices[0], 0)
+            self.assertEqual(indices[-1], self.path.shape[0] - 1)
+            self.assertTrue(np.all(np.diff(indices) > 0))
+            self.assertLess(indices.shape[0], self.path.shape[0])
+            self.assertLessEqual(self.max_deviation(indices), max_deviation)
+
+    def test_segment_length_is_bounded(self):
+        max_segment_length = 0.01
+        indices = resample_path(self.path, 0.002, max_segment_length)
+        self.assertLessEqual(self.max_deviation(indices), 0.002)
+
+        step_lengths = np.linalg.norm(np.diff(self.path, axis=0), axis=1)
+        arc_length = np.concatenate(([0.], np.cumsum(step_lengths)))
+        segment_lengths = np.diff(arc_length[indices])
+        self.assertLessEqual(np.max(segment_lengths),
+                             max_segment_length + np.max(step_lengths) + 1e-12)
+
+    def test_straight_path(self):
+        path = np.linspace([0., 0., 0.], [1., 0., 0.], 1000)
+        indices = resample_path(path, 0.001)
+        self.assertEqual(list(indices), [0, 999])
+
+    def test_velocity_follows_rollout_timing(self):
+        # the commanded velocities along the resampled path should be close to
+        # those along the full rollout at the same positions; within a segment,
+        # the resampled path only preserves the mean velocity of the rollout
+        indices = resample_path(self.path, 0.002, 0.01)
+        paths = [(self.path, np.ones(self.path.shape[0] - 1)),
+                 (self.path[indices], np.diff(indices))]
+        path_indices = [PathIndex(path) for path, _ in paths]
+
+        velocities = list()
+        for i in range(0, self.path.shape[0] - 1, 5):
+            position = self.path[i]
+            point_velocities = list()
+            for (path, path_steps), path_index in zip(paths, path_indices):
+                reference, step = get_reference_step(path, path_steps,
+                                                     path_index.nearest(position), position)
+                point_velocities.append(30. * step + (reference - position))
+            velocities.append(point_velocities)
+        velocities = np.array(velocities)
+
+        speeds = np.linalg.norm(velocities, axis=2)
+        errors = np.linalg.norm(velocities[:, 1] - velocities[:, 0], axis=1)
+        self.assertLess(np.median(errors / speeds[:, 0]), 0.05)
+        self.assertAlmostEqual(np.mean(speeds[:, 1]) / np.mean(speeds[:, 0]), 1., delta=0.05)
+
+
+if __name__ == '__main__':
+    rosunit.unitrun(PKG, 'test_trajectory_resampling', TestTrajectoryResampling)
@@ -3,11 +3,10 @@ from importlib import import_module
 
 import rospy
 import smach
-import tf
-import actionlib
 from geometry_msgs.msg import PoseStamped
 
 from mdr_move_base_action.msg import MoveBaseAction, MoveBaseGoal
+from mdr_move_base_action import client_registry
 from mdr_move_arm_action.msg import MoveArmAction, MoveArmGoal
 from mdr_pickup_action.msg import PickupGoal, PickupFeedback, PickupResult
 
@@ -40,7 +39,10 @@ class Pickup(smach.State):
                  grasping_orientation=list(),
                  grasping_dmp='',
                  dmp_tau=1.,
-                 number_of_retries=0):
+                 number_of_retries=0,
+                 concurrent_preparation=False,
+                 finger_joint_names=list(),
+                 closed_finger_position=0.):
         smach.State.__init__(self, input_keys=['pickup_goal'],
                              output_keys=['pickup_feedback'],
                              outcomes=['succeeded', 'failed'])
@@ -51,6 +53,10 @@ class Pickup(smach.State):
                                          'GripperController')
         self.gripper = GripperControllerClass()
 
+        # the grasp is only monitored if the finger joints are known
+        if finger_joint_names:
+            self.gripper.create_grasp_monitor(finger_joint_names, closed_finger_position)
+
         self.pregrasp_config_name = pregrasp_config_name
         self.intermediate_grasp_offset = intermediate_grasp_offset
         self.safe_arm_joint_config = safe_arm_joint_config
@@ -62,13 +68,18 @@ class Pickup(smach.State):
         self.dmp_tau = dmp_tau
         self.number_of_retries = number_of_retries
 
-        self.tf_listener = tf.TransformListener()
-
-        self.move_arm_client = actionlib.SimpleActionClient(self.move_arm_server, MoveArmAction)
-        self.move_arm_client.wait_for_server()
+        # if set, opening the gripper, aligning the base, and moving the
+        # arm to the pregrasp configuration are done at the same time
+        self.concurrent_preparation = concurrent_preparation
 
-        self.move_base_client = actionlib.SimpleActionClient(self.move_base_server, MoveBaseAction)
-        self.move_base_client.wait_for_server()
+        # the clients are shared with the other states of the process and
+        # are connected in the background; we only wait for the servers
+        # before sending goals to them
+        self.tf_listener = client_registry.get_tf_listener()
+        self.move_arm_client = client_registry.get_action_client(self.move_arm_server,
+                                                                 MoveArmAction)
+        self.move_base_client = client_registry.get_action_client(self.move_base_server,
+                                                                  MoveBaseAction)
 
     def execute(self, userdata):
         feedback = PickupFeedback()
@@ -80,8 +91,14 @@ class Pickup(smach.State):
         pose.header.stamp = rospy.Time(0)
         pose_base_link = self.tf_listener.transformPose('base_link', pose)
 
+        base_alignment_pending = False
         if self.base_elbow_offset > 0:
-            self.align_base_with_pose(pose_base_link)
+            if self.concurrent_preparation:
+                # the base alignment is finished before grasping
+                self.send_base_alignment_goal(pose_base_link)
+                base_alignment_pending = True
+            else:
+                self.align_base_with_pose(pose_base_link)
 
             # the base is now correctly aligned with the pose, so we set the
             # y position of the goal pose to the elbow offset
@@ -99,14 +116,23 @@ class Pickup(smach.State):
             if retry_count > 0:
                 rospy.loginfo('[PICKUP] Retrying grasp')
 
-            rospy.loginfo('[PICKUP] Opening the gripper...')
-            self.gripper.open()
+            if self.concurrent_preparation:
+                gripper_ready = self.prepare_grasp_concurrently(base_alignment_pending)
+                base_alignment_pending = False
+                if not gripper_ready:
+                    rospy.logerr('[PICKUP] The gripper could not be prepared for grasping')
+                    return 'failed'
+            else:
+                rospy.loginfo('[PICKUP] Opening the gripper...')
+                self.gripper.stop_grasp_monitor()
+                self.gripper.open()
 
-            rospy.loginfo('[PICKUP] Preparing for grasp verification')
-            self.gripper.init_grasp_verification()
+                rospy.loginfo('[PICKUP] Preparing for grasp verification')
+                self.gripper.init_grasp_verification()
+                self.gripper.start_grasp_monitor()
 
-            rospy.loginfo('[PICKUP] Moving to a pregrasp configuration...')
-            self.move_arm(MoveArmGoal.NAMED_TARGET, self.pregrasp_config_name)
+                rospy.loginfo('[PICKUP] Moving to a pregrasp configuration...')
+                self.move_arm(MoveArmGoal.NAMED_TARGET, self.pregrasp_config_name)
 
             if self.intermediate_grasp_offset > 0:
                 rospy.loginfo('[PICKUP] Moving to intermediate grasping pose...')
@@ -119,17 +145,28 @@ class Pickup(smach.State):
             arm_motion_success = self.move_arm(MoveArmGoal.END_EFFECTOR_POSE, pose_base_link)
             if not arm_motion_success:
                 rospy.logerr('[PICKUP] Arm motion unsuccessful')
+                self.gripper.stop_grasp_monitor()
                 return 'failed'
 
             rospy.loginfo('[PICKUP] Arm motion successful')
             rospy.loginfo('[PICKUP] Closing the gripper')
             self.gripper.close()
 
+            # the grasp is only monitored if it can be retried; otherwise,
+            # the arm is moved back even if the object has been lost
             rospy.loginfo('[PICKUP] Moving the arm back')
-            self.move_arm(MoveArmGoal.NAMED_TARGET, self.safe_arm_joint_config)
+            grasp_lost = self.move_arm_back(retry_count < self.number_of_retries)
 
-            rospy.loginfo('[PICKUP] Verifying the grasp...')
-            grasp_successful = self.gripper.verify_grasp()
+            if grasp_lost:
+                rospy.loginfo('[PICKUP] Object lost or missed while moving the arm back')
+                grasp_successful = False
+            else:
+                rospy.loginfo('[PICKUP] Verifying the grasp...')
+                grasp_successful = self.gripper.verify_grasp()
+
+            # the grasp is not monitored after the pickup, as the
+            # monitor would report the release of the object as a loss
+            self.gripper.stop_grasp_monitor()
             if grasp_successful:
                 rospy.loginfo('[PICKUP] Successfully grasped object')
             else:
@@ -142,9 +179,79 @@ class Pickup(smach.State):
         rospy.loginfo('[PICKUP] Grasp could not be performed successfully')
         return 'failed'
 
+    def move_arm_back(self, monitor_grasp):
+        '''Moves the arm to the safe configuration. If the grasp is monitored,
+        the motion is cancelled as soon as the gripper reports that the
+        grasped object has been lost or missed, so that the grasp can be retried
+        without waiting for the motion to finish.
+
+        Keyword arguments:
+        monitor_grasp -- whether to check for a lost grasp during the motion
+
+        Returns True if the motion was cancelled because the grasp was lost or missed.
+
+        '''
+        self.send_move_arm_goal(MoveArmGoal.NAMED_TARGET, self.safe_arm_joint_config)
+        while not self.move_arm_client.wait_for_result(rospy.Duration(0.05)):
+            if rospy.is_shutdown():
+                return False
+            if monitor_grasp and self.gripper.grasp_lost():
+                self.move_arm_client.cancel_goal()
+                self.move_arm_client.wait_for_result()
+                return True
+        return False
+
+    def prepare_grasp_concurrently(self, base_alignment_pending):
+        '''Opens the gripper and prepares the grasp verification while the
+        arm is moving to the pregrasp configuration; returns once the gripper,
+        the arm, and (if a base alignment goal is pending) the base are ready.
+
+        Keyword arguments:
+        base_alignment_pending -- whether a base alignment goal has been sent
+                                  whose result has not been received yet
+
+        Returns False if the gripper commands have not finished within
+        the timeout or if opening the gripper was unsuccessful.
+
+        '''
+        rospy.loginfo('[PICKUP] Opening the gripper and moving to a pregrasp configuration...')
+        open_gripper = self.gripper.open_async()
+        init_grasp_verification = self.gripper.init_grasp_verification_async()
+        self.send_move_arm_goal(MoveArmGoal.NAMED_TARGET, self.pregrasp_config_name)
+
+        self.move_arm_client.wait_for_result()
+        if base_alignment_pending:
+            self.move_base_client.wait_for_result()
+        for command in (open_gripper, init_grasp_verification):
+            if not command.wait(self.timeout):
+                rospy.logerr('[PICKUP] %s did not finish within %s seconds',
+                             command.command_name, self.timeout)
+                return False
+
+        # exceptions raised by the commands are raised again by 'result'
+        if open_gripper.result() is False:
+            rospy.logerr('[PICKUP] Could not open the gripper')
+            return False
+        init_grasp_verification.result()
+        rospy.loginfo('[PICKUP] Ready for grasping')
+        return True
+
     def align_base_with_pose(self, pose_base_link):
         '''Moves the base so that the elbow is aligned with the goal pose.
 
+        Keyword arguments:
+        pose_base_link -- a 'geometry_msgs/PoseStamped' message representing
+                          the goal pose in the base link frame
+
+        '''
+        self.send_base_alignment_goal(pose_base_link)
+        self.move_base_client.wait_for_result()
+        self.move_base_client.get_result()
+
+    def send_base_alignment_goal(self, pose_base_link):
+        '''Sends a goal for aligning the elbow with the goal pose to
+        the 'move_base' action server without waiting for the result.
+
         Keyword arguments:
         pose_base_link -- a 'geometry_msgs/PoseStamped' message representing
                           the goal pose in the base link frame
@@ -164,14 +271,28 @@ class Pickup(smach.State):
         move_base_goal = MoveBaseGoal()
         move_base_goal.goal_type = MoveBaseGoal.POSE
         move_base_goal.pose = aligned_base_pose
+        self.move_base_client.wait_for_server()
         self.move_base_client.send_goal(move_base_goal)
-        self.move_base_client.wait_for_result()
-        self.move_base_client.get_result()
 
     def move_arm(self, goal_type, goal):
         '''Sends a request to the 'move_arm' action server and waits for the
         results of the action execution.
 
+        Keyword arguments:
+        goal_type -- 'MoveArmGoal.NAMED_TARGET' or 'MoveArmGoal.END_EFFECTOR_POSE'
+        goal -- A string if 'goal_type' is 'MoveArmGoal.NAMED_TARGET';
+                a 'geometry_msgs/PoseStamped' if 'goal_type' is 'MoveArmGoal.END_EFFECTOR_POSE'
+
+        '''
+        self.send_move_arm_goal(goal_type, goal)
+        self.move_arm_client.wait_for_result()
+        result = self.move_arm_client.get_result()
+        return result
+
+    def send_move_arm_goal(self, goal_type, goal):
+        '''Sends a request to the 'move_arm' action server
+        without waiting for the results of the action execution.
+
         Keyword arguments:
         goal_type -- 'MoveArmGoal.NAMED_TARGET' or 'MoveArmGoal.END_EFFECTOR_POSE'
         goal -- A string if 'goal_type' is 'MoveArmGoal.NAMED_TARGET';
@@ -186,10 +307,8 @@ class Pickup(smach.State):
             move_arm_goal.end_effector_pose = goal
             move_arm_goal.dmp_name = self.grasping_dmp
             move_arm_goal.dmp_tau = self.dmp_tau
+        self.move_arm_client.wait_for_server()
         self.move_arm_client.send_goal(move_arm_goal)
-        self.move_arm_client.wait_for_result()
-        result = self.move_arm_client.get_result()
-        return result
 
 class SetActionLibResult(smach.State):
     def __init__(self, result):
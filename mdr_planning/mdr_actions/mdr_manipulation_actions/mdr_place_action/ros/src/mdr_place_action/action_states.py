@@ -3,11 +3,10 @@ from importlib import import_module
 
 import rospy
 import smach
-import tf
-import actionlib
 from geometry_msgs.msg import PoseStamped
 
 from mdr_move_base_action.msg import MoveBaseAction, MoveBaseGoal
+from mdr_move_base_action import client_registry
 from mdr_move_arm_action.msg import MoveArmAction, MoveArmGoal
 from mdr_place_action.msg import PlaceGoal, PlaceFeedback, PlaceResult
 
@@ -38,7 +37,8 @@ class Place(smach.State):
                  base_elbow_offset=-1.,
                  placing_orientation=list(),
                  placing_dmp='',
-                 dmp_tau=1.):
+                 dmp_tau=1.,
+                 concurrent_preparation=False):
         smach.State.__init__(self, input_keys=['place_goal'],
                              output_keys=['place_feedback'],
                              outcomes=['succeeded', 'failed'])
@@ -58,13 +58,18 @@ class Place(smach.State):
         self.placing_dmp = placing_dmp
         self.dmp_tau = dmp_tau
 
-        self.tf_listener = tf.TransformListener()
+        # if set, the base is aligned with the placing pose while
+        # the arm is moving to the preplace configuration
+        self.concurrent_preparation = concurrent_preparation
 
-        self.move_arm_client = actionlib.SimpleActionClient(self.move_arm_server, MoveArmAction)
-        self.move_arm_client.wait_for_server()
-
-        self.move_base_client = actionlib.SimpleActionClient(self.move_base_server, MoveBaseAction)
-        self.move_base_client.wait_for_server()
+        # the clients are shared with the other states of the process and
+        # are connected in the background; we only wait for the servers
+        # before sending goals to them
+        self.tf_listener = client_registry.get_tf_listener()
+        self.move_arm_client = client_registry.get_action_client(self.move_arm_server,
+                                                                 MoveArmAction)
+        self.move_base_client = client_registry.get_action_client(self.move_base_server,
+                                                                  MoveBaseAction)
 
     def execute(self, userdata):
         feedback = PlaceFeedback()
@@ -81,15 +86,27 @@ class Place(smach.State):
             pose_base_link.pose.orientation.z = self.placing_orientation[2]
             pose_base_link.pose.orientation.w = self.placing_orientation[3]
 
+        base_alignment_pending = False
         if self.base_elbow_offset > 0:
-            self.align_base_with_pose(pose_base_link)
+            if self.concurrent_preparation:
+                # the base alignment is finished before placing
+                self.send_base_alignment_goal(pose_base_link)
+                base_alignment_pending = True
+            else:
+                self.align_base_with_pose(pose_base_link)
 
             # the base is now correctly aligned with the pose, so we set the
             # y position of the goal pose to the elbow offset
             pose_base_link.pose.position.y = self.base_elbow_offset
 
         rospy.loginfo('[PLACE] Moving to a preplace configuration...')
-        self.move_arm(MoveArmGoal.NAMED_TARGET, self.preplace_config_name)
+        if self.concurrent_preparation:
+            self.send_move_arm_goal(MoveArmGoal.NAMED_TARGET, self.preplace_config_name)
+            self.move_arm_client.wait_for_result()
+            if base_alignment_pending:
+                self.move_base_client.wait_for_result()
+        else:
+            self.move_arm(MoveArmGoal.NAMED_TARGET, self.preplace_config_name)
 
         # we set up the arm group for moving
         rospy.loginfo('[PLACE] Placing...')
@@ -110,6 +127,19 @@ class Place(smach.State):
     def align_base_with_pose(self, pose_base_link):
         '''Moves the base so that the elbow is aligned with the goal pose.
 
+        Keyword arguments:
+        pose_base_link -- a 'geometry_msgs/PoseStamped' message representing
+                          the goal pose in the base link frame
+
+        '''
+        self.send_base_alignment_goal(pose_base_link)
+        self.move_base_client.wait_for_result()
+        self.move_base_client.get_result()
+
+    def send_base_alignment_goal(self, pose_base_link):
+        '''Sends a goal for aligning the elbow with the goal pose to
+        the 'move_base' action server without waiting for the result.
+
         Keyword arguments:
         pose_base_link -- a 'geometry_msgs/PoseStamped' message representing
                           the goal pose in the base link frame
@@ -129,14 +159,28 @@ class Place(smach.State):
         move_base_goal = MoveBaseGoal()
         move_base_goal.goal_type = MoveBaseGoal.POSE
         move_base_goal.pose = aligned_base_pose
+        self.move_base_client.wait_for_server()
         self.move_base_client.send_goal(move_base_goal)
-        self.move_base_client.wait_for_result()
-        self.move_base_client.get_result()
 
     def move_arm(self, goal_type, goal):
         '''Sends a request to the 'move_arm' action server and waits for the
         results of the action execution.
 
+        Keyword arguments:
+        goal_type -- 'MoveArmGoal.NAMED_TARGET' or 'MoveArmGoal.END_EFFECTOR_POSE'
+        goal -- A string if 'goal_type' is 'MoveArmGoal.NAMED_TARGET';
+                a 'geometry_msgs/PoseStamped' if 'goal_type' is 'MoveArmGoal.END_EFFECTOR_POSE'
+
+        '''
+        self.send_move_arm_goal(goal_type, goal)
+        self.move_arm_client.wait_for_result()
+        result = self.move_arm_client.get_result()
+        return result
+
+    def send_move_arm_goal(self, goal_type, goal):
+        '''Sends a request to the 'move_arm' action server
+        without waiting for the results of the action execution.
+
         Keyword arguments:
         goal_type -- 'MoveArmGoal.NAMED_TARGET' or 'MoveArmGoal.END_EFFECTOR_POSE'
         goal -- A string if 'goal_type' is 'MoveArmGoal.NAMED_TARGET';
@@ -151,10 +195,8 @@ class Place(smach.State):
             move_arm_goal.end_effector_pose = goal
             move_arm_goal.dmp_name = self.placing_dmp
             move_arm_goal.dmp_tau = self.dmp_tau
+        self.move_arm_client.wait_for_server()
         self.move_arm_client.send_goal(move_arm_goal)
-        self.move_arm_client.wait_for_result()
-        result = self.move_arm_client.get_result()
-        return result
 
 class SetActionLibResult(smach.State):
     def __init__(self, result):
@@ -2,7 +2,6 @@
 
 import rospy
 import smach
-import actionlib
 import yaml
 import tf
 from geometry_msgs.msg import PoseStamped, Quaternion
@@ -10,6 +9,7 @@ import move_base_msgs.msg as move_base_msgs
 
 from mdr_move_arm_action.msg import MoveArmAction, MoveArmGoal
 from mdr_move_base_action.msg import MoveBaseGoal, MoveBaseFeedback, MoveBaseResult
+from mdr_move_base_action import client_registry
 
 class SetupMoveBase(smach.State):
     def __init__(self, safe_arm_joint_config='folded', move_arm_server='move_arm_server'):
@@ -18,8 +18,8 @@ class SetupMoveBase(smach.State):
                              output_keys=['move_base_feedback', 'move_base_result'])
         self.safe_arm_joint_config = safe_arm_joint_config
         self.move_arm_server = move_arm_server
-        self.move_arm_client = actionlib.SimpleActionClient(self.move_arm_server, MoveArmAction)
-        self.move_arm_client.wait_for_server()
+        self.move_arm_client = client_registry.get_action_client(self.move_arm_server,
+                                                                 MoveArmAction)
 
     def execute(self, userdata):
         feedback = MoveBaseFeedback()
@@ -31,6 +31,7 @@ class SetupMoveBase(smach.State):
         move_arm_goal = MoveArmGoal()
         move_arm_goal.goal_type = MoveArmGoal.NAMED_TARGET
         move_arm_goal.named_target = self.safe_arm_joint_config
+        self.move_arm_client.wait_for_server()
         self.move_arm_client.send_goal(move_arm_goal)
         self.move_arm_client.wait_for_result()
         return 'succeeded'
@@ -48,6 +49,8 @@ class ApproachPose(smach.State):
         self.pose_description_file = pose_description_file
         self.pose_frame = pose_frame
         self.timeout = timeout
+        self.move_base_client = client_registry.get_action_client(self.move_base_server,
+                                                                  move_base_msgs.MoveBaseAction)
 
     def execute(self, userdata):
         pose = PoseStamped()
@@ -81,11 +84,9 @@ class ApproachPose(smach.State):
         goal = move_base_msgs.MoveBaseGoal()
         goal.target_pose = pose
 
-        move_base_client = actionlib.SimpleActionClient(self.move_base_server,
-                                                        move_base_msgs.MoveBaseAction)
-        move_base_client.wait_for_server()
-        move_base_client.send_goal(goal)
-        success = move_base_client.wait_for_result()
+        self.move_base_client.wait_for_server()
+        self.move_base_client.send_goal(goal)
+        success = self.move_base_client.wait_for_result()
 
         if success:
             rospy.loginfo('Pose reached successfully')
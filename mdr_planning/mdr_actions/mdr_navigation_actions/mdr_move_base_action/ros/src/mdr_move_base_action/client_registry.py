@@ -0,0 +1,82 @@
+'''A process-wide registry of action clients and of a TF listener, which
+allows the states of the manipulation and navigation actions to share
+their connections instead of creating (and waiting for) their own.
+
+Action clients are connected to their servers in background threads, so
+the connections to different servers are established in parallel; the
+states only wait for a server before they send the first goal to it.
+'''
+import threading
+
+import rospy
+import tf
+import actionlib
+
+_lock = threading.Lock()
+_tf_listener = None
+_action_clients = dict()
+_connection_threads = dict()
+
+def get_tf_listener():
+    '''Returns the TF listener of the process, which is created on first use.
+    '''
+    global _tf_listener
+    with _lock:
+        if _tf_listener is None:
+            _tf_listener = tf.TransformListener()
+        return _tf_listener
+
+def get_action_client(server_name, action_type):
+    '''Returns the action client of the given server, which is created on first
+    use; the client is connected to the server in the background, so the
+    returned client might not be connected yet.
+
+    Keyword arguments:
+    server_name -- name of the action server
+    action_type -- type of the action (e.g. 'MoveBaseAction')
+
+    '''
+    with _lock:
+        if server_name in _action_clients:
+            client, registered_type = _action_clients[server_name]
+            if registered_type is not action_type:
+                raise ValueError('A client of type {0} is already registered for {1}'.format(
+                    registered_type.__name__, server_name))
+            return client
+
+        client = actionlib.SimpleActionClient(server_name, action_type)
+        _action_clients[server_name] = (client, action_type)
+
+        connection_thread = threading.Thread(target=_connect, args=(server_name, client))
+        connection_thread.daemon = True
+        connection_thread.start()
+        _connection_threads[server_name] = connection_thread
+        return client
+
+def wait_for_servers(timeout=None):
+    '''Waits until all registered clients are connected to their servers.
+
+    Keyword arguments:
+    timeout -- maximum waiting time in seconds (no limit if None)
+
+    Returns True if all clients are connected and False otherwise.
+
+    '''
+    with _lock:
+        connection_threads = list(_connection_threads.values())
+
+    start_time = rospy.get_time()
+    for connection_thread in connection_threads:
+        remaining_time = None
+        if timeout is not None:
+            remaining_time = max(0., timeout - (rospy.get_time() - start_time))
+        connection_thread.join(remaining_time)
+        if connection_thread.is_alive():
+            return False
+    return True
+
+def _connect(server_name, client):
+    rospy.loginfo('[client_registry] Waiting for %s', server_name)
+    client.wait_for_server()
+    if not rospy.is_shutdown():
+        rospy.loginfo('[client_registry] Connected to %s', server_name)
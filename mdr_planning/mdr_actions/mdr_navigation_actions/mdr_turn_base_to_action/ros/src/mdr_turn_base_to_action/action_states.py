@@ -2,10 +2,10 @@
 
 import rospy
 import smach
-import actionlib
 from tf.transformations import quaternion_from_euler
 from mdr_turn_base_to_action.msg import TurnBaseToFeedback, TurnBaseToResult
 from mdr_move_base_action.msg import MoveBaseAction, MoveBaseGoal
+from mdr_move_base_action import client_registry
 
 
 class SetupTurnBaseTo(smach.State):
@@ -36,8 +36,8 @@ class TurnBaseTo(smach.State):
         self.movement_duration = movement_duration
         self.speed = speed
 
-        self.move_base_client = actionlib.SimpleActionClient(self.move_base_server, MoveBaseAction)
-        self.move_base_client.wait_for_server()
+        self.move_base_client = client_registry.get_action_client(self.move_base_server,
+                                                                  MoveBaseAction)
 
     def execute(self, userdata):
         goal = MoveBaseGoal()
@@ -50,6 +50,7 @@ class TurnBaseTo(smach.State):
         goal.pose.pose.orientation.z = q[2]
         goal.pose.pose.orientation.w = q[3]
         rospy.loginfo("[mdr_turn_base_to] Goal %s", goal)
+        self.move_base_client.wait_for_server()
         self.move_base_client.send_goal(goal)
         success = self.move_base_client.wait_for_result()
 
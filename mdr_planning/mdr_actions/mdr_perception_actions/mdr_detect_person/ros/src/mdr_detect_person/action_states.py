@@ -15,6 +15,8 @@ from mdr_perception_msgs.msg import FaceBoundingBox
 
 from mdr_detect_person.inference import detect_faces
 from mdr_detect_person.inference import load_detection_model
+from mdr_detect_person.inference import FaceTracker
+from mdr_detect_person.detection_cache import DetectionCache
 
 
 class SetupDetectPerson(smach.State):
@@ -37,7 +39,10 @@ class SetupDetectPerson(smach.State):
 
 
 class DetectPerson(smach.State):
-    def __init__(self, timeout=120., image_topic='/cam3d/rgb/image_raw', detection_model_path=''):
+    def __init__(self, timeout=120., image_topic='/cam3d/rgb/image_raw', detection_model_path='',
+                 detection_cache_size=10, detection_cache_use_content_hash=False,
+                 fast_detection=False, detection_scale=0.5, min_face_size=0, max_face_size=0,
+                 roi_margin=0.5, full_detection_interval=10, max_tracking_gap=0.5):
         smach.State.__init__(self, outcomes=['succeeded', 'failed'],
                              input_keys=['detect_person_goal', 'number_of_faces',
                                           'bounding_boxes'],
@@ -49,18 +54,54 @@ class DetectPerson(smach.State):
 
         # loading model
         self.face_detection = load_detection_model(detection_model_path)
+        self.detection_cache = DetectionCache(detection_cache_size,
+                                              detection_cache_use_content_hash)
+
+        # in the fast detection mode, the faces are tracked between consecutive images
+        self.face_tracker = None
+        if fast_detection:
+            self.face_tracker = FaceTracker(self.face_detection, detection_scale,
+                                            (min_face_size, min_face_size),
+                                            (max_face_size, max_face_size),
+                                            roi_margin, full_detection_interval,
+                                            max_tracking_gap)
 
     def execute(self, userdata):
         userdata.bounding_boxes = []
-        self.input_image = self.convert_image(userdata.detect_person_goal.image)
-        try:
-            bgr_image = self.input_image
-            gray_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2GRAY)
-            rgb_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2RGB)
-            faces = detect_faces(self.face_detection, gray_image)
+
+        # if the image has already been processed, the faces are neither
+        # detected again nor is the annotated image published again
+        faces = self.detection_cache.get(userdata.detect_person_goal.image)
+        cache_hit = faces is not None
+        if cache_hit:
             userdata.number_of_faces = np.size(faces, 0)
-        except:
-            userdata.number_of_faces = 0
+        else:
+            self.input_image = self.convert_image(userdata.detect_person_goal.image)
+            try:
+                bgr_image = self.input_image
+                gray_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2GRAY)
+                rgb_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2RGB)
+                if self.face_tracker is not None:
+                    # the faces are only tracked between images of the same stream;
+                    # images without a stamp cannot be related to the previous image
+                    header = userdata.detect_person_goal.image.header
+                    if header.stamp.is_zero():
+                        self.face_tracker.reset()
+                    faces = self.face_tracker.detect(gray_image, header.frame_id,
+                                                     header.stamp.to_sec())
+                else:
+                    faces = detect_faces(self.face_detection, gray_image)
+                userdata.number_of_faces = np.size(faces, 0)
+                self.detection_cache.put(userdata.detect_person_goal.image, faces)
+            except:
+                userdata.number_of_faces = 0
+
+        feedback = DetectPersonFeedback()
+        feedback.current_state = 'DETECT_PERSON'
+        feedback.cache_hit = cache_hit
+        feedback.cache_hit_rate = self.detection_cache.get_hit_rate()
+        feedback.text = '[detect_person] detection cache hit rate: %.2f' % feedback.cache_hit_rate
+        userdata.detect_person_feedback = feedback
 
         if userdata.number_of_faces != 0:
             for face_coordinates in faces:
@@ -69,10 +110,12 @@ class DetectPerson(smach.State):
                 bounding_box.bounding_box_coordinates = face_coordinates.tolist()
                 userdata.bounding_boxes.append(bounding_box)
 
-                x, y, w, h = face_coordinates
-                rgb_cv2 = cv2.rectangle(rgb_image, (x, y), (x + w, y + h), (0,0,255), 2)
-            output_ros_image = self.bridge.cv2_to_imgmsg(rgb_image, 'bgr8')
-            self.image_publisher.publish(output_ros_image)
+                if not cache_hit:
+                    x, y, w, h = face_coordinates
+                    rgb_cv2 = cv2.rectangle(rgb_image, (x, y), (x + w, y + h), (0,0,255), 2)
+            if not cache_hit:
+                output_ros_image = self.bridge.cv2_to_imgmsg(rgb_image, 'bgr8')
+                self.image_publisher.publish(output_ros_image)
             return 'succeeded'
         else:
             return 'failed'
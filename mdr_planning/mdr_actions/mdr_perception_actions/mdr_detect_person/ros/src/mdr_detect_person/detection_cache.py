@@ -0,0 +1,82 @@
+import hashlib
+from collections import OrderedDict
+
+class DetectionCache(object):
+    '''A size-bounded cache of face detection results, such that the faces
+    in an image that is sent for detection more than once (e.g. when a
+    request is retried before a new image has arrived) are only detected once.
+
+    Images are identified by the frame, stamp, and sequence number of their
+    header and optionally by a hash of their content. Images without a stamp
+    (e.g. images that have been read from a file) can only be identified by
+    their content, so they are not cached if 'use_content_hash' is False.
+    Once the cache is full, the least recently used result is evicted.
+
+    Keyword arguments:
+    max_size -- maximum number of stored detection results (0 disables the cache)
+    use_content_hash -- whether the images are also identified by a hash of their content
+
+    '''
+    def __init__(self, max_size=10, use_content_hash=False):
+        self.max_size = max_size
+        self.use_content_hash = use_content_hash
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_key(self, image):
+        '''Returns the key of a 'sensor_msgs/Image' message
+        or None if the image cannot be identified.
+        '''
+        header = image.header
+        has_stamp = header.stamp.secs != 0 or header.stamp.nsecs != 0
+        if not has_stamp and not self.use_content_hash:
+            return None
+
+        key = (header.frame_id, header.stamp.secs, header.stamp.nsecs, header.seq)
+        if self.use_content_hash:
+            data = image.data if isinstance(image.data, bytes) else bytearray(image.data)
+            content_hash = hashlib.md5(data).hexdigest()
+            key += (image.width, image.height, image.encoding, content_hash)
+        return key
+
+    def get(self, image):
+        '''Returns the detection result stored for the given
+        'sensor_msgs/Image' message or None if there is no such result.
+        '''
+        # lookups in a disabled cache are not counted
+        if self.max_size <= 0:
+            return None
+
+        key = self.get_key(image)
+        if key is None or key not in self.results:
+            self.misses += 1
+            return None
+
+        # the result becomes the most recently used one
+        result = self.results.pop(key)
+        self.results[key] = result
+        self.hits += 1
+        return result
+
+    def put(self, image, result):
+        '''Stores the detection result of the given 'sensor_msgs/Image' message,
+        evicting the least recently used result if the cache is full.
+        '''
+        key = self.get_key(image) if self.max_size > 0 else None
+        if key is None:
+            return
+
+        self.results.pop(key, None)
+        self.results[key] = result
+        while len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+
+    def get_hit_rate(self):
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.
+        return float(self.hits) / lookups
+
+    def __len__(self):
+        return len(self.results)
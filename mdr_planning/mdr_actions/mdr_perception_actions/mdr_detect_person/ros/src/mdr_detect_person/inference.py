@@ -14,8 +14,19 @@ def load_detection_model(model_path):
     return detection_model
 
 
-def detect_faces(detection_model, gray_image_array):
-    return detection_model.detectMultiScale(gray_image_array, 1.3, 5)
+def detect_faces(detection_model, gray_image_array, min_size=(0, 0), max_size=(0, 0)):
+    '''Returns the (x, y, width, height) bounding boxes of the faces in the image.
+
+    Keyword arguments:
+    detection_model -- a cv2.CascadeClassifier
+    gray_image_array -- grayscale image
+    min_size -- minimum (width, height) of the detected faces
+    max_size -- maximum (width, height) of the detected faces ((0, 0) for no limit)
+
+    '''
+    return detection_model.detectMultiScale(gray_image_array, 1.3, 5,
+                                            minSize=tuple(min_size),
+                                            maxSize=tuple(max_size))
 
 
 def draw_bounding_box(face_coordinates, image_array, color):
@@ -40,3 +51,185 @@ def get_colors(num_classes):
     colors = plt.cm.hsv(np.linspace(0, 1, num_classes)).tolist()
     colors = np.asarray(colors) * 255
     return colors
+
+
+class FaceTracker(object):
+    '''Detects faces in a stream of images at a fraction of the cost of running
+    'detect_faces' on each full-resolution image. The faces are searched in
+    a downscaled image, but only every 'full_detection_interval' images;
+    in the images in between, each face is only searched in a region around
+    its bounding box in the previous image. A face that is not found in its
+    region is dropped until the next full detection; the full image is also
+    searched whenever there were no faces in the previous image or if the
+    image does not continue the stream of the previous image, i.e. if it
+    comes from a different frame or if it was taken before or more than
+    'max_tracking_gap' seconds after the previous image.
+
+    Keyword arguments:
+    detection_model -- a cv2.CascadeClassifier
+    scale -- factor by which the images are downscaled for the full detection;
+             as the cascade has a fixed minimum window size, faces smaller than
+             the window size divided by the scale are not detected
+    min_size -- minimum (width, height) of the detected faces in the original image
+    max_size -- maximum (width, height) of the detected faces in the original image
+                ((0, 0) for no limit)
+    roi_margin -- margin around the previous bounding box of a face in which the face
+                  is searched, relative to the size of the bounding box
+    full_detection_interval -- number of images after which the full image is searched again
+    max_tracking_gap -- maximum time (in seconds) between two images
+                        for which the faces are tracked
+
+    '''
+    def __init__(self, detection_model, scale=0.5, min_size=(0, 0), max_size=(0, 0),
+                 roi_margin=0.5, full_detection_interval=10, max_tracking_gap=0.5):
+        self.detection_model = detection_model
+        self.scale = scale
+        self.min_size = tuple(min_size)
+        self.max_size = tuple(max_size)
+        self.roi_margin = roi_margin
+        self.full_detection_interval = full_detection_interval
+        self.max_tracking_gap = max_tracking_gap
+        self.reset()
+
+    def reset(self):
+        self.previous_faces = list()
+        self.previous_image_shape = None
+        self.previous_frame_id = None
+        self.previous_stamp = None
+        self.images_since_full_detection = 0
+
+    def detect(self, gray_image_array, frame_id=None, stamp=None):
+        '''Returns the (x, y, width, height) bounding boxes of the faces
+        in the image as an integer array of shape (N, 4).
+
+        Keyword arguments:
+        gray_image_array -- grayscale image
+        frame_id -- frame of the image
+        stamp -- time stamp of the image in seconds (None if unknown)
+
+        '''
+        if not self.continues_stream(frame_id, stamp):
+            self.reset()
+        self.previous_frame_id = frame_id
+        self.previous_stamp = stamp
+
+        self.images_since_full_detection += 1
+        if not self.previous_faces or \
+           gray_image_array.shape != self.previous_image_shape or \
+           self.images_since_full_detection >= self.full_detection_interval:
+            faces = self.detect_in_full_image(gray_image_array)
+            self.images_since_full_detection = 0
+        else:
+            faces = self.detect_around_previous_faces(gray_image_array)
+
+        self.previous_faces = faces
+        self.previous_image_shape = gray_image_array.shape
+        return np.array(faces, dtype=int).reshape(-1, 4)
+
+    def detect_in_full_image(self, gray_image_array):
+        height, width = gray_image_array.shape[0:2]
+        small_image = cv2.resize(gray_image_array,
+                                 (int(width * self.scale), int(height * self.scale)),
+                                 interpolation=cv2.INTER_AREA)
+        min_size = tuple(int(size * self.scale) for size in self.min_size)
+        max_size = tuple(int(size * self.scale) for size in self.max_size)
+        faces = detect_faces(self.detection_model, small_image, min_size, max_size)
+        return [tuple(int(round(c / self.scale)) for c in face) for face in faces]
+
+    def detect_around_previous_faces(self, gray_image_array):
+        height, width = gray_image_array.shape[0:2]
+        faces = list()
+        for x, y, w, h in self.previous_faces:
+            x_margin = int(w * self.roi_margin)
+            y_margin = int(h * self.roi_margin)
+            x_min, y_min = max(x - x_margin, 0), max(y - y_margin, 0)
+            x_max, y_max = min(x + w + x_margin, width), min(y + h + y_margin, height)
+
+            # the face is expected to have a similar size as in the previous image
+            min_size = (int(w / (1. + self.roi_margin)), int(h / (1. + self.roi_margin)))
+            max_size = (x_max - x_min, y_max - y_min)
+            roi = gray_image_array[y_min:y_max, x_min:x_max]
+            for roi_x, roi_y, roi_w, roi_h in detect_faces(self.detection_model, roi,
+                                                           min_size, max_size):
+                face = (int(roi_x) + x_min, int(roi_y) + y_min, int(roi_w), int(roi_h))
+
+                # the regions of faces that are close to each other overlap,
+                # so the same face can be detected more than once
+                if not any(self.contains_center(other_face, face) for other_face in faces):
+                    faces.append(face)
+        return faces
+
+    def continues_stream(self, frame_id, stamp):
+        '''Returns True if the faces of the previous image can be tracked in
+        an image with the given frame and time stamp (in seconds); images
+        without a time stamp are only related by their frame.
+        '''
+        if frame_id != self.previous_frame_id:
+            return False
+        if stamp is None or self.previous_stamp is None:
+            return True
+        return 0. <= stamp - self.previous_stamp <= self.max_tracking_gap
+
+    @staticmethod
+    def contains_center(face, other_face):
+        x, y, w, h = face
+        center_x = other_face[0] + other_face[2] / 2.
+        center_y = other_face[1] + other_face[3] / 2.
+        return x <= center_x <= x + w and y <= center_y <= y + h
+
+
+class FaceBatch(object):
+    '''A preallocated tensor of shape (N, height, width, 1) into which grayscale
+    faces are cropped, resized, and normalised, such that all faces in an
+    image can be classified with a single prediction; the tensor is only
+    reallocated if an image contains more faces than ever before.
+
+    Keyword arguments:
+    image_size -- (width, height) to which the faces are resized
+    initial_size -- number of faces for which the tensor is allocated initially
+
+    '''
+    def __init__(self, image_size, initial_size=16):
+        self.image_size = tuple(image_size[0:2])
+        self.faces = self.allocate(initial_size)
+
+    def allocate(self, number_of_faces):
+        width, height = self.image_size
+        return np.zeros((number_of_faces, height, width, 1), dtype=np.float32)
+
+    def fill(self, gray_image_array, face_coordinates):
+        '''Returns a view of the tensor containing the faces with
+        the given bounding boxes, scaled to the range [0, 1].
+
+        Keyword arguments:
+        gray_image_array -- grayscale image containing the faces
+        face_coordinates -- list of (x, y, width, height) bounding boxes
+
+        '''
+        number_of_faces = len(face_coordinates)
+        if number_of_faces > self.faces.shape[0]:
+            self.faces = self.allocate(number_of_faces)
+
+        faces = self.faces[0:number_of_faces]
+        for i, (x, y, w, h) in enumerate(face_coordinates):
+            face = gray_image_array[y: (y + h), x: (x + w)]
+            faces[i, :, :, 0] = cv2.resize(face, self.image_size)
+        faces *= 1. / 255.
+        return faces
+
+
+def classify_faces(model, faces, labels, max_batch_size=32):
+    '''Classifies a batch of faces with a single call to 'model.predict'
+    and returns the labels of the most likely classes.
+
+    Keyword arguments:
+    model -- a Keras classification model
+    faces -- a tensor of shape (N, height, width, 1) (e.g. from 'FaceBatch')
+    labels -- a dictionary mapping class indices to labels
+    max_batch_size -- maximum number of faces passed through the model at once
+
+    '''
+    if faces.shape[0] == 0:
+        return list()
+    class_predictions = model.predict(faces, batch_size=max_batch_size)
+    return [labels[class_index] for class_index in np.argmax(class_predictions, axis=1)]
@@ -17,6 +17,16 @@ class DetectPersonSkill(smach.StateMachine):
 
         detection_model_path = rospy.get_param('~config_file', '')
         image_topic = rospy.get_param('~image_topic', '/cam3d/rgb/image_raw')
+        detection_cache_size = int(rospy.get_param('~detection_cache_size', 10))
+        detection_cache_use_content_hash = rospy.get_param('~detection_cache_use_content_hash',
+                                                           False)
+        fast_detection = rospy.get_param('~fast_detection', False)
+        detection_scale = float(rospy.get_param('~detection_scale', 0.5))
+        min_face_size = int(rospy.get_param('~min_face_size', 0))
+        max_face_size = int(rospy.get_param('~max_face_size', 0))
+        roi_margin = float(rospy.get_param('~roi_margin', 0.5))
+        full_detection_interval = int(rospy.get_param('~full_detection_interval', 10))
+        max_tracking_gap = float(rospy.get_param('~max_tracking_gap', 0.5))
 
         with self:
             sm.add('SETUP_DETECT_PERSON', SetupDetectPerson(),
@@ -25,7 +35,16 @@ class DetectPersonSkill(smach.StateMachine):
 
             sm.add('DETECT_PERSON',
                    DetectPerson(image_topic=image_topic,
-                                detection_model_path=detection_model_path),
+                                detection_model_path=detection_model_path,
+                                detection_cache_size=detection_cache_size,
+                                detection_cache_use_content_hash=detection_cache_use_content_hash,
+                                fast_detection=fast_detection,
+                                detection_scale=detection_scale,
+                                min_face_size=min_face_size,
+                                max_face_size=max_face_size,
+                                roi_margin=roi_margin,
+                                full_detection_interval=full_detection_interval,
+                                max_tracking_gap=max_tracking_gap),
                    transitions={'succeeded': 'SET_ACTION_LIB_SUCCESS',
                                 'failed': 'SET_ACTION_LIB_FAILED'})
 
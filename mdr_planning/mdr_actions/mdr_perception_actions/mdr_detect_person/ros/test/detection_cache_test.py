@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+import unittest
+import rosunit
+from sensor_msgs.msg import Image
+
+from mdr_detect_person.detection_cache import DetectionCache
+
+PKG = 'mdr_detect_person'
+
+
+def create_image(seq, secs=0, nsecs=0, data=b'\x00\x01\x02\x03', frame_id='camera'):
+    image = Image()
+    image.header.seq = seq
+    image.header.stamp.secs = secs
+    image.header.stamp.nsecs = nsecs
+    image.header.frame_id = frame_id
+    image.width = 2
+    image.height = 2
+    image.encoding = 'mono8'
+    image.data = data
+    return image
+
+
+class TestDetectionCache(unittest.TestCase):
+
+    def test_least_recently_used_result_is_evicted(self):
+        cache = DetectionCache(max_size=2)
+        images = [create_image(seq, secs=10, nsecs=seq) for seq in range(3)]
+        cache.put(images[0], 'faces 0')
+        cache.put(images[1], 'faces 1')
+
+        # the first result becomes the most recently used one
+        self.assertEqual(cache.get(images[0]), 'faces 0')
+        cache.put(images[2], 'faces 2')
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(images[1]))
+        self.assertEqual(cache.get(images[0]), 'faces 0')
+        self.assertEqual(cache.get(images[2]), 'faces 2')
+
+        # storing a result again does not evict another one
+        cache.put(images[0], 'new faces 0')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get(images[0]), 'new faces 0')
+        self.assertEqual(cache.get(images[2]), 'faces 2')
+
+    def test_disabled_cache(self):
+        cache = DetectionCache(max_size=0)
+        image = create_image(1, secs=10)
+        cache.put(image, 'faces')
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get(image))
+
+        # lookups in a disabled cache are not counted
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(cache.misses, 0)
+        self.assertEqual(cache.get_hit_rate(), 0.)
+
+    def test_unstamped_images_without_content_hash(self):
+        cache = DetectionCache(max_size=10, use_content_hash=False)
+        image = create_image(0)
+        self.assertIsNone(cache.get_key(image))
+        cache.put(image, 'faces')
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get(image))
+
+    def test_unstamped_images_with_content_hash(self):
+        cache = DetectionCache(max_size=10, use_content_hash=True)
+        image = create_image(0)
+        cache.put(image, 'faces')
+        self.assertEqual(cache.get(image), 'faces')
+
+        # the content is hashed both if it is given as bytes and as a list
+        self.assertEqual(cache.get(create_image(0, data=[0, 1, 2, 3])), 'faces')
+        self.assertIsNone(cache.get(create_image(0, data=b'\x00\x01\x02\x04')))
+
+    def test_hit_rate(self):
+        cache = DetectionCache(max_size=10)
+        self.assertEqual(cache.get_hit_rate(), 0.)
+
+        image = create_image(1, secs=10)
+        self.assertIsNone(cache.get(image))
+        cache.put(image, 'faces')
+        for _ in range(3):
+            self.assertEqual(cache.get(image), 'faces')
+        self.assertEqual(cache.hits, 3)
+        self.assertEqual(cache.misses, 1)
+        self.assertAlmostEqual(cache.get_hit_rate(), 0.75)
+
+
+if __name__ == '__main__':
+    rosunit.unitrun(PKG, 'test_detection_cache', TestDetectionCache)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+import unittest
+import numpy as np
+import rosunit
+
+from mdr_detect_person.inference import FaceTracker
+
+PKG = 'mdr_detect_person'
+
+
+def find_intervals(mask):
+    '''Returns the (start, end) indices of the runs of True values in a boolean array.
+    '''
+    changes = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(int), [0]))))
+    return list(zip(changes[0::2], changes[1::2]))
+
+
+class FakeCascade(object):
+    '''Detects bright, axis-aligned squares on a dark background instead of faces
+    and records the shapes of the images in which it has searched.
+    '''
+    def __init__(self):
+        self.searched_image_shapes = list()
+
+    def detectMultiScale(self, image, scale_factor, min_neighbours,
+                         minSize=(0, 0), maxSize=(0, 0)):
+        self.searched_image_shapes.append(image.shape)
+        faces = list()
+        bright_pixels = image > 127
+        for x_min, x_max in find_intervals(bright_pixels.any(axis=0)):
+            for y_min, y_max in find_intervals(bright_pixels[:, x_min:x_max].any(axis=1)):
+                w, h = x_max - x_min, y_max - y_min
+                if w < minSize[0] or h < minSize[1]:
+                    continue
+                if maxSize[0] > 0 and (w > maxSize[0] or h > maxSize[1]):
+                    continue
+                faces.append((x_min, y_min, w, h))
+
+        # like OpenCV, an empty tuple is returned if there are no faces
+        if not faces:
+            return ()
+        return np.array(faces)
+
+
+def image_with_faces(faces, shape=(240, 320)):
+    image = np.zeros(shape, dtype=np.uint8)
+    for x, y, w, h in faces:
+        image[y:y+h, x:x+w] = 255
+    return image
+
+
+class TestFaceTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.cascade = FakeCascade()
+        self.tracker = FaceTracker(self.cascade, scale=0.5, roi_margin=0.5,
+                                   full_detection_interval=10, max_tracking_gap=0.5)
+
+    def detect(self, faces, frame_id='camera', stamp=None):
+        self.cascade.searched_image_shapes = list()
+        return self.tracker.detect(image_with_faces(faces), frame_id, stamp).tolist()
+
+    def searched_full_image(self):
+        return (120, 160) in self.cascade.searched_image_shapes
+
+    def test_faces_are_tracked_in_consecutive_images(self):
+        faces = [[40, 60, 40, 40], [200, 100, 60, 60]]
+        self.assertEqual(sorted(self.detect(faces, stamp=10.)), faces)
+        self.assertTrue(self.searched_full_image())
+
+        moved_faces = [[46, 64, 40, 40], [192, 104, 60, 60]]
+        self.assertEqual(sorted(self.detect(moved_faces, stamp=10.1)), moved_faces)
+        self.assertFalse(self.searched_full_image())
+        self.assertEqual(len(self.cascade.searched_image_shapes), 2)
+
+    def test_full_image_is_searched_periodically(self):
+        faces = [[40, 60, 40, 40]]
+        for i in range(10):
+            self.detect(faces, stamp=10. + i * 0.1)
+            self.assertEqual(self.searched_full_image(), i == 0)
+        self.detect(faces, stamp=11.)
+        self.assertTrue(self.searched_full_image())
+
+    def test_new_face_is_found_after_reset(self):
+        self.detect([[40, 60, 40, 40]], stamp=10.)
+
+        # a face far away from the tracked face is only found in the full image
+        faces = [[40, 60, 40, 40], [220, 120, 40, 40]]
+        self.assertEqual(self.detect(faces, stamp=10.1), [[40, 60, 40, 40]])
+
+        self.tracker.reset()
+        self.assertEqual(sorted(self.detect(faces, stamp=10.2)), faces)
+        self.assertTrue(self.searched_full_image())
+
+    def test_tracking_is_restarted_for_other_frame(self):
+        self.detect([[40, 60, 40, 40]], frame_id='camera', stamp=10.)
+        faces = [[220, 120, 40, 40]]
+        self.assertEqual(self.detect(faces, frame_id='other_camera', stamp=10.1), faces)
+        self.assertTrue(self.searched_full_image())
+
+    def test_tracking_is_restarted_after_gap(self):
+        self.detect([[40, 60, 40, 40]], stamp=10.)
+        faces = [[220, 120, 40, 40]]
+        self.assertEqual(self.detect(faces, stamp=11.), faces)
+        self.assertTrue(self.searched_full_image())
+
+        # an older image does not continue the stream either
+        self.detect(faces, stamp=9.)
+        self.assertTrue(self.searched_full_image())
+
+    def test_images_without_stamp_are_tracked(self):
+        faces = [[40, 60, 40, 40]]
+        self.detect(faces)
+        self.assertEqual(self.detect(faces), faces)
+        self.assertFalse(self.searched_full_image())
+
+    def test_no_faces(self):
+        self.assertEqual(self.detect([], stamp=10.), [])
+        self.assertEqual(self.detect([], stamp=10.1), [])
+        self.assertTrue(self.searched_full_image())
+
+
+if __name__ == '__main__':
+    rosunit.unitrun(PKG, 'test_face_tracker', TestFaceTracker)
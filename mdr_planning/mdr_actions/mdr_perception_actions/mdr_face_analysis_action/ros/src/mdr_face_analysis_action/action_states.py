@@ -0,0 +1,148 @@
+#!/usr/bin/python
+
+import rospy
+import smach
+from sensor_msgs.msg import Image
+
+import numpy as np
+import cv2
+import tensorflow as tf
+from keras.models import load_model
+from cv_bridge import CvBridge, CvBridgeError
+
+from mdr_perception_msgs.msg import FaceBoundingBox
+from mdr_detect_person.inference import (load_detection_model, detect_faces,
+                                         FaceBatch, classify_faces)
+from mdr_face_analysis_action.msg import AnalyzeFacesFeedback, AnalyzeFacesResult
+
+
+class SetupAnalyzeFaces(smach.State):
+    def __init__(self):
+        smach.State.__init__(self, outcomes=['succeeded', 'failed'],
+                             input_keys=['analyze_faces_goal'],
+                             output_keys=['analyze_faces_feedback', 'analyze_faces_result'])
+
+    def execute(self, userdata):
+        feedback = AnalyzeFacesFeedback()
+        feedback.current_state = 'ANALYZE_FACES'
+        feedback.message = '[face_analysis] Analysing faces'
+        userdata.analyze_faces_feedback = feedback
+        return 'succeeded'
+
+
+class AnalyzeFaces(smach.State):
+    '''Detects the faces in an image and classifies them with all face
+    attribute models. The image is decoded and converted to grayscale
+    only once; the faces are cropped once per distinct model input size,
+    such that models with the same input size classify the same batch.
+
+    Keyword arguments:
+    detection_model_path -- path to a Haar cascade face detection model
+    attribute_models -- a dictionary mapping attribute names (e.g. 'genders')
+                        to (model path, labels, image size) tuples
+    image_topic -- topic on which the annotated image is published
+    max_batch_size -- maximum number of faces passed through a model at once
+
+    '''
+    def __init__(self, detection_model_path='', attribute_models=dict(),
+                 image_topic='/mdr_actions/face_analysis_server/image',
+                 max_batch_size=32):
+        smach.State.__init__(self, outcomes=['succeeded', 'failed'],
+                             input_keys=['analyze_faces_goal'],
+                             output_keys=['analyze_faces_feedback', 'bounding_boxes',
+                                          'attributes'])
+        self.max_batch_size = max_batch_size
+        self.image_publisher = rospy.Publisher(image_topic, Image, queue_size=1)
+        self.bridge = CvBridge()
+
+        self.face_detection = load_detection_model(detection_model_path)
+
+        # all models are loaded into the same graph
+        self.classifiers = dict()
+        self.face_batches = dict()
+        for attribute, (model_path, labels, image_size) in attribute_models.items():
+            # the server does not start without all of its models, as the
+            # results would otherwise silently miss the attribute
+            try:
+                model = load_model(model_path)
+                rospy.loginfo('[face_analysis] Model %s loaded successfully', model_path)
+
+                # necessary for avoiding https://github.com/keras-team/keras/issues/2397
+                model._make_predict_function()
+            except Exception as exc:
+                rospy.logerr('[face_analysis] Could not load the %s model %s: %s',
+                             attribute, model_path, str(exc))
+                raise
+
+            batch_size = tuple(image_size[0:2])
+            if batch_size not in self.face_batches:
+                self.face_batches[batch_size] = FaceBatch(batch_size)
+            self.classifiers[attribute] = (model, labels, batch_size)
+        self.computation_graph = tf.get_default_graph()
+
+    def execute(self, userdata):
+        userdata.bounding_boxes = list()
+        userdata.attributes = dict((attribute, list()) for attribute in self.classifiers)
+        try:
+            bgr_image = self.ros2cv(userdata.analyze_faces_goal.image)
+        except CvBridgeError as exc:
+            rospy.logerr('[face_analysis] Could not convert image: %s', str(exc))
+            return 'failed'
+
+        gray_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2GRAY)
+        face_coordinates = [tuple(int(c) for c in face)
+                            for face in detect_faces(self.face_detection, gray_image)]
+        if not face_coordinates:
+            return 'succeeded'
+
+        bounding_boxes = list()
+        for coordinates in face_coordinates:
+            bounding_box = FaceBoundingBox()
+            bounding_box.bounding_box_coordinates = list(coordinates)
+            bounding_boxes.append(bounding_box)
+        userdata.bounding_boxes = bounding_boxes
+
+        faces = dict((batch_size, face_batch.fill(gray_image, face_coordinates))
+                     for batch_size, face_batch in self.face_batches.items())
+        attributes = dict()
+        with self.computation_graph.as_default():
+            for attribute, (model, labels, batch_size) in self.classifiers.items():
+                attributes[attribute] = classify_faces(model, faces[batch_size], labels,
+                                                       self.max_batch_size)
+        userdata.attributes = attributes
+
+        # the annotated image is only created if somebody is listening
+        if self.image_publisher.get_num_connections() > 0:
+            self.publish_annotated_image(bgr_image, face_coordinates, attributes)
+        return 'succeeded'
+
+    def publish_annotated_image(self, image, face_coordinates, attributes):
+        for i, (x, y, w, h) in enumerate(face_coordinates):
+            text = ' '.join(attributes[attribute][i] for attribute in sorted(attributes))
+            cv2.rectangle(image, (x, y), (x + w, y + h), (0, 0, 255), 2)
+            cv2.putText(image, text, (x, y - 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                        (255, 0, 0), 1, cv2.LINE_AA)
+        self.image_publisher.publish(self.bridge.cv2_to_imgmsg(image, 'bgr8'))
+
+    def ros2cv(self, ros_image):
+        cv_image = self.bridge.imgmsg_to_cv2(ros_image, 'bgr8')
+        return np.array(cv_image, dtype=np.uint8)
+
+
+class SetActionLibResult(smach.State):
+    def __init__(self, result):
+        smach.State.__init__(self, outcomes=['succeeded'],
+                             input_keys=['analyze_faces_goal', 'bounding_boxes',
+                                         'attributes'],
+                             output_keys=['analyze_faces_feedback', 'analyze_faces_result'])
+        self.result = result
+
+    def execute(self, userdata):
+        result = AnalyzeFacesResult()
+        result.success = self.result
+        result.bounding_boxes = userdata.bounding_boxes
+        result.number_of_faces = len(userdata.bounding_boxes)
+        result.genders = userdata.attributes.get('genders', list())
+        result.emotions = userdata.attributes.get('emotions', list())
+        userdata.analyze_faces_result = result
+        return 'succeeded'
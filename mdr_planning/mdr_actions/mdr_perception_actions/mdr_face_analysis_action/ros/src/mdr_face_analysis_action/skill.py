@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+import rospy
+import smach
+from smach import StateMachine as sm
+
+from mdr_face_analysis_action.action_states import (SetupAnalyzeFaces,
+                                                    AnalyzeFaces,
+                                                    SetActionLibResult)
+
+
+class FaceAnalysisSkill(smach.StateMachine):
+    def __init__(self, timeout=10):
+        sm.__init__(self,
+                    outcomes=['OVERALL_SUCCESS',
+                              'OVERALL_FAILED', 'PREEMPTED'],
+                    input_keys=['analyze_faces_goal'],
+                    output_keys=['analyze_faces_feedback',
+                                 'analyze_faces_result'])
+
+        detection_model_path = rospy.get_param('~detection_model_path', '')
+        gender_model_path = rospy.get_param('~gender_model_path', '')
+        emotion_model_path = rospy.get_param('~emotion_model_path', '')
+        image_topic = rospy.get_param('~image_topic', '/mdr_actions/face_analysis_server/image')
+        max_batch_size = int(rospy.get_param('~max_batch_size', 32))
+
+        gender_labels = {0: 'woman', 1: 'man'}
+        emotion_labels = {0: 'angry', 1: 'disgusted', 2: 'sad', 3: 'happy',
+                          4: 'sad', 5: 'surprised', 6: 'neutral'}
+        attribute_models = {'genders': (gender_model_path, gender_labels, (64, 64, 1)),
+                            'emotions': (emotion_model_path, emotion_labels, (48, 48, 1))}
+
+        with self:
+            sm.add('SETUP_ANALYZE_FACES', SetupAnalyzeFaces(),
+                   transitions={'succeeded': 'ANALYZE_FACES',
+                                'failed': 'SETUP_ANALYZE_FACES'})
+
+            sm.add('ANALYZE_FACES',
+                   AnalyzeFaces(detection_model_path=detection_model_path,
+                                attribute_models=attribute_models,
+                                image_topic=image_topic,
+                                max_batch_size=max_batch_size),
+                   transitions={'succeeded': 'SET_ACTION_LIB_SUCCESS',
+                                'failed': 'SET_ACTION_LIB_FAILED'})
+
+            sm.add('SET_ACTION_LIB_FAILED',
+                   SetActionLibResult(False),
+                   transitions={'succeeded': 'OVERALL_FAILED'})
+
+            sm.add('SET_ACTION_LIB_SUCCESS',
+                   SetActionLibResult(True),
+                   transitions={'succeeded': 'OVERALL_SUCCESS'})
@@ -0,0 +1,11 @@
+#!/usr/bin/env python
+
+from distutils.core import setup
+from catkin_pkg.python_setup import generate_distutils_setup
+
+d = generate_distutils_setup(
+   packages=['mdr_face_analysis_action'],
+   package_dir={'mdr_face_analysis_action': 'ros/src/mdr_face_analysis_action'}
+)
+
+setup(**d)
@@ -12,6 +12,7 @@ import tensorflow as tf
 from keras.models import load_model
 from cv_bridge import CvBridge, CvBridgeError
 
+from mdr_detect_person.inference import FaceBatch, classify_faces
 from mdr_gender_recognition.msg import GenderRecognitionFeedback, GenderRecognitionResult
 
 
@@ -31,13 +32,16 @@ class SetupGenderRecognition(smach.State):
 
 class RecognizeGenders(smach.State):
     def __init__(self, timeout=120.0, image_topic='/cam3d/rgb/image_raw',
-                 gender_model_path=None, labels=dict(), image_size=(0, 0, 0)):
+                 gender_model_path=None, labels=dict(), image_size=(0, 0, 0),
+                 max_batch_size=32):
         smach.State.__init__(self, input_keys=['gender_recognition_goal', 'genders'],
                              output_keys=['gender_recognition_feedback', 'genders'],
                              outcomes=['succeeded', 'failed'])
         self.timeout = timeout
         self.labels = labels
         self.image_size = image_size
+        self.max_batch_size = max_batch_size
+        self.face_batch = FaceBatch(image_size[0:2])
         self.nop = np.array([None])
         self.image_publisher = rospy.Publisher(image_topic, Image, queue_size=1)
         self.bridge = CvBridge()
@@ -60,15 +64,13 @@ class RecognizeGenders(smach.State):
 
         rgb_image = self.ros2cv(userdata.gender_recognition_goal.image)
         gray_image = self.rgb2gray(rgb_image)
-        for face in bounding_boxes:
-            x, y, w, h = face.bounding_box_coordinates
-            face = gray_image[y: (y + h), x: (x + w)]  # check if it is not rgb
-            face = cv2.resize(face, self.image_size[0:2])
-            face = np.expand_dims(face, 0)
-            face = np.expand_dims(face, -1)
-            face = self.preprocess_image(face)
-            recognized_gender = self.recognize_gender(face)
-            userdata.genders.append(recognized_gender)
+
+        # all faces are classified at once
+        face_coordinates = [face.bounding_box_coordinates for face in bounding_boxes]
+        faces = self.face_batch.fill(gray_image, face_coordinates)
+        userdata.genders = self.recognize_genders(faces)
+
+        for (x, y, w, h), recognized_gender in zip(face_coordinates, userdata.genders):
             rgb_cv2 = cv2.rectangle(rgb_image, (x, y), (x + w, y + h), (0, 0, 255), 2)
             cv2.putText(rgb_image, recognized_gender, (x, y - 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0),
                         1, cv2.LINE_AA)
@@ -76,16 +78,11 @@ class RecognizeGenders(smach.State):
         self.image_publisher.publish(output_ros_image)
         return 'succeeded'
 
-    def preprocess_image(self, image):
-        image = image / 255.0
-        return image
-
-    def recognize_gender(self, face):
-        label = -1
+    def recognize_genders(self, faces):
         with self.computation_graph.as_default():
-            class_predictions = self.gender_model.predict(face)
-            label = self.labels[np.argmax(class_predictions)]
-        return label
+            labels = classify_faces(self.gender_model, faces, self.labels,
+                                    self.max_batch_size)
+        return labels
 
     def ros2cv(self, ros_image):
         cv_image = self.bridge.imgmsg_to_cv2(ros_image, 'bgr8')
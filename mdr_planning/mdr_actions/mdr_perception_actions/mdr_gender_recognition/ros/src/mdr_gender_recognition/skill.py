@@ -22,6 +22,7 @@ class GenderRecognitionSkill(smach.StateMachine):
         image_topic = rospy.get_param('~image_topic', '/cam3d/rgb/image_raw')
         labels = {0: 'woman', 1: 'man'}
         image_size = (64, 64, 1)
+        max_batch_size = int(rospy.get_param('~max_batch_size', 32))
 
         with self:
             sm.add('SETUP_GENDER_RECOGNITION', SetupGenderRecognition(),
@@ -31,7 +32,8 @@ class GenderRecognitionSkill(smach.StateMachine):
             sm.add('RECOGNIZE_GENDERS',
                    RecognizeGenders(gender_model_path=gender_model_path,
                                     image_topic=image_topic,
-                                    labels=labels, image_size=image_size),
+                                    labels=labels, image_size=image_size,
+                                    max_batch_size=max_batch_size),
                    transitions={'succeeded': 'SET_ACTION_LIB_SUCCESS',
                                 'failed': 'SET_ACTION_LIB_FAILED'})
 
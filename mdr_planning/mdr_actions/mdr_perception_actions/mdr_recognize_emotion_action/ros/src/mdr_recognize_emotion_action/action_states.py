@@ -12,6 +12,7 @@ import tensorflow as tf
 from keras.models import load_model
 from cv_bridge import CvBridge, CvBridgeError
 
+from mdr_detect_person.inference import FaceBatch, classify_faces
 from mdr_recognize_emotion_action.msg import (RecognizeEmotionFeedback,
                                               RecognizeEmotionResult)
 
@@ -33,7 +34,8 @@ class SetupRecognizeEmotion(smach.State):
 
 class RecognizeEmotion(smach.State):
     def __init__(self, timeout=120.0, image_topic='/cam3d/rgb/image_raw',
-                 emotion_model_path=None, labels=dict(), image_size=(0, 0, 0)):
+                 emotion_model_path=None, labels=dict(), image_size=(0, 0, 0),
+                 max_batch_size=32):
         smach.State.__init__(self, input_keys=['recognize_emotion_goal',
                                                'emotions'],
                              output_keys=['recognize_emotion_feedback',
@@ -42,6 +44,8 @@ class RecognizeEmotion(smach.State):
         self.timeout = timeout
         self.labels = labels
         self.image_size = image_size
+        self.max_batch_size = max_batch_size
+        self.face_batch = FaceBatch(image_size[0:2])
         self.image_publisher = rospy.Publisher(image_topic, Image, queue_size=1)
         self.bridge = CvBridge()
 
@@ -49,7 +53,7 @@ class RecognizeEmotion(smach.State):
             self.emotion_model = load_model(emotion_model_path)
             print('Model ' + emotion_model_path + ' loaded successfully')
 
-            # the following two lines (and the with... line in predict_emotion)
+            # the following two lines (and the with... line in predict_emotions)
             # are necessary for avoiding
             # https://github.com/keras-team/keras/issues/2397
             self.emotion_model._make_predict_function()
@@ -64,16 +68,13 @@ class RecognizeEmotion(smach.State):
 
         rgb_image = self.ros2cv(userdata.recognize_emotion_goal.image)
         gray_image = self.rgb2gray(rgb_image)
-        for face in bounding_boxes:
-            x, y, w, h = face.bounding_box_coordinates
-            face = gray_image[y: (y + h), x: (x + w)]
-            face = cv2.resize(face, self.image_size[0:2])
-            face = np.expand_dims(face, 0)
-            face = np.expand_dims(face, -1)
-            face = self.preprocess_image(face)
-            predicted_emotion = self.predict_emotion(face)
-            userdata.emotions.append(predicted_emotion)
 
+        # all faces are classified at once
+        face_coordinates = [face.bounding_box_coordinates for face in bounding_boxes]
+        faces = self.face_batch.fill(gray_image, face_coordinates)
+        userdata.emotions = self.predict_emotions(faces)
+
+        for (x, y, w, h), predicted_emotion in zip(face_coordinates, userdata.emotions):
             rgb_cv2 = cv2.rectangle(rgb_image, (x, y), (x + w, y + h),
                                     (0, 0, 255), 2)
             cv2.putText(rgb_image, predicted_emotion, (x, y - 30),
@@ -83,16 +84,11 @@ class RecognizeEmotion(smach.State):
         self.image_publisher.publish(output_ros_image)
         return 'succeeded'
 
-    def preprocess_image(self, image):
-        image = image / 255.0
-        return image
-
-    def predict_emotion(self, face):
-        label = -1
+    def predict_emotions(self, faces):
         with self.computation_graph.as_default():
-            class_predictions = self.emotion_model.predict(face)
-            label = self.labels[np.argmax(class_predictions)]
-        return label
+            labels = classify_faces(self.emotion_model, faces, self.labels,
+                                    self.max_batch_size)
+        return labels
 
     def ros2cv(self, ros_image):
         cv_image = self.bridge.imgmsg_to_cv2(ros_image, 'bgr8')
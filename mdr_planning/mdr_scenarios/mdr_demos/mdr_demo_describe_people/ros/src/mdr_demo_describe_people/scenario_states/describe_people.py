@@ -5,6 +5,7 @@ from sensor_msgs.msg import Image
 from mdr_detect_person.msg import DetectPersonAction, DetectPersonGoal
 from mdr_recognize_emotion_action.msg import RecognizeEmotionAction, RecognizeEmotionGoal
 from mdr_gender_recognition.msg import GenderRecognitionAction, GenderRecognitionGoal
+from mdr_face_analysis_action.msg import AnalyzeFacesAction, AnalyzeFacesGoal
 
 from mas_execution_manager.scenario_state_base import ScenarioStateBase
 
@@ -24,6 +25,11 @@ class DescribePeople(ScenarioStateBase):
                                                    '/mdr_actions/recognize_emotion_server')
         self.recognize_gender_server = kwargs.get('recognize_gender_server',
                                                   '/mdr_actions/gender_recognition_server')
+
+        # if a face analysis server is given, faces are detected and their emotions
+        # and genders are recognised by that server instead of the three servers above
+        self.face_analysis_server = kwargs.get('face_analysis_server', None)
+
         self.sound_topic = kwargs.get('sound_topic', '/say')
 
         self.number_of_retries = kwargs.get('number_of_retries', 0)
@@ -33,20 +39,26 @@ class DescribePeople(ScenarioStateBase):
         self.image_received = False
         self.image = None
 
-        self.detect_person_client = actionlib.SimpleActionClient(self.detect_person_server,
-                                                                 DetectPersonAction)
-        rospy.loginfo('Waiting for %s' % self.detect_person_server)
-        self.detect_person_client.wait_for_server()
+        if self.face_analysis_server:
+            self.face_analysis_client = actionlib.SimpleActionClient(self.face_analysis_server,
+                                                                     AnalyzeFacesAction)
+            rospy.loginfo('Waiting for %s' % self.face_analysis_server)
+            self.face_analysis_client.wait_for_server()
+        else:
+            self.detect_person_client = actionlib.SimpleActionClient(self.detect_person_server,
+                                                                     DetectPersonAction)
+            rospy.loginfo('Waiting for %s' % self.detect_person_server)
+            self.detect_person_client.wait_for_server()
 
-        self.recognize_emotion_client = actionlib.SimpleActionClient(self.recognize_emotion_server,
-                                                                     RecognizeEmotionAction)
-        rospy.loginfo('Waiting for %s' % self.recognize_emotion_server)
-        self.recognize_emotion_client.wait_for_server()
+            self.recognize_emotion_client = actionlib.SimpleActionClient(self.recognize_emotion_server,
+                                                                         RecognizeEmotionAction)
+            rospy.loginfo('Waiting for %s' % self.recognize_emotion_server)
+            self.recognize_emotion_client.wait_for_server()
 
-        self.recognize_gender_client = actionlib.SimpleActionClient(self.recognize_gender_server,
-                                                                    GenderRecognitionAction)
-        rospy.loginfo('Waiting for %s' % self.recognize_gender_server)
-        self.recognize_gender_client.wait_for_server()
+            self.recognize_gender_client = actionlib.SimpleActionClient(self.recognize_gender_server,
+                                                                        GenderRecognitionAction)
+            rospy.loginfo('Waiting for %s' % self.recognize_gender_server)
+            self.recognize_gender_client.wait_for_server()
 
         rospy.loginfo('Starting people description')
         self.start_time = rospy.Time.now()
@@ -60,17 +72,21 @@ class DescribePeople(ScenarioStateBase):
             rospy.logerr('Could not receive image')
             return 'no_image_received'
 
-        # detecting people
-        detect_person_goal = DetectPersonGoal()
-        detect_person_goal.start = True
-        detect_person_goal.image = self.image
+        faces = self.describe_faces()
+        if faces is None:
+            # a perception failure does not mean that nobody is there,
+            # so people are not asked to reposition themselves
+            if self.retry_count == self.number_of_retries:
+                self.say('I am having trouble recognising people. Please say my name when you need me again.')
+                rospy.logerr('Could not describe the people in the image due to a perception failure; waiting for name again')
+                self.retry_count = 0
+                return 'failed_after_retrying'
 
-        rospy.loginfo('Detecting people...')
-        self.detect_person_client.send_goal(detect_person_goal)
-        self.detect_person_client.wait_for_result()
-        detect_person_result = self.detect_person_client.get_result()
+            rospy.logerr('Could not describe the people in the image due to a perception failure; retrying')
+            self.retry_count += 1
+            return 'failed'
 
-        face_count = detect_person_result.number_of_faces
+        face_count, emotions, genders = faces
         if face_count == 0:
             if self.retry_count == self.number_of_retries:
                 self.say('I could not see anyone. Please say my name when you need me again.')
@@ -84,28 +100,6 @@ class DescribePeople(ScenarioStateBase):
             self.retry_count += 1
             return 'failed'
 
-        # recognizing emotions
-        emotion_goal = RecognizeEmotionGoal()
-        emotion_goal.image = self.image
-        emotion_goal.number_of_faces = face_count
-        emotion_goal.bounding_boxes = detect_person_result.bounding_boxes
-
-        rospy.loginfo('Recognizing emotions...')
-        self.recognize_emotion_client.send_goal(emotion_goal)
-        self.recognize_emotion_client.wait_for_result()
-        emotion_result = self.recognize_emotion_client.get_result()
-
-        # recognizing gender
-        rospy.loginfo('Recognizing genders...')
-        gender_goal = GenderRecognitionGoal()
-        gender_goal.image = self.image
-        gender_goal.number_of_faces = face_count
-        gender_goal.bounding_boxes = detect_person_result.bounding_boxes
-
-        self.recognize_gender_client.send_goal(gender_goal)
-        self.recognize_gender_client.wait_for_result()
-        gender_result = self.recognize_gender_client.get_result()
-
         # say how many people there are
         sentence = ''
         if face_count == 1:
@@ -118,15 +112,15 @@ class DescribePeople(ScenarioStateBase):
         # we sleep for a while so that there's time for the sentence to be said
         rospy.sleep(0.5)
 
-        emotions_recognized = len(emotion_result.emotions) > 0
-        genders_recognized = len(gender_result.genders) > 0
+        emotions_recognized = len(emotions) > 0
+        genders_recognized = len(genders) > 0
 
         # say the emotion and gender of the first person
         sentence = 'I see one '
         if emotions_recognized:
-            sentence += str(emotion_result.emotions[0])
+            sentence += str(emotions[0])
             if genders_recognized:
-                sentence += ' ' + str(gender_result.genders[0])
+                sentence += ' ' + str(genders[0])
             else:
                 sentence += ' person'
         else:
@@ -142,10 +136,10 @@ class DescribePeople(ScenarioStateBase):
         face_counter = 0
         for face_counter in xrange(1, face_count-1):
             sentence = 'I also see one '
-            if face_counter < len(emotion_result.emotions):
-                sentence += str(emotion_result.emotions[face_counter])
-                if face_counter < len(gender_result.genders):
-                    sentence += ' ' + str(gender_result.genders[face_counter])
+            if face_counter < len(emotions):
+                sentence += str(emotions[face_counter])
+                if face_counter < len(genders):
+                    sentence += ' ' + str(genders[face_counter])
                 else:
                     sentence += ' person'
             else:
@@ -160,10 +154,10 @@ class DescribePeople(ScenarioStateBase):
         # of the last person, but add 'finally' to the sentence for a more engaging feedback
         if face_count > 2:
             sentence = 'Finally, I see one '
-            if face_counter == len(emotion_result.emotions):
-                sentence += str(emotion_result.emotions[face_count-1])
-                if face_counter == len(gender_result.genders):
-                    sentence += ' ' + str(gender_result.genders[face_count-1])
+            if face_counter == len(emotions):
+                sentence += str(emotions[face_count-1])
+                if face_counter == len(genders):
+                    sentence += ' ' + str(genders[face_count-1])
                 else:
                     sentence += ' person'
             else:
@@ -180,6 +174,101 @@ class DescribePeople(ScenarioStateBase):
         self.retry_count = 0
         return 'succeeded'
 
+    def describe_faces(self):
+        '''Detects the faces in the last received image and recognises
+        their emotions and genders. Each step waits for its results for
+        at most 'self.timeout'; the emotions and genders are recognised
+        concurrently, so their recognition shares the timeout.
+
+        Returns the number of faces, a list of emotions, and a list of genders;
+        the lists are empty if no faces are detected or if the emotion and
+        gender recognition does not finish within the timeout. Returns None
+        if the faces could not be detected, i.e. if the detection did not
+        finish within the timeout or if the face analysis was unsuccessful.
+
+        '''
+        if self.face_analysis_server:
+            face_analysis_goal = AnalyzeFacesGoal()
+            face_analysis_goal.image = self.image
+
+            rospy.loginfo('Analysing faces...')
+            self.face_analysis_client.send_goal(face_analysis_goal)
+            face_analysis_result = self.get_result(self.face_analysis_client,
+                                                   self.face_analysis_server,
+                                                   rospy.Time.now() + self.timeout)
+            if face_analysis_result is None or not face_analysis_result.success:
+                rospy.logerr('Face analysis failed')
+                return None
+            return (face_analysis_result.number_of_faces,
+                    face_analysis_result.emotions,
+                    face_analysis_result.genders)
+
+        # detecting people
+        detect_person_goal = DetectPersonGoal()
+        detect_person_goal.start = True
+        detect_person_goal.image = self.image
+
+        rospy.loginfo('Detecting people...')
+        self.detect_person_client.send_goal(detect_person_goal)
+        detect_person_result = self.get_result(self.detect_person_client,
+                                               self.detect_person_server,
+                                               rospy.Time.now() + self.timeout)
+        if detect_person_result is None:
+            rospy.logerr('Person detection failed')
+            return None
+
+        # the person detection is unsuccessful if there are no faces in the image
+        if detect_person_result.number_of_faces == 0:
+            return 0, [], []
+        face_count = detect_person_result.number_of_faces
+
+        # the emotions and genders are recognised independently,
+        # so both goals are sent before waiting for any result
+        emotion_goal = RecognizeEmotionGoal()
+        emotion_goal.image = self.image
+        emotion_goal.number_of_faces = face_count
+        emotion_goal.bounding_boxes = detect_person_result.bounding_boxes
+
+        gender_goal = GenderRecognitionGoal()
+        gender_goal.image = self.image
+        gender_goal.number_of_faces = face_count
+        gender_goal.bounding_boxes = detect_person_result.bounding_boxes
+
+        rospy.loginfo('Recognizing emotions and genders...')
+        self.recognize_emotion_client.send_goal(emotion_goal)
+        self.recognize_gender_client.send_goal(gender_goal)
+
+        deadline = rospy.Time.now() + self.timeout
+        emotion_result = self.get_result(self.recognize_emotion_client,
+                                         self.recognize_emotion_server, deadline)
+        gender_result = self.get_result(self.recognize_gender_client,
+                                        self.recognize_gender_server, deadline)
+
+        emotions = emotion_result.emotions if emotion_result is not None else []
+        genders = gender_result.genders if gender_result is not None else []
+        return face_count, emotions, genders
+
+    def get_result(self, client, server_name, deadline):
+        '''Waits for the result of the goal sent by the given client until the
+        deadline. Returns the result or None if the goal has not finished
+        by the deadline, in which case the goal is cancelled.
+
+        Keyword arguments:
+        client -- an actionlib.SimpleActionClient that has sent a goal
+        server_name -- name of the action server (used for logging)
+        deadline -- a rospy.Time instance
+
+        '''
+        # a zero duration would make wait_for_result wait without a limit, but a
+        # goal that has already finished should be returned even after the deadline
+        remaining_time = max(deadline - rospy.Time.now(), rospy.Duration.from_sec(0.001))
+        if not client.wait_for_result(remaining_time):
+            rospy.logerr('%s did not return a result within %s seconds; cancelling goal',
+                         server_name, self.timeout.to_sec())
+            client.cancel_goal()
+            return None
+        return client.get_result()
+
     def get_image(self, image_msg):
         self.image = image_msg
         self.image_received = True
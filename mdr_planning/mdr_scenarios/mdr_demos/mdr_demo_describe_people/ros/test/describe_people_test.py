@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+import unittest
+import rospy
+import rosunit
+
+from mdr_detect_person.msg import DetectPersonResult
+from mdr_face_analysis_action.msg import AnalyzeFacesResult
+from mdr_demo_describe_people.scenario_states.describe_people import DescribePeople
+
+PKG = 'mdr_demo_describe_people'
+
+
+class FakeActionClient(object):
+    '''An action client whose goals finish immediately with the given
+    result; goals never finish (i.e. time out) if the result is None.
+    '''
+    def __init__(self, result=None):
+        self.result = result
+        self.goals = list()
+        self.cancelled = False
+
+    def send_goal(self, goal):
+        self.goals.append(goal)
+
+    def wait_for_result(self, timeout):
+        return self.result is not None
+
+    def get_result(self):
+        return self.result
+
+    def cancel_goal(self):
+        self.cancelled = True
+
+
+class TestDescribePeople(unittest.TestCase):
+
+    def setUp(self):
+        # rospy.Time.now() uses the wall clock without a node
+        rospy.rostime.set_rostime_initialized(True)
+
+        # the state is created without its constructor,
+        # which waits for the action servers
+        self.state = DescribePeople.__new__(DescribePeople)
+        self.state.timeout = rospy.Duration.from_sec(0.1)
+        self.state.no_detection_waiting_time = 0.
+        self.state.number_of_retries = 1
+        self.state.retry_count = 0
+        self.state.image = 'image'
+        self.state.image_received = True
+        self.state.start_time = rospy.Time.now()
+        self.state.face_analysis_server = None
+        self.state.detect_person_server = 'detect_person_server'
+        self.state.recognize_emotion_server = 'recognize_emotion_server'
+        self.state.recognize_gender_server = 'recognize_gender_server'
+        self.state.recognize_emotion_client = FakeActionClient()
+        self.state.recognize_gender_client = FakeActionClient()
+
+        self.sentences = list()
+        self.state.say = self.sentences.append
+
+    def test_empty_scene_is_not_a_perception_failure(self):
+        # the person detection reports a failure if there are no faces
+        result = DetectPersonResult(number_of_faces=0, success=False)
+        self.state.detect_person_client = FakeActionClient(result)
+        self.assertEqual(self.state.describe_faces(), (0, [], []))
+        self.assertEqual(len(self.state.recognize_emotion_client.goals), 0)
+
+        self.assertEqual(self.state.execute(None), 'failed')
+        self.assertEqual(self.state.retry_count, 1)
+        self.assertIn('stand in front of my camera', self.sentences[-1])
+
+    def test_detection_timeout_is_a_perception_failure(self):
+        self.state.detect_person_client = FakeActionClient()
+        self.assertIsNone(self.state.describe_faces())
+        self.assertTrue(self.state.detect_person_client.cancelled)
+
+        self.assertEqual(self.state.execute(None), 'failed')
+        self.assertEqual(self.sentences, [])
+        self.assertEqual(self.state.execute(None), 'failed_after_retrying')
+        self.assertIn('trouble recognising people', self.sentences[-1])
+
+    def test_unsuccessful_face_analysis_is_a_perception_failure(self):
+        self.state.face_analysis_server = 'face_analysis_server'
+        self.state.face_analysis_client = FakeActionClient(AnalyzeFacesResult(success=False))
+        self.assertIsNone(self.state.describe_faces())
+
+        result = AnalyzeFacesResult(number_of_faces=0, success=True)
+        self.state.face_analysis_client = FakeActionClient(result)
+        self.assertEqual(self.state.describe_faces(), (0, [], []))
+
+
+if __name__ == '__main__':
+    rosunit.unitrun(PKG, 'test_describe_people', TestDescribePeople)